@@ -1,7 +1,10 @@
 import os
 
-from databases import Database
-from sqlalchemy import Column, Integer, String, Table, MetaData, Boolean, create_engine, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Table, MetaData, Boolean, create_engine, ForeignKey, Float, Index, LargeBinary
+
+from app.api.database.migrations import run_migrations
+from app.api.database.sqlite_profile import configure_engine, create_database
+from app.api.utils.metrics import instrument_database
 
 # Получаем строку подключения к базе данных из переменных окружения
 DATABASE_URL = os.getenv('DATABASE_URL')
@@ -9,6 +12,8 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 # Создаём движок для подключения к базе данных
 # connect_args={"check_same_thread": False} используется для того, чтобы избежать ошибки с многопоточностью в SQLite
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Профиль SQLite (WAL, busy_timeout, mmap) для базы данных, общей для всех сервисов
+configure_engine(engine)
 metadata = MetaData()
 
 # Таблица пользователей
@@ -28,7 +33,9 @@ restaurants = Table(
     Column('id', Integer, primary_key=True),
     Column('name', String(64)),
     Column('address', String(256)),
-    Column('user_id', Integer, ForeignKey('users.id'))  # Связываем с таблицей владельцев
+    Column('user_id', Integer, ForeignKey('users.id')),  # Связываем с таблицей владельцев
+    Index('ix_restaurants_user_id', 'user_id'),
+    Index('ix_restaurants_id_user_id', 'id', 'user_id'),
 )
 
 # Таблица для блюд
@@ -39,11 +46,27 @@ dishes = Table(
     Column('name', String(64)),
     Column('ingredients', String(256)),
     Column('price', Float),
-    Column('restaurant_id', Integer, ForeignKey('restaurants.id'))  # Связываем с рестораном
+    Column('restaurant_id', Integer, ForeignKey('restaurants.id')),  # Связываем с рестораном
+    Index('ix_dishes_restaurant_id', 'restaurant_id'),
+    Index('ix_dishes_restaurant_id_price', 'restaurant_id', 'price'),
+)
+
+# Таблица refresh-токенов (хранится только хэш токена)
+refresh_tokens = Table(
+    'refresh_tokens',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('token_hash', LargeBinary, unique=True, nullable=False),  # SHA-256 от токена
+    Column('family_id', LargeBinary, nullable=False),  # Общий идентификатор цепочки ротаций одного входа
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('expires_at', Float, nullable=False),
+    Column('revoked_at', Float, nullable=True),  # Время использования или отзыва токена
+    Index('ix_refresh_tokens_family_id', 'family_id'),
+    Index('ix_refresh_tokens_user_id', 'user_id'),
 )
 
-# Создание асинхронного подключения к базе данных
-database = Database(DATABASE_URL)
+# Создание асинхронного подключения к базе данных с записью метрик запросов
+database = instrument_database(create_database(DATABASE_URL))
 
-# Создание таблиц в базе данных (если они ещё не созданы)
-metadata.create_all(engine)
+# Применение миграций схемы (таблицы и индексы создаются и изменяются только миграциями)
+run_migrations(engine)
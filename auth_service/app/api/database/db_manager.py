@@ -1,38 +1,18 @@
 import logging
+import time
+from typing import Iterable, Optional
+
 from sqlalchemy import select
-from passlib.context import CryptContext
-from app.api.database.database import users, database
+from app.api.database.database import users, database, refresh_tokens
 from app.api.model.user import UserCreate
-
-# Инициализация CryptContext для хэширования паролей с использованием алгоритма bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.api.utils.passwords import hash_password
+from app.api.utils.refresh_token import REFRESH_TOKEN_EXPIRE_SECONDS, REFRESH_TOKEN_REUSE_GRACE_SECONDS, \
+    generate_family_id, generate_refresh_token, hash_refresh_token
 
 # Логгер для записи сообщений о выполнении операций
 logger = logging.getLogger(__name__)
 
 
-def hash_password(password: str) -> str:
-    """
-    Хэширует переданный пароль с использованием алгоритма bcrypt.
-    """
-    hashed_password = pwd_context.hash(password)
-    logger.debug(
-        f"Password hashed successfully: {password[:4]}...")  # Логирование успешного хэширования (первые 4 символа пароля)
-    return hashed_password
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Проверяет, совпадает ли переданный пароль с хэшированным значением.
-    """
-    result = pwd_context.verify(plain_password, hashed_password)
-    if result:
-        logger.debug("Password verification successful.")
-    else:
-        logger.warning("Password verification failed.")
-    return result
-
-
 async def create_user(user: UserCreate):
     """
     Создаёт нового пользователя в базе данных.
@@ -88,3 +68,111 @@ async def get_user_by_id(user_id: int):
         logger.warning(f"User with ID {user_id} not found.")
 
     return result
+
+
+async def get_users_by_ids(user_ids: Iterable[int]):
+    """
+    Получает пользователей по списку ID одним запросом.
+    Возвращает словарь {ID: пользователь}; отсутствующие ID в словарь не попадают.
+    """
+    unique_ids = set(user_ids)
+    if not unique_ids:
+        return {}
+    logger.info(f"Fetching {len(unique_ids)} users by ID.")
+
+    # Один запрос с IN вместо отдельного запроса на каждый ID
+    query = select(users).where(users.c.id.in_(unique_ids))
+    result = await database.fetch_all(query)
+
+    logger.debug(f"Found {len(result)} of {len(unique_ids)} users.")
+    return {row['id']: row for row in result}
+
+
+async def create_refresh_token(user_id: int, family_id: Optional[bytes] = None) -> str:
+    """
+    Создаёт refresh-токен пользователя и возвращает его.
+    Без `family_id` начинается новая цепочка ротаций (новый вход).
+
+    Каждая ротация добавляет строку, поэтому при выдаче любого токена (и при входе, и при ротации)
+    из таблицы удаляются истёкшие токены пользователя: их количество ограничено количеством
+    ротаций за время жизни токена.
+    """
+    now = time.time()
+    if family_id is None:
+        family_id = generate_family_id()
+    await database.execute(
+        refresh_tokens.delete().where((refresh_tokens.c.user_id == user_id) & (refresh_tokens.c.expires_at <= now))
+    )
+    token = generate_refresh_token()
+    query = refresh_tokens.insert().values(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id,
+        user_id=user_id,
+        expires_at=now + REFRESH_TOKEN_EXPIRE_SECONDS
+    )
+    await database.execute(query)
+    logger.info(f"Refresh token issued for user {user_id}.")
+    return token
+
+
+async def rotate_refresh_token(token: str):
+    """
+    Обменивает действующий refresh-токен на новый из той же цепочки.
+    Возвращает (пользователь, новый токен) или None, если токен недействителен.
+
+    Старый токен помечается использованным одним UPDATE ... RETURNING, поэтому при одновременных
+    запросах с одним токеном новый токен получит только один из них. Повторное предъявление уже
+    использованного токена означает его утечку: отзывается вся цепочка. Исключение — повторное
+    предъявление в течение REFRESH_TOKEN_REUSE_GRACE_SECONDS после ротации: это проигравший
+    одновременный запрос, и отзыв цепочки сделал бы недействительным токен победившего.
+    """
+    now = time.time()
+    token_hash = hash_refresh_token(token)
+    async with database.transaction(immediate=True):
+        query = refresh_tokens.update() \
+            .where((refresh_tokens.c.token_hash == token_hash)
+                   & refresh_tokens.c.revoked_at.is_(None)
+                   & (refresh_tokens.c.expires_at > now)) \
+            .values(revoked_at=now) \
+            .returning(refresh_tokens.c.user_id, refresh_tokens.c.family_id)
+        row = await database.fetch_one(query)
+        if row is None:
+            stale = await database.fetch_one(
+                select(refresh_tokens.c.family_id, refresh_tokens.c.revoked_at)
+                .where(refresh_tokens.c.token_hash == token_hash)
+            )
+            if stale is not None and stale['revoked_at'] is not None \
+                    and now - stale['revoked_at'] > REFRESH_TOKEN_REUSE_GRACE_SECONDS:
+                logger.warning("Refresh token reuse detected, revoking token family.")
+                await revoke_refresh_token_family(stale['family_id'], now)
+            return None
+
+        user = await get_user_by_id(row['user_id'])
+        if user is None:
+            return None
+        new_token = await create_refresh_token(row['user_id'], row['family_id'])
+    return user, new_token
+
+
+async def revoke_refresh_token_family(family_id: bytes, now: Optional[float] = None):
+    """
+    Отзывает все ещё действующие токены цепочки.
+    """
+    query = refresh_tokens.update() \
+        .where((refresh_tokens.c.family_id == family_id) & refresh_tokens.c.revoked_at.is_(None)) \
+        .values(revoked_at=now or time.time())
+    await database.execute(query)
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """
+    Отзывает цепочку, к которой относится refresh-токен (выход с устройства).
+    Возвращает False, если токен не найден.
+    """
+    query = select(refresh_tokens.c.family_id).where(refresh_tokens.c.token_hash == hash_refresh_token(token))
+    row = await database.fetch_one(query)
+    if row is None:
+        return False
+    await revoke_refresh_token_family(row['family_id'])
+    logger.info("Refresh token family revoked.")
+    return True
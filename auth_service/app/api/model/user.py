@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 
 # Модель для создания нового пользователя
@@ -15,3 +17,20 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Модель для пакетной проверки токенов
+class TokenIntrospectionRequest(BaseModel):
+    tokens: List[str] = Field(max_length=500)
+
+
+# Модель ответа с access- и refresh-токенами
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+
+
+# Модель запроса с refresh-токеном
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
@@ -1,15 +1,42 @@
-from fastapi import APIRouter, HTTPException, status
+import logging
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Response, status
 from sqlalchemy.future import select
 
 from app.api.database.database import users, database
-from app.api.database.db_manager import hash_password, get_user_by_id, verify_password
-from app.api.model.user import UserCreate, UserResponse
-from app.api.utils.jwt import create_access_token, verify_token
+from app.api.database.db_manager import get_user_by_id, get_users_by_ids, create_refresh_token, \
+    rotate_refresh_token, revoke_refresh_token
+from app.api.model.user import UserCreate, UserResponse, TokenIntrospectionRequest, TokenResponse, \
+    RefreshTokenRequest
+from app.api.utils.jwt import create_access_token, key_ring, verify_token
+from app.api.utils.password_pool import PASSWORD_POOL_RETRY_AFTER, PasswordPoolSaturatedError, password_pool
+from app.api.utils.passwords import hash_password, verify_password
+
+# Время кэширования JWKS клиентами (в секундах)
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", default=300))
 
 # Инициализация маршрутизатора
 auth_router = APIRouter()
 
 
+async def run_password_task(func, *args):
+    """
+    Выполняет хэширование или проверку пароля в пуле, не блокируя цикл событий.
+    Если пул перегружен, запрос сразу отклоняется с кодом 503 и заголовком Retry-After.
+    """
+    try:
+        return await password_pool.run(func, *args)
+    except PasswordPoolSaturatedError:
+        logging.warning("Password pool is saturated, rejecting request.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)}
+        )
+
+
 @auth_router.post(
     path='/register',
     response_model=UserResponse,
@@ -24,7 +51,7 @@ async def register_user(user: UserCreate):
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Номер телефона уже зарегистрирован")
 
-    hashed_password = hash_password(user.password)
+    hashed_password = await run_password_task(hash_password, user.password)
     query = users.insert().values(
         phone_number=user.phone_number,
         password_hash=hashed_password,
@@ -35,29 +62,63 @@ async def register_user(user: UserCreate):
     return UserResponse(id=user_id, phone_number=user.phone_number, is_owner=False)
 
 
+def create_user_access_token(db_user) -> str:
+    """
+    Создаёт JWT токен с данными пользователя.
+    """
+    user_data = {
+        "id": db_user['id'],
+        "phone_number": db_user['phone_number'],
+        "is_owner": db_user['is_owner']
+    }
+    return create_access_token(data=user_data)
+
+
 @auth_router.post(
     path='/login',
+    response_model=TokenResponse,
     status_code=status.HTTP_200_OK)
 async def login_user(user: UserCreate):
     """
-    Авторизует пользователя и возвращает JWT токен.
+    Авторизует пользователя и возвращает JWT токен и refresh-токен.
     """
     # Поиск пользователя в базе данных по номеру телефона
     query = select(users).where(user.phone_number == users.c.phone_number)
     db_user = await database.fetch_one(query)
     # Проверка пароля
-    if db_user is None or not verify_password(user.password, db_user['password_hash']):
+    if db_user is None or not await run_password_task(verify_password, user.password, db_user['password_hash']):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-    # Формируем данные для JWT токена с данными пользователя
-    user_data = {
-        "id": db_user['id'],
-        "phone_number": db_user['phone_number'],
-        "is_owner": db_user['is_owner']
-    }
+    # Новая цепочка refresh-токенов для этого входа
+    refresh_token = await create_refresh_token(db_user['id'])
+    return TokenResponse(access_token=create_user_access_token(db_user), refresh_token=refresh_token)
+
+
+@auth_router.post(
+    path='/refresh',
+    response_model=TokenResponse,
+    status_code=status.HTTP_200_OK)
+async def refresh_access_token(payload: RefreshTokenRequest):
+    """
+    Выдаёт новый JWT токен по refresh-токену без проверки пароля.
+    Refresh-токен одноразовый: в ответе возвращается новый, а переданный становится недействительным.
+    """
+    result = await rotate_refresh_token(payload.refresh_token)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    access_token = create_access_token(data=user_data)
-    return {"access_token": access_token, "token_type": "bearer"}
+    db_user, refresh_token = result
+    return TokenResponse(access_token=create_user_access_token(db_user), refresh_token=refresh_token)
+
+
+@auth_router.post(
+    path='/logout',
+    status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(payload: RefreshTokenRequest):
+    """
+    Отзывает refresh-токен и все токены, полученные из него ротацией.
+    """
+    await revoke_refresh_token(payload.refresh_token)
 
 
 @auth_router.get(
@@ -85,3 +146,45 @@ async def get_user(token: str):
         phone_number=user_from_db['phone_number'],
         is_owner=user_from_db['is_owner']
     )
+
+
+@auth_router.post(
+    path="/users/introspect",
+    response_model=List[Optional[UserResponse]],
+    status_code=status.HTTP_200_OK)
+async def introspect_tokens(payload: TokenIntrospectionRequest):
+    """
+    Пакетная проверка JWT токенов.
+    Возвращает список той же длины и в том же порядке, что и переданные токены:
+    данные пользователя для действительного токена или null для недействительного.
+    Все пользователи загружаются одним запросом к базе данных.
+    """
+    # Каждый уникальный токен проверяется один раз
+    token_data = {token: verify_token(token) for token in set(payload.tokens)}
+    users_by_id = await get_users_by_ids(data['id'] for data in token_data.values() if data)
+
+    result = []
+    for token in payload.tokens:
+        data = token_data[token]
+        user_from_db = users_by_id.get(data['id']) if data else None
+        if user_from_db is None:
+            result.append(None)
+            continue
+        result.append(UserResponse(
+            id=user_from_db['id'],
+            phone_number=user_from_db['phone_number'],
+            is_owner=user_from_db['is_owner']
+        ))
+    return result
+
+
+@auth_router.get(
+    path="/.well-known/jwks.json",
+    status_code=status.HTTP_200_OK)
+async def get_jwks(response: Response):
+    """
+    Возвращает открытые ключи проверки JWT токенов (JWKS).
+    Сервисы проверяют токены локально по этим ключам, не обращаясь к auth_service.
+    """
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE}"
+    return key_ring.public_jwks()
@@ -1,15 +1,83 @@
+import json
+import logging
+import os
 from datetime import datetime, timedelta
-from typing import Optional
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
 import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from jwt.algorithms import OKPAlgorithm
 
-# Секретный ключ для подписи JWT токенов
-SECRET_KEY = "SECRET_KEY"
+# Каталог с закрытыми ключами подписи в формате PEM (имя файла без расширения — идентификатор ключа, kid)
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", default="keys")
+# Идентификатор ключа, которым подписываются новые токены (по умолчанию — последний по имени файла)
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
 # Алгоритм, используемый для подписи токенов
-ALGORITHM = "HS256"
+ALGORITHM = "EdDSA"
 # Время истечения токена по умолчанию (в минутах)
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 
+class KeyRing:
+    """
+    Набор ключей подписи Ed25519.
+
+    Новые токены подписываются активным ключом, а проверяются любым ключом из набора.
+    Открытые ключи всех ключей набора публикуются в JWKS, поэтому при ротации новый ключ
+    добавляется в каталог и становится активным, а старый удаляется не раньше, чем истекут
+    подписанные им токены.
+    """
+
+    def __init__(self, keys_dir: str = JWT_KEYS_DIR, active_kid: Optional[str] = JWT_ACTIVE_KID):
+        """
+        Загружает ключи из каталога. Если каталог пуст, создаёт в нём новый ключ.
+        """
+        self.keys_dir = Path(keys_dir)
+        self.keys: Dict[str, Ed25519PrivateKey] = {}
+        for path in sorted(self.keys_dir.glob("*.pem")):
+            self.keys[path.stem] = serialization.load_pem_private_key(path.read_bytes(), password=None)
+        if not self.keys:
+            kid, key = self._generate_key()
+            self.keys[kid] = key
+        self.active_kid = active_kid or max(self.keys)
+        if self.active_kid not in self.keys:
+            raise ValueError(f"Signing key {self.active_kid} not found in {self.keys_dir}")
+        logging.info(f"Loaded {len(self.keys)} JWT signing keys, active key: {self.active_kid}")
+
+    def _generate_key(self) -> Tuple[str, Ed25519PrivateKey]:
+        """Создаёт новый ключ в каталоге ключей и возвращает его идентификатор и сам ключ."""
+        kid = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        self.keys_dir.mkdir(parents=True, exist_ok=True)
+        key = Ed25519PrivateKey.generate()
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        path = self.keys_dir / f"{kid}.pem"
+        path.write_bytes(pem)
+        path.chmod(0o600)
+        logging.warning(f"No JWT signing keys found, generated a new key {kid} in {self.keys_dir}")
+        return kid, key
+
+    @property
+    def signing_key(self) -> Ed25519PrivateKey:
+        """Активный ключ подписи."""
+        return self.keys[self.active_kid]
+
+    def public_jwks(self) -> dict:
+        """Открытые ключи набора в формате JWKS."""
+        jwks = []
+        for kid, key in self.keys.items():
+            jwk = json.loads(OKPAlgorithm.to_jwk(key.public_key()))
+            jwk.update({"kid": kid, "alg": ALGORITHM, "use": "sig"})
+            jwks.append(jwk)
+        return {"keys": jwks}
+
+
+# Глобальный набор ключей подписи
+key_ring = KeyRing()
+
+
 # Генерация JWT токена
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -27,8 +95,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     # Добавляем время истечения в данные токена
     to_encode.update({"exp": expire})
 
-    # Генерируем токен с использованием секретного ключа и алгоритма
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # Подписываем токен активным ключом и указываем его идентификатор в заголовке
+    encoded_jwt = jwt.encode(to_encode, key_ring.signing_key, algorithm=ALGORITHM,
+                             headers={"kid": key_ring.active_kid})
     return encoded_jwt
 
 
@@ -38,8 +107,11 @@ def verify_token(token: str):
     Проверяет валидность JWT токена и возвращает его данные, если токен действителен.
     """
     try:
-        # Декодируем токен и проверяем его подпись и срок действия
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Находим ключ по идентификатору из заголовка и проверяем подпись и срок действия
+        key = key_ring.keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            return None
+        payload = jwt.decode(token, key.public_key(), algorithms=[ALGORITHM])
         return payload  # payload содержит декодированные данные токена
     except jwt.PyJWTError:
         # Возвращаем None, если токен недействителен или истек
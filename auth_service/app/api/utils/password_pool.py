@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+from app.api.utils.metrics import metrics_registry
+
+# Тип пула для хэширования паролей: "thread" (bcrypt отпускает GIL) или "process"
+PASSWORD_POOL_KIND: str = os.getenv("PASSWORD_POOL_KIND", default="thread")
+# Количество потоков (процессов), одновременно выполняющих bcrypt
+PASSWORD_POOL_WORKERS: int = int(os.getenv("PASSWORD_POOL_WORKERS", default=os.cpu_count() or 1))
+# Сколько задач может ожидать свободного обработчика, прежде чем новые запросы начнут отклоняться
+PASSWORD_POOL_MAX_PENDING: int = int(os.getenv("PASSWORD_POOL_MAX_PENDING", default=4 * PASSWORD_POOL_WORKERS))
+# Значение заголовка Retry-After (в секундах) для отклонённых запросов
+PASSWORD_POOL_RETRY_AFTER: int = int(os.getenv("PASSWORD_POOL_RETRY_AFTER", default=1))
+
+T = TypeVar("T")
+
+PASSWORD_POOL_IN_FLIGHT = Gauge(
+    "password_pool_in_flight", "Password hashing tasks running or waiting for a worker",
+    registry=metrics_registry)
+PASSWORD_POOL_QUEUE_DEPTH = Gauge(
+    "password_pool_queue_depth", "Password hashing tasks waiting for a free worker",
+    registry=metrics_registry)
+PASSWORD_POOL_REJECTED = Counter(
+    "password_pool_rejected_total", "Password hashing tasks rejected because the pool was saturated",
+    registry=metrics_registry)
+
+
+class PasswordPoolSaturatedError(Exception):
+    """Пул хэширования паролей перегружен, задача не принята."""
+
+
+class PasswordPool:
+    """
+    Пул для хэширования и проверки паролей вне цикла событий.
+
+    Очередь ожидающих задач ограничена: если все обработчики заняты и очередь заполнена,
+    задача сразу отклоняется с PasswordPoolSaturatedError, а не копится в памяти.
+    """
+
+    def __init__(self, kind: str = PASSWORD_POOL_KIND, workers: int = PASSWORD_POOL_WORKERS,
+                 max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        """
+        Инициализирует пул с типом, количеством обработчиков и размером очереди ожидания.
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+    def start(self):
+        """Создаёт пул обработчиков."""
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            # spawn: дочерние процессы не наследуют потоки и соединения родительского процесса
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        logging.info(f"Password pool started: {self.kind}, {self.workers} workers, {self.max_pending} pending.")
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Выполняет `func(*args)` в пуле и возвращает результат.
+        Выбрасывает PasswordPoolSaturatedError, если пул перегружен.
+        """
+        if self._in_flight >= self.workers + self.max_pending:
+            PASSWORD_POOL_REJECTED.inc()
+            raise PasswordPoolSaturatedError()
+        self.start()
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняемых и ожидающих обработчика задач."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество задач, ожидающих свободного обработчика."""
+        return max(0, self._in_flight - self.workers)
+
+    def close(self):
+        """Останавливает пул, отменяя задачи, которые ещё не начали выполняться."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+# Глобальный пул хэширования паролей
+password_pool = PasswordPool()
+# Значения считываются при сборе метрик, а не обновляются на каждую задачу
+PASSWORD_POOL_IN_FLIGHT.set_function(lambda: password_pool.in_flight)
+PASSWORD_POOL_QUEUE_DEPTH.set_function(lambda: password_pool.queue_depth)
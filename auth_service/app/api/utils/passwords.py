@@ -0,0 +1,34 @@
+import logging
+
+from passlib.context import CryptContext
+
+# Модуль не импортирует базу данных: при PASSWORD_POOL_KIND=process дочерние процессы пула
+# импортируют только его, а не модули, которые при импорте настраивают подключение и применяют миграции
+
+# Инициализация CryptContext для хэширования паролей с использованием алгоритма bcrypt
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Логгер для записи сообщений о выполнении операций
+logger = logging.getLogger(__name__)
+
+
+def hash_password(password: str) -> str:
+    """
+    Хэширует переданный пароль с использованием алгоритма bcrypt.
+    """
+    hashed_password = pwd_context.hash(password)
+    logger.debug(
+        f"Password hashed successfully: {password[:4]}...")  # Логирование успешного хэширования (первые 4 символа пароля)
+    return hashed_password
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверяет, совпадает ли переданный пароль с хэшированным значением.
+    """
+    result = pwd_context.verify(plain_password, hashed_password)
+    if result:
+        logger.debug("Password verification successful.")
+    else:
+        logger.warning("Password verification failed.")
+    return result
@@ -0,0 +1,36 @@
+import hashlib
+import os
+import secrets
+
+# Время жизни refresh-токена (в днях)
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", default=30))
+# Время жизни refresh-токена (в секундах)
+REFRESH_TOKEN_EXPIRE_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+# Сколько секунд после ротации повторное предъявление старого токена считается гонкой одновременных
+# запросов (например, двух вкладок), а не утечкой: запрос отклоняется, но цепочка не отзывается
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", default=10))
+
+
+# Генерация refresh-токена
+def generate_refresh_token() -> str:
+    """
+    Создает случайный непрозрачный refresh-токен.
+    """
+    return secrets.token_urlsafe(32)
+
+
+# Генерация идентификатора цепочки refresh-токенов
+def generate_family_id() -> bytes:
+    """
+    Создает идентификатор цепочки ротаций refresh-токенов одного входа.
+    """
+    return secrets.token_bytes(16)
+
+
+# Хэширование refresh-токена
+def hash_refresh_token(token: str) -> bytes:
+    """
+    Возвращает SHA-256 от refresh-токена. В базе данных хранится только хэш,
+    поэтому утечка таблицы не раскрывает действующие токены.
+    """
+    return hashlib.sha256(token.encode()).digest()
@@ -5,22 +5,39 @@ from fastapi import FastAPI
 
 from app.api.database.database import database
 from app.api.routers.auth_router import auth_router
+from app.api.utils.metrics import setup_metrics
+from app.api.utils.password_pool import password_pool
+from app.api.utils.query_profiler import setup_query_profiler
 
 # Устанавливаем уровень логирования
 logging.basicConfig(level=logging.INFO)
 
+# Бюджеты запросов к базе данных по маршрутам: проверяются профилировщиком запросов
+# (предупреждение в режиме отладки, ошибка при QUERY_BUDGETS_ENFORCED в тестах)
+QUERY_BUDGETS = {
+    "POST /api/v1/auth/register": 2,
+    "POST /api/v1/auth/login": 3,
+    "POST /api/v1/auth/refresh": 4,
+    "POST /api/v1/auth/logout": 2,
+    "GET /api/v1/auth/user": 1,
+    "POST /api/v1/auth/users/introspect": 1,
+    "GET /api/v1/auth/.well-known/jwks.json": 0,
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Управление жизненным циклом приложения.
-    Выполняет подключение к базе данных при запуске приложения
-    и разрывает соединение при его остановке.
+    Выполняет подключение к базе данных и запуск пула хэширования паролей при запуске приложения,
+    разрывает соединение и останавливает пул при его остановке.
     """
     await database.connect()
+    password_pool.start()
     try:
         yield
     finally:
+        password_pool.close()
         await database.disconnect()
 
 
@@ -33,3 +50,8 @@ app = FastAPI(
 
 # Включаем маршруты
 app.include_router(auth_router, prefix='/api/v1/auth', tags=['auth'])
+
+# Метрики в формате Prometheus на /metrics
+setup_metrics(app)
+# Профилирование запросов к базе данных в режиме отладки (QUERY_PROFILER_ENABLED)
+setup_query_profiler(app, budgets=QUERY_BUDGETS)
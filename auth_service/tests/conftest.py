@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Тесты импортируют пакет `app` из каталога сервиса и общие помощники тестов из корня репозитория
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.append(str(SERVICE_DIR.parent))
+
+# Временные база данных и ключи подписи задаются до импорта приложения:
+# схема создаётся миграциями, а ключ — набором ключей при импорте
+TEST_DIR = tempfile.mkdtemp(prefix="auth-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.sqlite"
+os.environ["JWT_KEYS_DIR"] = f"{TEST_DIR}/keys"
+# Профилировщик запросов включается при импорте приложения, превышение бюджета запросов — ошибка
+os.environ["QUERY_PROFILER_ENABLED"] = "true"
+os.environ["QUERY_BUDGETS_ENFORCED"] = "true"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """Клиент приложения, подключённого к базе данных тестов (вместо lifespan приложения)."""
+    from httpx import ASGITransport, AsyncClient
+
+    from app.api.database.database import database
+    from app.api.utils.password_pool import password_pool
+    from app.main import app
+
+    await database.connect()
+    password_pool.start()
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        password_pool.close()
+        await database.disconnect()
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.api.utils.password_pool import PasswordPool
+from app.api.utils.passwords import hash_password, verify_password
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_password_helpers_do_not_import_database():
+    # Дочерний процесс пула импортирует модуль с функцией задачи, как это делает ProcessPoolExecutor
+    loaded = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, app.api.utils.passwords; print(sorted(m for m in sys.modules if m.startswith('app.')))"],
+        cwd=SERVICE_DIR, capture_output=True, text=True, check=True).stdout
+
+    assert "app.api.database" not in loaded
+
+
+@pytest.mark.anyio
+async def test_process_pool_hashes_and_verifies_passwords():
+    pool = PasswordPool(kind="process", workers=1, max_pending=1)
+    try:
+        hashed = await pool.run(hash_password, "secret123")
+        assert await pool.run(verify_password, "secret123", hashed)
+        assert not await pool.run(verify_password, "wrong", hashed)
+    finally:
+        pool.close()
@@ -0,0 +1,52 @@
+import logging
+
+import jwt
+import pytest
+
+from app.main import QUERY_BUDGETS
+from testing.query_budgets import assert_budgets_exercised
+
+PREFIX = "/api/v1/auth"
+
+
+@pytest.mark.anyio
+async def test_routes_respond_within_query_budgets(client, caplog):
+    """Сценарий вызывает каждый маршрут из QUERY_BUDGETS и проверяет ответы."""
+    caplog.set_level(logging.INFO)
+
+    async def request(method: str, path: str, **kwargs):
+        # Превышение бюджета поднимает QueryBudgetExceededError из транспорта
+        response = await client.request(method, PREFIX + path, **kwargs)
+        assert response.is_success, response.text
+        return response
+
+    credentials = {"phone_number": "+79990000001", "password": "secret123"}
+    registered = (await request("POST", "/register", json=credentials)).json()
+    assert registered["phone_number"] == credentials["phone_number"] and not registered["is_owner"]
+    duplicate = await client.post(f"{PREFIX}/register", json=credentials)
+    assert duplicate.status_code == 400
+
+    wrong_password = await client.post(f"{PREFIX}/login", json={**credentials, "password": "wrong"})
+    assert wrong_password.status_code == 401
+    login = (await request("POST", "/login", json=credentials)).json()
+
+    tokens = (await request("POST", "/refresh", json={"refresh_token": login["refresh_token"]})).json()
+    assert tokens["refresh_token"] != login["refresh_token"]
+    # Повторное использование refresh-токена отклоняется
+    reused = await client.post(f"{PREFIX}/refresh", json={"refresh_token": login["refresh_token"]})
+    assert reused.status_code == 401
+
+    user = (await request("GET", "/user", params={"token": tokens["access_token"]})).json()
+    assert user == registered
+    introspected = await request("POST", "/users/introspect", json={"tokens": [tokens["access_token"], "invalid"]})
+    assert introspected.json() == [registered, None]
+
+    await request("POST", "/logout", json={"refresh_token": tokens["refresh_token"]})
+    logged_out = await client.post(f"{PREFIX}/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert logged_out.status_code == 401
+
+    # Access-токен подписан ключом, опубликованным в JWKS
+    jwks = (await request("GET", "/.well-known/jwks.json")).json()
+    assert jwt.get_unverified_header(tokens["access_token"])["kid"] in {key["kid"] for key in jwks["keys"]}
+
+    assert_budgets_exercised(caplog.records, QUERY_BUDGETS)
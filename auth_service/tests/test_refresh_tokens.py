@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from app.api.database import db_manager
+from app.api.database.database import database, refresh_tokens, users
+from app.api.utils.refresh_token import generate_family_id, hash_refresh_token
+
+
+@pytest.fixture
+async def user_id():
+    """Пользователь в базе данных тестов."""
+    await database.connect()
+    try:
+        yield await database.execute(users.insert().values(
+            phone_number=f"+7{time.time_ns() % 10 ** 10:010d}", password_hash="-", is_owner=False))
+    finally:
+        await database.disconnect()
+
+
+async def count_tokens(user_id: int) -> int:
+    return await database.fetch_val(
+        select(func.count()).select_from(refresh_tokens).where(refresh_tokens.c.user_id == user_id))
+
+
+@pytest.mark.anyio
+async def test_rotation_purges_expired_tokens(user_id):
+    token = await db_manager.create_refresh_token(user_id)
+    await database.execute(refresh_tokens.insert().values(
+        token_hash=hash_refresh_token("expired"), family_id=generate_family_id(), user_id=user_id,
+        expires_at=time.time() - 1, revoked_at=time.time() - 1))
+
+    for _ in range(5):
+        _, token = await db_manager.rotate_refresh_token(token)
+
+    # Истёкший токен удалён, остались только токены цепочки, выданные ротациями
+    assert await count_tokens(user_id) == 6
+    assert await database.fetch_one(
+        select(refresh_tokens.c.id).where(refresh_tokens.c.token_hash == hash_refresh_token("expired"))) is None
+
+
+@pytest.mark.anyio
+async def test_concurrent_refresh_keeps_winner_token(user_id):
+    token = await db_manager.create_refresh_token(user_id)
+    _, winner_token = await db_manager.rotate_refresh_token(token)
+
+    # Проигравший одновременный запрос с тем же токеном отклоняется, цепочка не отзывается
+    assert await db_manager.rotate_refresh_token(token) is None
+    assert await db_manager.rotate_refresh_token(winner_token) is not None
+
+
+@pytest.mark.anyio
+async def test_reuse_after_grace_revokes_family(user_id, monkeypatch):
+    monkeypatch.setattr(db_manager, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", -1)
+    token = await db_manager.create_refresh_token(user_id)
+    _, new_token = await db_manager.rotate_refresh_token(token)
+
+    assert await db_manager.rotate_refresh_token(token) is None
+    assert await db_manager.rotate_refresh_token(new_token) is None
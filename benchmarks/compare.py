@@ -0,0 +1,85 @@
+"""
+Сравнение двух отчётов benchmarks.run: изменения перцентилей времени ответа и пропускной способности.
+
+Пример:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Завершается с кодом 1, если p95 какого-либо эндпоинта вырос больше чем на `--threshold` процентов.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+# Сравниваемые показатели времени ответа
+PERCENTILES = ("p50", "p95", "p99")
+
+
+def change(baseline: float, candidate: float) -> Optional[float]:
+    """Изменение в процентах относительно базового значения или None, если базовое значение нулевое."""
+    if not baseline:
+        return None
+    return (candidate - baseline) / baseline * 100
+
+
+def format_change(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> (List[str], List[str]):
+    """
+    Строит таблицу сравнения по эндпоинтам и сценариям, которые есть в обоих отчётах.
+
+    :return: Строки таблицы и список эндпоинтов, p95 которых вырос больше чем на threshold процентов
+    """
+    header = f"{'endpoint':<64} {'rps':>16}" + "".join(f" {name:>22}" for name in PERCENTILES)
+    lines = [header, "-" * len(header)]
+    regressions = []
+    for section in ("endpoints", "scenarios"):
+        for name in sorted(set(baseline.get(section, {})) & set(candidate.get(section, {}))):
+            before, after = baseline[section][name], candidate[section][name]
+            row = f"{name:<64} {after['throughput_rps']:>8.1f} {format_change(change(before['throughput_rps'], after['throughput_rps'])):>7}"
+            for percentile in PERCENTILES:
+                value = after["latency_ms"][percentile]
+                delta = change(before["latency_ms"][percentile], value)
+                row += f" {value:>12.2f}ms {format_change(delta):>7}"
+                if percentile == "p95" and section == "endpoints" and delta is not None and delta > threshold:
+                    regressions.append(name)
+            lines.append(row)
+    for section in ("endpoints", "scenarios"):
+        for name in sorted(set(baseline.get(section, {})) ^ set(candidate.get(section, {}))):
+            lines.append(f"{name:<64} only in {'baseline' if name in baseline[section] else 'candidate'}")
+    return lines, regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline", help="report of the base revision")
+    parser.add_argument("candidate", help="report of the revision under test")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="allowed p95 growth of an endpoint in percent before the comparison fails")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.candidate) as file:
+        candidate = json.load(file)
+
+    print(f"baseline {baseline['meta']['revision']}: {baseline['summary']['throughput_rps']} rps, "
+          f"{baseline['summary']['errors']} errors")
+    print(f"candidate {candidate['meta']['revision']}: {candidate['summary']['throughput_rps']} rps, "
+          f"{candidate['summary']['errors']} errors")
+    if baseline["meta"]["fixture"] != candidate["meta"]["fixture"] \
+            or baseline["meta"]["concurrency"] != candidate["meta"]["concurrency"] \
+            or baseline["meta"]["mix"] != candidate["meta"]["mix"]:
+        print("warning: reports were produced with different fixtures, concurrency or scenario mix")
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"p95 regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import random
+import sqlite3
+from typing import Callable, Dict, List, NamedTuple
+
+# Пароль всех пользователей фикстуры
+FIXTURE_PASSWORD = "bench-password"
+
+# Словари для генерации названий и ингредиентов блюд
+DISH_WORDS = ["суп", "салат", "паста", "пицца", "бургер", "рамен", "плов", "шашлык", "ролл", "пирог",
+              "каша", "омлет", "стейк", "карри", "тако", "лазанья", "борщ", "пельмени", "вок", "боул"]
+DISH_ADJECTIVES = ["домашний", "острый", "фирменный", "летний", "сливочный", "овощной", "мясной", "рыбный"]
+INGREDIENTS = ["соль", "перец", "лук", "чеснок", "морковь", "картофель", "капуста", "свекла", "томаты",
+               "огурцы", "сыр", "сливки", "масло", "мука", "яйца", "курица", "говядина", "свинина",
+               "лосось", "креветки", "рис", "лапша", "грибы", "шпинат", "базилик", "укроп", "петрушка",
+               "кинза", "лимон", "имбирь", "соевый соус", "кунжут", "орехи", "арахис", "мед", "горчица",
+               "майонез", "сметана", "фасоль", "нут", "баклажан", "кабачок", "перец чили", "оливки"]
+
+
+class Fixture(NamedTuple):
+    """
+    Сгенерированные данные, которые используют сценарии нагрузки.
+
+    :param path: Путь к файлу базы данных
+    :param restaurant_ids: ID всех ресторанов
+    :param dish_ids: ID блюд каждого ресторана
+    :param owner_restaurants: ID ресторанов каждого владельца
+    :param users: Телефон и флаг владельца каждого пользователя по его ID
+    """
+    path: str
+    restaurant_ids: List[int]
+    dish_ids: Dict[int, List[int]]
+    owner_restaurants: Dict[int, List[int]]
+    users: Dict[int, tuple]
+
+
+def generate_fixture(path: str, restaurants: int, dishes: int, users: int, owners: int, seed: int,
+                     password_hash: str, index_dishes: Callable[[sqlite3.Connection], None]) -> Fixture:
+    """
+    Заполняет базу данных (схема уже создана миграциями сервисов) воспроизводимыми данными:
+    `users` пользователей, из них первые `owners` — владельцы, `restaurants` ресторанов, распределённых
+    между владельцами по кругу, и по `dishes` блюд в каждом ресторане.
+
+    :param password_hash: Хэш FIXTURE_PASSWORD (bcrypt считается один раз для всех пользователей)
+    :param index_dishes: Функция миграции, строящая индекс ингредиентов для уже записанных блюд
+    """
+    rng = random.Random(seed)
+    owners = max(1, min(owners, users))
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            connection.executemany(
+                "INSERT INTO users (id, phone_number, password_hash, is_owner) VALUES (?, ?, ?, ?)",
+                [(user_id, f"+7900{user_id:07d}", password_hash, user_id <= owners)
+                 for user_id in range(1, users + 1)]
+            )
+            connection.executemany(
+                "INSERT INTO restaurants (id, name, address, user_id) VALUES (?, ?, ?, ?)",
+                [(restaurant_id, f"Ресторан {restaurant_id}", f"ул. Тестовая, {restaurant_id}",
+                  (restaurant_id - 1) % owners + 1)
+                 for restaurant_id in range(1, restaurants + 1)]
+            )
+            dish_rows = []
+            for restaurant_id in range(1, restaurants + 1):
+                for number in range(dishes):
+                    name = f"{rng.choice(DISH_ADJECTIVES)} {rng.choice(DISH_WORDS)} {number}"
+                    ingredients = ", ".join(rng.sample(INGREDIENTS, rng.randint(2, 6)))
+                    dish_rows.append((name, ingredients, round(rng.uniform(100, 1500), 2), restaurant_id))
+            connection.executemany(
+                "INSERT INTO dishes (name, ingredients, price, restaurant_id) VALUES (?, ?, ?, ?)", dish_rows)
+            index_dishes(connection)
+        connection.execute("ANALYZE")
+
+        dish_ids: Dict[int, List[int]] = {}
+        for dish_id, restaurant_id in connection.execute("SELECT id, restaurant_id FROM dishes ORDER BY id"):
+            dish_ids.setdefault(restaurant_id, []).append(dish_id)
+        owner_restaurants: Dict[int, List[int]] = {}
+        for restaurant_id, user_id in connection.execute("SELECT id, user_id FROM restaurants ORDER BY id"):
+            owner_restaurants.setdefault(user_id, []).append(restaurant_id)
+        fixture_users = {
+            user_id: (phone_number, bool(is_owner))
+            for user_id, phone_number, is_owner in connection.execute("SELECT id, phone_number, is_owner FROM users")
+        }
+    finally:
+        connection.close()
+    restaurant_ids = sorted(restaurant_id for ids in owner_restaurants.values() for restaurant_id in ids)
+    return Fixture(path=path, restaurant_ids=restaurant_ids, dish_ids=dish_ids,
+                   owner_restaurants=owner_restaurants, users=fixture_users)
@@ -0,0 +1,191 @@
+"""
+Нагрузочный прогон трёх сервисов в одном процессе.
+
+Пример:
+    python -m benchmarks.run --restaurants 200 --dishes 50 --users 1000 --concurrency 32 --duration 30 \
+        --mix browse=70,order=15,owner_poll=10,menu_edit=4,login=1 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.fixture import FIXTURE_PASSWORD, generate_fixture
+from benchmarks.scenarios import SCENARIOS, Context, Recorder
+from benchmarks.services import REPO_ROOT, ServiceStack, StubAuth
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Разбирает веса сценариев вида `browse=70,order=15`."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="In-process load test of auth_service, user_service and owner_service")
+    parser.add_argument("--restaurants", type=int, default=200, help="number of restaurants in the fixture")
+    parser.add_argument("--dishes", type=int, default=50, help="dishes per restaurant")
+    parser.add_argument("--users", type=int, default=1000, help="number of users")
+    parser.add_argument("--owners", type=int, default=50, help="how many of the users own restaurants")
+    parser.add_argument("--concurrency", type=int, default=32, help="number of concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured run time in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured warm-up time in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("browse=70,order=15,owner_poll=10,menu_edit=4,login=1"),
+                        help="scenario weights, e.g. browse=70,order=15")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the fixture and of the scenario choice")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--log-level", default="WARNING", help="log level of the services")
+    return parser.parse_args(argv)
+
+
+def summarize(latencies: List[float], duration: float) -> dict:
+    """Количество, пропускная способность и перцентили времени ответа (в миллисекундах)."""
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        # Перцентиль по рангу: наименьшее значение, не меньше которого p% измерений
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "throughput_rps": round(len(ordered) / duration, 2),
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+    }
+
+
+def git_revision() -> str:
+    """Текущий коммит репозитория (для сопоставления отчётов)."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def worker(ctx: Context, mix: Dict[str, float], rng: random.Random, deadline: float):
+    """Виртуальный пользователь: выполняет случайные сценарии по их весам до окончания прогона."""
+    names, weights = list(mix), list(mix.values())
+    etags: Dict[str, str] = {}
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            await SCENARIOS[name](ctx, rng, etags)
+        except Exception as e:
+            logging.exception(f"Scenario {name} failed: {e!r}")
+            ctx.recorder.record(f"scenario {name}", time.perf_counter() - started, 0, False)
+            continue
+        ctx.recorder.record_scenario(name, time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, workdir: str) -> dict:
+    """Создаёт фикстуру, запускает сервисы и нагрузку и возвращает отчёт."""
+    database_path = os.path.join(workdir, "bench.sqlite")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ["JWT_KEYS_DIR"] = os.path.join(workdir, "keys")
+    # Схема создаётся миграциями при импорте сервисов
+    stack = ServiceStack()
+    logging.getLogger().setLevel(args.log_level)
+
+    auth_passwords = stack["auth"].module("utils.passwords")
+    fixture = generate_fixture(
+        database_path, args.restaurants, args.dishes, args.users, args.owners, args.seed,
+        password_hash=auth_passwords.hash_password(FIXTURE_PASSWORD),
+        index_dishes=stack["auth"].module("database.migrations").index_existing_dishes,
+    )
+    auth = StubAuth(fixture.users)
+    await stack.start(auth)
+
+    clients = {
+        name: httpx.AsyncClient(transport=httpx.ASGITransport(app=stack[name].app), base_url=f"http://{name}_service",
+                                timeout=60)
+        for name in stack.services
+    }
+    recorder = Recorder()
+    ctx = Context(clients, fixture, recorder)
+    try:
+        started = time.monotonic()
+        deadline = started + args.warmup + args.duration
+        tasks = [asyncio.create_task(worker(ctx, args.mix, random.Random(args.seed * 1000 + index), deadline))
+                 for index in range(args.concurrency)]
+        await asyncio.sleep(args.warmup)
+        recorder.enabled = True
+        measured_from = time.monotonic()
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - measured_from
+        broker_lag = stack.broker.lag
+    finally:
+        for client in clients.values():
+            await client.aclose()
+        await stack.stop()
+
+    requests = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fixture": {"restaurants": args.restaurants, "dishes": args.dishes, "users": args.users,
+                        "owners": args.owners, "seed": args.seed},
+            "concurrency": args.concurrency,
+            "duration_s": round(duration, 3),
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "order_publish_mode": stack["user"].module("rabbit.outbox").ORDER_PUBLISH_MODE,
+        },
+        "summary": {
+            "requests": requests,
+            "errors": sum(recorder.errors.values()),
+            "throughput_rps": round(requests / duration, 2),
+            "broker_lag_at_end": broker_lag,
+        },
+        "endpoints": {
+            endpoint: {
+                **summarize(latencies, duration),
+                "errors": recorder.errors.get(endpoint, 0),
+                "statuses": {str(code): count for code, count in sorted(recorder.statuses[endpoint].items())},
+            }
+            for endpoint, latencies in sorted(recorder.latencies.items())
+        },
+        "scenarios": {name: summarize(latencies, duration) for name, latencies in sorted(recorder.scenarios.items())},
+    }
+
+
+def main(argv: List[str] = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    with tempfile.TemporaryDirectory(prefix="allfood-bench-") as workdir:
+        report = asyncio.run(run(args, workdir))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
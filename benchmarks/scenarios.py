@@ -0,0 +1,148 @@
+import random
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fixture import FIXTURE_PASSWORD, Fixture
+from benchmarks.services import StubAuth
+
+# Префиксы API сервисов
+AUTH_PREFIX = "/api/v1/auth"
+USER_PREFIX = "/api/v1/user"
+OWNER_PREFIX = "/api/v1/owner"
+
+
+class Recorder:
+    """
+    Накопитель результатов: время ответа и коды статуса по эндпоинтам (шаблонам маршрутов)
+    и время выполнения сценариев. Пока `enabled` ложно (прогрев), ничего не записывается.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.scenarios: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, endpoint: str, latency: float, status_code: int, ok: bool):
+        if not self.enabled:
+            return
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status_code] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def record_scenario(self, name: str, latency: float):
+        if self.enabled:
+            self.scenarios[name].append(latency)
+
+
+class Context:
+    """Общее состояние сценариев одного прогона: клиенты сервисов, фикстура и накопитель результатов."""
+
+    def __init__(self, clients: Dict[str, httpx.AsyncClient], fixture: Fixture, recorder: Recorder):
+        self.clients = clients
+        self.fixture = fixture
+        self.recorder = recorder
+        self.customers = [user_id for user_id, (_, is_owner) in fixture.users.items() if not is_owner] \
+            or list(fixture.users)
+        self.owners = sorted(fixture.owner_restaurants)
+
+    async def request(self, service: str, method: str, endpoint: str, url: str,
+                      expected=(200,), **kwargs) -> httpx.Response:
+        """
+        Выполняет запрос к сервису и записывает время ответа под именем `endpoint`
+        (шаблон маршрута, чтобы запросы к разным ресторанам попадали в один эндпоинт).
+        Статус не из `expected` считается ошибкой.
+        """
+        started = time.perf_counter()
+        response = await self.clients[service].request(method, url, **kwargs)
+        self.recorder.record(f"{method} {endpoint}", time.perf_counter() - started,
+                             response.status_code, response.status_code in expected)
+        return response
+
+
+async def browse(ctx: Context, rng: random.Random, etags: Dict[str, str]):
+    """
+    Пользователь открывает список ресторанов, меню одного из них и иногда фильтрует меню или ищет.
+    Как мобильное приложение, повторно запрашивает уже полученные страницы с If-None-Match.
+    """
+    async def get(endpoint: str, url: str, params: Optional[dict] = None):
+        key = url + str(sorted((params or {}).items()))
+        headers = {"If-None-Match": etags[key]} if key in etags else {}
+        response = await ctx.request("user", "GET", USER_PREFIX + endpoint, USER_PREFIX + url,
+                                     expected=(200, 304), params=params, headers=headers)
+        if "etag" in response.headers:
+            etags[key] = response.headers["etag"]
+
+    await get("/restaurants", "/restaurants", {"limit": 50})
+    restaurant_id = rng.choice(ctx.fixture.restaurant_ids)
+    await get("/restaurants/{restaurant_id}/dishes", f"/restaurants/{restaurant_id}/dishes", {"limit": 100})
+    roll = rng.random()
+    if roll < 0.2:
+        await get("/restaurants/{restaurant_id}/dishes/facets", f"/restaurants/{restaurant_id}/dishes/facets")
+        await get("/restaurants/{restaurant_id}/dishes", f"/restaurants/{restaurant_id}/dishes",
+                  {"max_price": 800, "exclude": "орехи"})
+    elif roll < 0.35:
+        await ctx.request("user", "GET", USER_PREFIX + "/search", USER_PREFIX + "/search",
+                          params={"q": rng.choice(["суп", "паста остр", "бургер", "салат"]), "limit": 20})
+
+
+async def order(ctx: Context, rng: random.Random, etags: Dict[str, str]):
+    """Пользователь заказывает несколько блюд одного ресторана."""
+    restaurant_id = rng.choice(ctx.fixture.restaurant_ids)
+    dish_ids = ctx.fixture.dish_ids.get(restaurant_id) or [0]
+    user_id = rng.choice(ctx.customers)
+    payload = {
+        "dishes": [{"id": dish_id, "quantity": rng.randint(1, 3)}
+                   for dish_id in rng.sample(dish_ids, min(len(dish_ids), rng.randint(1, 4)))],
+        "address": "ул. Тестовая, 1",
+        "phone_number": ctx.fixture.users[user_id][0],
+        "restaurant_id": restaurant_id,
+    }
+    await ctx.request("user", "POST", USER_PREFIX + "/order", USER_PREFIX + "/order", expected=(201,),
+                      params={"token": StubAuth.token(user_id)}, json=payload)
+
+
+async def owner_poll(ctx: Context, rng: random.Random, etags: Dict[str, str]):
+    """Владелец опрашивает список заказов своего ресторана."""
+    owner_id = rng.choice(ctx.owners)
+    restaurant_id = rng.choice(ctx.fixture.owner_restaurants[owner_id])
+    await ctx.request("owner", "GET", OWNER_PREFIX + "/orders/{restaurant_id}",
+                      f"{OWNER_PREFIX}/orders/{restaurant_id}",
+                      params={"token": StubAuth.token(owner_id), "limit": 50})
+
+
+async def menu_edit(ctx: Context, rng: random.Random, etags: Dict[str, str]):
+    """Владелец просматривает меню своего ресторана и меняет цену блюда."""
+    owner_id = rng.choice(ctx.owners)
+    restaurant_id = rng.choice(ctx.fixture.owner_restaurants[owner_id])
+    token = StubAuth.token(owner_id)
+    await ctx.request("owner", "GET", OWNER_PREFIX + "/restaurant/{restaurant_id}/dish",
+                      f"{OWNER_PREFIX}/restaurant/{restaurant_id}/dish", params={"token": token, "limit": 100})
+    dish_ids = ctx.fixture.dish_ids.get(restaurant_id)
+    if dish_ids:
+        dish_id = rng.choice(dish_ids)
+        await ctx.request("owner", "PUT", OWNER_PREFIX + "/restaurant/{restaurant_id}/dish/{dish_id}",
+                          f"{OWNER_PREFIX}/restaurant/{restaurant_id}/dish/{dish_id}",
+                          params={"token": token}, json={"price": round(rng.uniform(100, 1500), 2)})
+
+
+async def login(ctx: Context, rng: random.Random, etags: Dict[str, str]):
+    """Пользователь входит по телефону и паролю (проверка bcrypt в auth_service)."""
+    user_id = rng.choice(list(ctx.fixture.users))
+    await ctx.request("auth", "POST", AUTH_PREFIX + "/login", AUTH_PREFIX + "/login",
+                      json={"phone_number": ctx.fixture.users[user_id][0], "password": FIXTURE_PASSWORD})
+
+
+# Сценарии нагрузки по имени
+SCENARIOS: Dict[str, Callable[[Context, random.Random, Dict[str, str]], Awaitable[None]]] = {
+    "browse": browse,
+    "order": order,
+    "owner_poll": owner_poll,
+    "menu_edit": menu_edit,
+    "login": login,
+}
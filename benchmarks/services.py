@@ -0,0 +1,210 @@
+import asyncio
+import importlib
+import json
+import logging
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Optional
+
+# Корень репозитория: каталоги сервисов лежат рядом с каталогом benchmarks
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SERVICE_NAMES = ("auth", "user", "owner")
+
+
+class Service:
+    """
+    Сервис, загруженный в текущий процесс: ASGI-приложение и модули его пакета `app`.
+
+    Все сервисы называют свой пакет `app`, поэтому каждый импортируется отдельно: модули
+    предыдущего сервиса убираются из sys.modules (приложение продолжает ссылаться на них)
+    и сохраняются в `modules`.
+    """
+
+    def __init__(self, name: str):
+        """Импортирует `app.main` сервиса `name` из каталога `<name>_service`."""
+        self.name = name
+        service_dir = str(REPO_ROOT / f"{name}_service")
+        self._forget_app_modules()
+        sys.path.insert(0, service_dir)
+        try:
+            self.app = importlib.import_module("app.main").app
+        finally:
+            sys.path.remove(service_dir)
+        self.modules: Dict[str, ModuleType] = self._forget_app_modules()
+
+    @staticmethod
+    def _forget_app_modules() -> Dict[str, ModuleType]:
+        """Убирает модули пакета `app` из sys.modules и возвращает их."""
+        names = [name for name in sys.modules if name == "app" or name.startswith("app.")]
+        return {name: sys.modules.pop(name) for name in names}
+
+    def module(self, name: str) -> ModuleType:
+        """Возвращает модуль сервиса по имени без префикса `app.api.`, например `database.database`."""
+        return self.modules[f"app.api.{name}"]
+
+
+class InMemoryMessage:
+    """Сообщение брокера в памяти с интерфейсом входящего сообщения aio-pika, нужным потребителям."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        # Брокер в памяти доставляет каждое сообщение один раз
+        self.redelivered = False
+
+    async def ack(self):
+        pass
+
+    async def nack(self, requeue: bool = True):
+        pass
+
+
+class InMemoryBroker:
+    """
+    Замена RabbitMQ в памяти процесса.
+
+    Для user_service работает как RabbitMQProducer (send_message/send_batch): публикация
+    подтверждается сразу после постановки в очередь, как брокер подтверждает сохранённое сообщение.
+    Отдельная задача доставляет заказы потребителю owner_service пакетами, как это делают его
+    обработчики. События каталога owner_service сразу передаются подписчику user_service.
+    """
+
+    def __init__(self, consumer, subscriber):
+        """
+        :param consumer: Потребитель заказов owner_service (RabbitMQOrderConsumer)
+        :param subscriber: Подписчик событий каталога user_service (CatalogEventSubscriber)
+        """
+        self.consumer = consumer
+        self.subscriber = subscriber
+        self.published = 0
+        self.delivered = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_connected(self) -> bool:
+        return True
+
+    async def send_message(self, message: dict):
+        await self.send_batch([message])
+
+    async def send_batch(self, messages: List[dict]) -> List[bool]:
+        for message in messages:
+            self._queue.put_nowait(InMemoryMessage(json.dumps(message).encode()))
+        self.published += len(messages)
+        return [True] * len(messages)
+
+    async def publish_catalog_event(self, event: dict):
+        await self.subscriber._on_message(InMemoryMessage(json.dumps(event).encode()))
+
+    async def _deliver(self):
+        """Доставляет заказы потребителю пакетами из всех уже опубликованных сообщений."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.consumer.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self.consumer.process_batch(batch)
+            except Exception as e:
+                logging.error(f"In-memory broker failed to deliver orders: {e}")
+            self.delivered += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._deliver())
+
+    async def stop(self):
+        """Дожидается доставки опубликованных заказов и останавливает доставку."""
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    @property
+    def lag(self) -> int:
+        """Количество опубликованных, но ещё не доставленных заказов."""
+        return self.published - self.delivered
+
+
+class StubAuth:
+    """
+    Замена проверки JWT токенов по JWKS в user_service и owner_service: токены фикстуры
+    заранее сопоставлены пользователям, поэтому проверка не обращается к auth_service.
+    """
+
+    def __init__(self, users: Dict[int, tuple]):
+        """:param users: Телефон и флаг владельца каждого пользователя по его ID"""
+        self.claims = {
+            self.token(user_id): {"id": user_id, "phone_number": phone_number, "is_owner": is_owner}
+            for user_id, (phone_number, is_owner) in users.items()
+        }
+
+    @staticmethod
+    def token(user_id: int) -> str:
+        """Токен пользователя фикстуры."""
+        return f"bench-{user_id}"
+
+    async def decode(self, token: str) -> Optional[dict]:
+        return self.claims.get(token)
+
+    async def close(self):
+        pass
+
+
+class ServiceStack:
+    """
+    Три сервиса в одном процессе поверх общей базы данных фикстуры.
+
+    Вместо lifespan приложений запускаются только нужные для нагрузки части: подключения к базе
+    данных, пул хэширования паролей и ретранслятор заказов, а RabbitMQ и проверка токенов
+    заменены на InMemoryBroker и StubAuth.
+    """
+
+    def __init__(self):
+        """Импортирует сервисы. DATABASE_URL и другие переменные окружения должны быть уже заданы."""
+        self.services = {name: Service(name) for name in SERVICE_NAMES}
+        self.broker: Optional[InMemoryBroker] = None
+
+    def __getitem__(self, name: str) -> Service:
+        return self.services[name]
+
+    def databases(self) -> list:
+        """Все пулы подключений к базе данных сервисов."""
+        user_database = self["user"].module("database.database")
+        return [
+            self["auth"].module("database.database").database,
+            user_database.database,
+            user_database.read_database,
+            self["owner"].module("database.database").database,
+        ]
+
+    async def start(self, auth: StubAuth):
+        """Подключает сервисы к базе данных и заменяет внешние зависимости."""
+        for database in self.databases():
+            await database.connect()
+        self["auth"].module("utils.password_pool").password_pool.start()
+
+        self.broker = InMemoryBroker(
+            consumer=self["owner"].module("rabbit.rabbitmq_order_consumer").order_consumer,
+            subscriber=self["user"].module("rabbit.catalog_events").catalog_subscriber,
+        )
+        self.broker.start()
+        # Заказы user_service
+        self["user"].module("router.order_router").rabbit_producer = self.broker
+        self["user"].module("router.order_router").jwks_client = auth
+        outbox = self["user"].module("rabbit.outbox")
+        outbox.order_outbox_relay.producer = self.broker
+        if outbox.ORDER_PUBLISH_MODE == "outbox":
+            outbox.order_outbox_relay.start()
+        # Проверка токенов и события каталога owner_service
+        self["owner"].module("utils.get_current_user").jwks_client = auth
+        self["owner"].module("rabbit.catalog_events").catalog_publisher._publish = self.broker.publish_catalog_event
+
+    async def stop(self):
+        """Дожидается доставки заказов и отключает сервисы от базы данных."""
+        await self["user"].module("rabbit.outbox").order_outbox_relay.stop()
+        await self.broker.stop()
+        self["auth"].module("utils.password_pool").password_pool.close()
+        for database in self.databases():
+            await database.disconnect()
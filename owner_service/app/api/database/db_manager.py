@@ -1,26 +1,49 @@
 import logging
+import os
+import time
+from typing import List, Optional
+
+import orjson
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import exists, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.api.database.database import restaurants, database, dishes, orders, ingredients, dish_ingredients, \
+    catalog_versions, CATALOG_VERSION_GLOBAL
+from app.api.database.ingredients import parse_ingredients
+from app.api.model.dish import DishOut, DishIn, DishUpdate, MenuImportResult
+from app.api.rabbit.catalog_events import catalog_publisher
+from app.api.rabbit.models import OrderRequest
+from app.api.model.restaurant import RestaurantIn, RestaurantOut, RestaurantUpdate
 
-from app.api.database.database import restaurants, database, dishes
-from app.api.model.dish import DishOut, DishIn, DishUpdate
-from app.api.model.restaurant import RestaurantIn, RestaurantOut, RestaurantUpdate, Restaurant
+# Количество блюд в одном многострочном INSERT при загрузке меню (4 параметра на блюдо)
+MENU_IMPORT_CHUNK_SIZE: int = int(os.getenv("MENU_IMPORT_CHUNK_SIZE", default=500))
+
+# Возвращаемые столбцы блюда
+DISH_COLUMNS = (dishes.c.id, dishes.c.name, dishes.c.price, dishes.c.ingredients)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-async def get_restaurants_by_user(user_id: int):
+async def get_restaurants_by_user(user_id: int, after_id: int, limit: int):
     """
-    Получает все рестораны, принадлежащие пользователю по его ID.
+    Получает страницу ресторанов, принадлежащих пользователю по его ID (keyset-пагинация по ID).
 
     :param user_id: ID пользователя
-    :return: Список ресторанов пользователя
+    :param after_id: ID последнего ресторана предыдущей страницы
+    :param limit: Максимальное количество ресторанов
+    :return: Список ресторанов пользователя (строки с полями модели Restaurant)
     """
     logging.info(f"Fetching restaurants for user with ID {user_id}.")
-    query = select(restaurants).where(user_id == restaurants.c.user_id)
+    query = (
+        select(restaurants.c.id, restaurants.c.name, restaurants.c.address)
+        .where((user_id == restaurants.c.user_id) & (restaurants.c.id > after_id))
+        .order_by(restaurants.c.id)
+        .limit(limit)
+    )
     result = await database.fetch_all(query)
     logging.info(f"Found {len(result)} restaurants for user {user_id}.")
-    return [Restaurant(**row) for row in result]
+    return [dict(row._mapping) for row in result]
 
 
 async def get_restaurant(id: int):
@@ -49,7 +72,7 @@ async def user_is_own_restaurant(user_id: int, restaurant_id: int) -> bool:
     :return: True, если пользователь является владельцем ресторана, иначе False
     """
     logging.info(f"Checking ownership for user {user_id} and restaurant {restaurant_id}.")
-    query = select(restaurants).where(
+    query = select(restaurants.c.id).where(
         (restaurant_id == restaurants.c.id) & (user_id == restaurants.c.user_id)
     )
     result = await database.fetch_one(query)
@@ -60,82 +83,153 @@ async def user_is_own_restaurant(user_id: int, restaurant_id: int) -> bool:
     return False
 
 
+def owned_restaurant(user_id: int, restaurant_id: int):
+    """
+    Условие "ресторан принадлежит пользователю" для подстановки в изменяющие запросы.
+
+    :param user_id: ID пользователя
+    :param restaurant_id: ID ресторана
+    :return: Условие WHERE для таблицы ресторанов
+    """
+    return (restaurants.c.id == restaurant_id) & (restaurants.c.user_id == user_id)
+
+
+async def raise_access_error(user_id: int, restaurant_id: int, dish_id: Optional[int] = None):
+    """
+    Выясняет, почему изменяющий запрос не затронул ни одной строки, и выбрасывает соответствующую ошибку:
+    404, если ресторана (или блюда в нём) нет, и 403, если ресторан принадлежит другому пользователю.
+    Вызывается только при неудачном изменении, поэтому не добавляет запросов в обычном случае.
+
+    :param user_id: ID пользователя
+    :param restaurant_id: ID ресторана
+    :param dish_id: ID блюда, если изменялось блюдо
+    """
+    owner_id = await database.fetch_val(select(restaurants.c.user_id).where(restaurants.c.id == restaurant_id))
+    if owner_id is None:
+        logging.warning(f"Restaurant with ID {restaurant_id} not found.")
+        raise HTTPException(status_code=404, detail="Restaurant with given id not found")
+    if owner_id != user_id:
+        logging.warning(f"User {user_id} is not the owner of restaurant {restaurant_id}.")
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    logging.warning(f"Dish with ID {dish_id} not found in restaurant {restaurant_id}.")
+    raise HTTPException(status_code=404, detail="Dish with given id not found")
+
+
+async def bump_catalog_versions(*restaurant_ids: int):
+    """
+    Увеличивает версии каталога, по которым user_service формирует ETag.
+    Вызывается в транзакции изменения ресторана или блюд, поэтому версия меняется
+    атомарно вместе с данными.
+
+    :param restaurant_ids: ID ресторанов, меню которых изменилось, или CATALOG_VERSION_GLOBAL
+        для списка ресторанов
+    """
+    query = sqlite_insert(catalog_versions).values([
+        {"restaurant_id": restaurant_id, "version": 1} for restaurant_id in restaurant_ids
+    ])
+    query = query.on_conflict_do_update(
+        index_elements=[catalog_versions.c.restaurant_id],
+        set_={"version": catalog_versions.c.version + 1}
+    )
+    await database.execute(query)
+
+
 async def add_restaurant(user_id: int, payload: RestaurantIn):
     """
     Добавляет новый ресторан в базу данных.
 
     :param user_id: ID владельца ресторана
     :param payload: Данные нового ресторана
-    :return: ID нового ресторана
+    :return: Добавленный ресторан
     """
     logging.info(f"Adding new restaurant for user {user_id} with name {payload.name}.")
     query = restaurants.insert().values(
         name=payload.name,
         address=payload.address,
         user_id=user_id
-    )
-    result = await database.execute(query)
-    logging.info(f"Restaurant added successfully with ID {result}.")
-    return result
+    ).returning(restaurants.c.id, restaurants.c.name, restaurants.c.address)
+    async with database.transaction(immediate=True):
+        result = await database.fetch_one(query)
+        await bump_catalog_versions(CATALOG_VERSION_GLOBAL, result['id'])
+    logging.info(f"Restaurant added successfully with ID {result['id']}.")
+    catalog_publisher.publish("restaurant", result['id'])
+    return RestaurantOut(**result)
 
 
-async def update_restaurant(id: int, payload: RestaurantUpdate):
+async def update_restaurant(id: int, user_id: int, payload: RestaurantUpdate):
     """
-    Обновляет данные ресторана.
+    Обновляет данные ресторана пользователя запросом UPDATE ... RETURNING
+    с условием владения рестораном.
 
     :param id: ID ресторана
+    :param user_id: ID владельца ресторана
     :param payload: Данные для обновления
     :return: Обновленные данные ресторана
     """
     logging.info(f"Updating restaurant with ID {id}.")
-    # Получаем ресторан из базы данных
-    existing_restaurant = await get_restaurant(id)
-    if not existing_restaurant:
-        logging.error(f"Restaurant with ID {id} not found.")
-        raise HTTPException(status_code=404, detail="Restaurant with given id not found")
-
     # Обновляем только те поля, которые указаны в payload
-    update_data = payload.dict(exclude_unset=True)
-    query = restaurants.update().where(restaurants.c.id == id).values(update_data)
-    await database.execute(query)
-
-    updated_restaurant = await get_restaurant(id)
+    update_data = payload.model_dump(exclude_unset=True)
+    columns = (restaurants.c.id, restaurants.c.name, restaurants.c.address)
+    if update_data:
+        query = restaurants.update().where(owned_restaurant(user_id, id)).values(update_data).returning(*columns)
+    else:
+        query = select(*columns).where(owned_restaurant(user_id, id))
+    async with database.transaction(immediate=True):
+        result = await database.fetch_one(query)
+        if result is None:
+            await raise_access_error(user_id, id)
+        if update_data:
+            await bump_catalog_versions(CATALOG_VERSION_GLOBAL)
+
+    if update_data:
+        catalog_publisher.publish("restaurant", id)
     logging.info(f"Restaurant with ID {id} updated successfully.")
-    return updated_restaurant
+    return RestaurantOut(**result)
 
 
-async def delete_restaurant(id: int):
+async def delete_restaurant(id: int, user_id: int):
     """
-    Удаляет ресторан по ID и все связанные с ним блюда.
+    Удаляет ресторан пользователя и все связанные с ним блюда в одной транзакции.
 
     :param id: ID ресторана для удаления
+    :param user_id: ID владельца ресторана
     :return: Сообщение об успешном удалении
     """
     logging.info(f"Deleting restaurant with ID {id}.")
-    # Сначала удаляем все блюда, связанные с рестораном
-    delete_dishes_query = dishes.delete().where(dishes.c.restaurant_id == id)
-    await database.execute(delete_dishes_query)
-
-    # Удаляем сам ресторан
-    query = restaurants.delete().where(restaurants.c.id == id)
-    await database.execute(query)
+    async with database.transaction(immediate=True):
+        # Ресторан удаляется только вместе с проверкой владения
+        query = restaurants.delete().where(owned_restaurant(user_id, id)).returning(restaurants.c.id)
+        if await database.fetch_one(query) is None:
+            await raise_access_error(user_id, id)
+        # Удаляем все блюда, связанные с рестораном, и их ингредиенты
+        await database.execute(dish_ingredients.delete().where(dish_ingredients.c.restaurant_id == id))
+        await database.execute(dishes.delete().where(dishes.c.restaurant_id == id))
+        await bump_catalog_versions(CATALOG_VERSION_GLOBAL, id)
 
     logging.info(f"Restaurant with ID {id} deleted successfully.")
+    catalog_publisher.publish("restaurant", id)
     return {"message": "Restaurant deleted successfully"}
 
 
-async def get_dishes_by_restaurant(restaurant_id: int):
+async def get_dishes_by_restaurant(restaurant_id: int, after_id: int, limit: int):
     """
-    Получает все блюда для ресторана по его ID.
+    Получает страницу блюд ресторана по его ID (keyset-пагинация по ID).
 
     :param restaurant_id: ID ресторана
-    :return: Список всех блюд ресторана
+    :param after_id: ID последнего блюда предыдущей страницы
+    :param limit: Максимальное количество блюд
+    :return: Список блюд ресторана (строки с полями модели DishOut)
     """
     logging.info(f"Fetching dishes for restaurant with ID {restaurant_id}.")
-    query = select(dishes).where(restaurant_id == dishes.c.restaurant_id)
+    query = (
+        select(*DISH_COLUMNS)
+        .where((restaurant_id == dishes.c.restaurant_id) & (dishes.c.id > after_id))
+        .order_by(dishes.c.id)
+        .limit(limit)
+    )
     result = await database.fetch_all(query)
     logging.info(f"Found {len(result)} dishes for restaurant {restaurant_id}.")
-    return result
+    return [dict(row._mapping) for row in result]
 
 
 async def get_dish(id: int):
@@ -155,60 +249,262 @@ async def get_dish(id: int):
     return None
 
 
-async def add_dish(restaurant_id: int, payload: DishIn):
+def owned_dish(dish_id: int, restaurant_id: int, user_id: int):
+    """
+    Условие "блюдо находится в ресторане пользователя" для подстановки в изменяющие запросы.
+
+    :param dish_id: ID блюда
+    :param restaurant_id: ID ресторана
+    :param user_id: ID пользователя
+    :return: Условие WHERE для таблицы блюд
+    """
+    return (dishes.c.id == dish_id) & (dishes.c.restaurant_id == restaurant_id) & exists(
+        select(restaurants.c.id).where(owned_restaurant(user_id, restaurant_id)))
+
+
+async def index_dish_ingredients(restaurant_id: int, rows):
+    """
+    Перестраивает индекс ингредиентов для блюд ресторана: разбирает строку ингредиентов,
+    добавляет новые ингредиенты в справочник и заменяет связи блюдо-ингредиент.
+    Счётчики фасетов ресторана обновляют триггеры на dish_ingredients.
+    Вызывается в транзакции изменения блюд.
+
+    :param restaurant_id: ID ресторана
+    :param rows: Записи блюд (id, ingredients)
+    """
+    await database.execute(
+        dish_ingredients.delete().where(dish_ingredients.c.dish_id.in_([row['id'] for row in rows])))
+    parsed = [(row['id'], parse_ingredients(row['ingredients'])) for row in rows]
+    names = {name for _, dish_names in parsed for name in dish_names}
+    if not names:
+        return
+    await database.execute(ingredients.insert().prefix_with("OR IGNORE").values([{"name": name} for name in names]))
+    ingredient_ids = {
+        row['name']: row['id']
+        for row in await database.fetch_all(
+            select(ingredients.c.id, ingredients.c.name).where(ingredients.c.name.in_(names)))
+    }
+    await database.execute(dish_ingredients.insert().values([
+        {"restaurant_id": restaurant_id, "ingredient_id": ingredient_ids[name], "dish_id": dish_id}
+        for dish_id, dish_names in parsed for name in dish_names
+    ]))
+
+
+async def add_dish(restaurant_id: int, user_id: int, payload: DishIn):
     """
-    Добавляет новое блюдо в ресторан.
+    Добавляет новое блюдо в ресторан пользователя запросом INSERT ... SELECT ... RETURNING:
+    строка вставляется, только если ресторан принадлежит пользователю.
 
     :param restaurant_id: ID ресторана, к которому добавляется блюдо
+    :param user_id: ID владельца ресторана
     :param payload: Данные нового блюда
-    :return: ID нового блюда
+    :return: Добавленное блюдо
     """
     logging.info(f"Adding new dish to restaurant {restaurant_id} with name {payload.name}.")
-    query = dishes.insert().values(
-        name=payload.name,
-        ingredients=payload.ingredients,
-        price=payload.price,
-        restaurant_id=restaurant_id
-    )
-    result = await database.execute(query)
-    logging.info(f"Dish added successfully with ID {result}.")
-    return result
+    owned_restaurant_id = select(
+        literal(payload.name), literal(payload.ingredients), literal(payload.price), restaurants.c.id
+    ).where(owned_restaurant(user_id, restaurant_id))
+    query = dishes.insert() \
+        .from_select(["name", "ingredients", "price", "restaurant_id"], owned_restaurant_id) \
+        .returning(*DISH_COLUMNS)
+    async with database.transaction(immediate=True):
+        result = await database.fetch_one(query)
+        if result is None:
+            await raise_access_error(user_id, restaurant_id)
+        await index_dish_ingredients(restaurant_id, [result])
+        await bump_catalog_versions(restaurant_id)
+    logging.info(f"Dish added successfully with ID {result['id']}.")
+    catalog_publisher.publish("dish", restaurant_id)
+    return DishOut(**result)
+
+
+async def import_dishes(restaurant_id: int, user_id: int, items: List[DishIn], replace: bool = False):
+    """
+    Добавляет блюда в ресторан пользователя в одной транзакции многострочными INSERT
+    по MENU_IMPORT_CHUNK_SIZE блюд. Владение рестораном проверяется в той же транзакции.
+
+    :param restaurant_id: ID ресторана
+    :param user_id: ID владельца ресторана
+    :param items: Провалидированные блюда
+    :param replace: Удалить текущее меню ресторана перед загрузкой
+    :return: Количество добавленных и удалённых блюд
+    """
+    logging.info(f"Importing {len(items)} dishes to restaurant {restaurant_id} (replace={replace}).")
+    deleted = 0
+    async with database.transaction(immediate=True):
+        if await database.fetch_one(select(restaurants.c.id).where(owned_restaurant(user_id, restaurant_id))) is None:
+            await raise_access_error(user_id, restaurant_id)
+        if replace:
+            await database.execute(
+                dish_ingredients.delete().where(dish_ingredients.c.restaurant_id == restaurant_id))
+            deleted_rows = await database.fetch_all(
+                dishes.delete().where(dishes.c.restaurant_id == restaurant_id).returning(dishes.c.id))
+            deleted = len(deleted_rows)
+        for start in range(0, len(items), MENU_IMPORT_CHUNK_SIZE):
+            chunk = items[start:start + MENU_IMPORT_CHUNK_SIZE]
+            inserted = await database.fetch_all(dishes.insert().values([
+                {"name": item.name, "ingredients": item.ingredients, "price": item.price, "restaurant_id": restaurant_id}
+                for item in chunk
+            ]).returning(dishes.c.id, dishes.c.ingredients))
+            await index_dish_ingredients(restaurant_id, inserted)
+        await bump_catalog_versions(restaurant_id)
+    logging.info(f"Imported {len(items)} dishes to restaurant {restaurant_id}, deleted {deleted}.")
+    catalog_publisher.publish("dish", restaurant_id)
+    return MenuImportResult(imported=len(items), deleted=deleted)
+
+
+def iterate_dishes_by_restaurant(restaurant_id: int):
+    """
+    Потоковое чтение всего меню ресторана без построения списка в памяти.
+
+    :param restaurant_id: ID ресторана
+    :return: Асинхронный итератор блюд в порядке ID
+    """
+    query = select(dishes.c.id, dishes.c.name, dishes.c.price, dishes.c.ingredients) \
+        .where(restaurant_id == dishes.c.restaurant_id).order_by(dishes.c.id)
+    return database.iterate(query)
 
 
-async def update_dish(id: int, payload: DishUpdate):
+async def update_dish(id: int, payload: DishUpdate, restaurant_id: int, user_id: int):
     """
-    Обновляет данные блюда.
+    Обновляет данные блюда запросом UPDATE ... RETURNING с условием, что блюдо
+    находится в указанном ресторане, а ресторан принадлежит пользователю.
 
     :param id: ID блюда
     :param payload: Данные для обновления
+    :param restaurant_id: ID ресторана, которому принадлежит блюдо
+    :param user_id: ID владельца ресторана
     :return: Обновленные данные блюда
     """
     logging.info(f"Updating dish with ID {id}.")
-    # Получаем блюдо из базы данных
-    existing_dish = await get_dish(id)
-    if not existing_dish:
-        logging.error(f"Dish with ID {id} not found.")
-        raise HTTPException(status_code=404, detail="Dish with given id not found")
-
     # Обновляем только те поля, которые указаны в payload
-    update_data = payload.dict(exclude_unset=True)
-    query = dishes.update().where(dishes.c.id == id).values(update_data)
-    await database.execute(query)
-
-    updated_dish = await get_dish(id)
+    update_data = payload.model_dump(exclude_unset=True)
+    condition = owned_dish(id, restaurant_id, user_id)
+    if update_data:
+        query = dishes.update().where(condition).values(update_data).returning(*DISH_COLUMNS)
+    else:
+        query = select(*DISH_COLUMNS).where(condition)
+    async with database.transaction(immediate=True):
+        result = await database.fetch_one(query)
+        if result is None:
+            await raise_access_error(user_id, restaurant_id, id)
+        if "ingredients" in update_data:
+            await index_dish_ingredients(restaurant_id, [result])
+        if update_data:
+            await bump_catalog_versions(restaurant_id)
+
+    if update_data:
+        catalog_publisher.publish("dish", restaurant_id)
     logging.info(f"Dish with ID {id} updated successfully.")
-    return updated_dish
+    return DishOut(**result)
 
 
-async def delete_dish(id: int):
+async def delete_dish(id: int, restaurant_id: int, user_id: int):
     """
-    Удаляет блюдо по ID.
+    Удаляет блюдо ресторана пользователя запросом DELETE ... RETURNING.
 
     :param id: ID блюда для удаления
+    :param restaurant_id: ID ресторана, которому принадлежит блюдо
+    :param user_id: ID владельца ресторана
     :return: Сообщение об успешном удалении
     """
     logging.info(f"Deleting dish with ID {id}.")
-    query = dishes.delete().where(dishes.c.id == id)
-    await database.execute(query)
+    query = dishes.delete().where(owned_dish(id, restaurant_id, user_id)).returning(dishes.c.id)
+    async with database.transaction(immediate=True):
+        if await database.fetch_one(query) is None:
+            await raise_access_error(user_id, restaurant_id, id)
+        await database.execute(dish_ingredients.delete().where(dish_ingredients.c.dish_id == id))
+        await bump_catalog_versions(restaurant_id)
     logging.info(f"Dish with ID {id} deleted successfully.")
+    catalog_publisher.publish("dish", restaurant_id)
     return {"message": "Dish deleted successfully"}
+
+
+async def get_orders_by_restaurant(restaurant_id: int, after_id: int, limit: int):
+    """
+    Получает страницу заказов ресторана в порядке поступления (keyset-пагинация по ID).
+
+    :param restaurant_id: ID ресторана
+    :param after_id: ID последнего заказа предыдущей страницы
+    :param limit: Максимальное количество заказов
+    :return: Список заказов ресторана (словари с полями модели OrderOut)
+    """
+    logging.info(f"Fetching orders for restaurant with ID {restaurant_id}.")
+    # Выборка идёт по индексу (restaurant_id, id)
+    query = (
+        select(orders.c.id, orders.c.payload)
+        .where((restaurant_id == orders.c.restaurant_id) & (orders.c.id > after_id))
+        .order_by(orders.c.id)
+        .limit(limit)
+    )
+    result = await database.fetch_all(query)
+    logging.info(f"Found {len(result)} orders for restaurant {restaurant_id}.")
+    # Сохранённый заказ уже провалидирован, поэтому модель OrderOut не строится
+    return [{"id": row['id'], **orjson.loads(row['payload'])} for row in result]
+
+
+async def add_orders(batch: List[OrderRequest]):
+    """
+    Сохраняет пакет заказов одним многострочным INSERT (одна транзакция).
+
+    :param batch: Список провалидированных заказов
+    :return: Список сохранённых записей (id, restaurant_id, payload)
+    """
+    now = time.time()
+    query = orders.insert().values([
+        {"restaurant_id": order.restaurant_id, "payload": order.model_dump_json(), "created_at": now}
+        for order in batch
+    ]).returning(orders.c.id, orders.c.restaurant_id, orders.c.payload)
+    result = await database.fetch_all(query)
+    logging.info(f"Saved {len(result)} orders.")
+    return result
+
+
+async def count_orders() -> int:
+    """
+    Подсчитывает количество сохранённых заказов.
+
+    :return: Количество записей в таблице orders
+    """
+    return await database.fetch_val(select(func.count()).select_from(orders))
+
+
+async def purge_orders(max_age: float, max_per_restaurant: int) -> int:
+    """
+    Удаляет заказы старше `max_age` секунд и самые старые заказы каждого ресторана сверх
+    `max_per_restaurant` (нулевое значение отключает ограничение) одной транзакцией.
+
+    :return: Количество оставшихся заказов
+    """
+    async with database.transaction(immediate=True):
+        if max_age > 0:
+            await database.execute(orders.delete().where(orders.c.created_at < time.time() - max_age))
+        if max_per_restaurant > 0:
+            # Позиция заказа среди заказов его ресторана, начиная с самого нового
+            ranked = select(
+                orders.c.id,
+                func.row_number().over(partition_by=orders.c.restaurant_id, order_by=orders.c.id.desc())
+                .label("position")
+            ).subquery()
+            await database.execute(orders.delete().where(
+                orders.c.id.in_(select(ranked.c.id).where(ranked.c.position > max_per_restaurant))))
+        return await count_orders()
+
+
+async def get_orders_after(restaurant_id: int, after_id: int, limit: int):
+    """
+    Получает заказы ресторана, поступившие после заказа с данным ID.
+
+    :param restaurant_id: ID ресторана
+    :param after_id: ID последнего уже полученного заказа
+    :param limit: Максимальное количество заказов
+    :return: Список записей (id, payload) в порядке поступления
+    """
+    logging.info(f"Fetching orders for restaurant {restaurant_id} after order {after_id}.")
+    query = (
+        select(orders.c.id, orders.c.payload)
+        .where((restaurant_id == orders.c.restaurant_id) & (orders.c.id > after_id))
+        .order_by(orders.c.id)
+        .limit(limit)
+    )
+    return await database.fetch_all(query)
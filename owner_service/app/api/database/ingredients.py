@@ -0,0 +1,35 @@
+import re
+from typing import Iterable, List, Optional
+
+# Разделители ингредиентов в строке `dishes.ingredients`
+INGREDIENT_SEPARATORS = re.compile(r"[,;\n]")
+
+
+def normalize_ingredient(name: str) -> str:
+    """
+    Приводит название ингредиента к нормальной форме: нижний регистр, "ё" заменена на "е",
+    лишние пробелы удалены. По нормальной форме ингредиенты хранятся и ищутся.
+    """
+    return " ".join(name.lower().replace("ё", "е").split())
+
+
+def parse_ingredients(ingredients: Optional[str]) -> List[str]:
+    """
+    Разбирает строку ингредиентов блюда в список нормализованных названий без повторов
+    (в исходном порядке).
+    """
+    if not ingredients:
+        return []
+    return normalize_ingredients(INGREDIENT_SEPARATORS.split(ingredients))
+
+
+def normalize_ingredients(names: Iterable[str]) -> List[str]:
+    """
+    Нормализует список названий ингредиентов, удаляя пустые значения и повторы.
+    """
+    result = []
+    for name in names:
+        name = normalize_ingredient(name)
+        if name and name not in result:
+            result.append(name)
+    return result
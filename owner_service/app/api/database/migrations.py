@@ -0,0 +1,316 @@
+import logging
+import sqlite3
+import time
+from typing import Callable, List, NamedTuple, Union
+
+from sqlalchemy.engine import Engine
+
+
+class Migration(NamedTuple):
+    """
+    Миграция схемы базы данных.
+
+    :param version: Номер версии схемы после применения миграции
+    :param description: Краткое описание изменения
+    :param steps: SQL-выражения или функции, принимающие соединение sqlite3
+    """
+    version: int
+    description: str
+    steps: List[Union[str, Callable[[sqlite3.Connection], None]]]
+
+
+# Ингредиенты существующих блюд: строка `dishes.ingredients` разбивается по разделителям ",", ";"
+# и переводу строки, как ingredients.parse_ingredients в user_service и owner_service
+DISH_INGREDIENT_NAMES = """
+    WITH RECURSIVE parts (dish_id, restaurant_id, part, rest) AS (
+        SELECT id, restaurant_id, '', replace(replace(ingredients, ';', ','), char(10), ',') || ','
+        FROM dishes WHERE restaurant_id IS NOT NULL AND ingredients IS NOT NULL
+        UNION ALL
+        SELECT dish_id, restaurant_id, substr(rest, 1, instr(rest, ',') - 1), substr(rest, instr(rest, ',') + 1)
+        FROM parts WHERE rest != ''
+    )
+    SELECT dish_id, restaurant_id, normalize_ingredient(part) AS name FROM parts WHERE name != ''
+"""
+
+
+def index_existing_dishes(connection: sqlite3.Connection):
+    """
+    Строит обратный индекс ингредиентов для уже существующих блюд запросами SQL.
+
+    Миграции применяет любой сервис, включая auth_service без кода каталога, поэтому разбор ингредиентов
+    не импортируется. В SQL недоступна только нормализация названия (lower() в SQLite не меняет регистр
+    кириллицы): она регистрируется функцией соединения и совпадает с ingredients.normalize_ingredient.
+    """
+    connection.create_function(
+        "normalize_ingredient", 1, lambda name: " ".join(name.lower().replace("ё", "е").split()), deterministic=True)
+    connection.execute(f"INSERT OR IGNORE INTO ingredients (name) SELECT name FROM ({DISH_INGREDIENT_NAMES})")
+    connection.execute(
+        "INSERT OR IGNORE INTO dish_ingredients (restaurant_id, ingredient_id, dish_id) "
+        f"SELECT parsed.restaurant_id, ingredients.id, parsed.dish_id FROM ({DISH_INGREDIENT_NAMES}) AS parsed "
+        "JOIN ingredients ON ingredients.name = parsed.name"
+    )
+
+
+# Миграции схемы общей базы данных. Файл одинаков во всех сервисах: новые миграции добавляются
+# только в конец списка и во все сервисы одновременно, уже применённые миграции не изменяются.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "core tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER NOT NULL PRIMARY KEY,
+            phone_number VARCHAR(20) NOT NULL UNIQUE,
+            password_hash VARCHAR(128) NOT NULL,
+            is_owner BOOLEAN
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS restaurants (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(64),
+            address VARCHAR(256),
+            user_id INTEGER REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dishes (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(64),
+            ingredients VARCHAR(256),
+            price FLOAT,
+            restaurant_id INTEGER REFERENCES restaurants (id)
+        )
+        """,
+    ]),
+    Migration(2, "order outbox", [
+        """
+        CREATE TABLE IF NOT EXISTS order_outbox (
+            id INTEGER NOT NULL PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at FLOAT NOT NULL,
+            sent_at FLOAT,
+            attempts INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_order_outbox_pending ON order_outbox (id) WHERE sent_at IS NULL",
+    ]),
+    Migration(3, "orders", [
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER NOT NULL PRIMARY KEY,
+            restaurant_id INTEGER NOT NULL REFERENCES restaurants (id),
+            payload TEXT NOT NULL,
+            created_at FLOAT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_orders_restaurant_id_id ON orders (restaurant_id, id)",
+    ]),
+    Migration(4, "catalog hot path indexes", [
+        # Рестораны владельца (SQLite добавляет rowid в конец индекса, поэтому он подходит и для keyset-пагинации)
+        "CREATE INDEX IF NOT EXISTS ix_restaurants_user_id ON restaurants (user_id)",
+        # Покрывающий индекс для проверки владения рестораном
+        "CREATE INDEX IF NOT EXISTS ix_restaurants_id_user_id ON restaurants (id, user_id)",
+        # Меню ресторана
+        "CREATE INDEX IF NOT EXISTS ix_dishes_restaurant_id ON dishes (restaurant_id)",
+        "ANALYZE",
+    ]),
+    Migration(5, "refresh tokens", [
+        # Хранится только SHA-256 от токена; family_id объединяет цепочку ротаций одного входа
+        """
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            id INTEGER NOT NULL PRIMARY KEY,
+            token_hash BLOB NOT NULL UNIQUE,
+            family_id BLOB NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            expires_at FLOAT NOT NULL,
+            revoked_at FLOAT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON refresh_tokens (family_id)",
+        "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id ON refresh_tokens (user_id)",
+    ]),
+    Migration(6, "catalog full-text search", [
+        # Полнотекстовый индекс блюд и ресторанов. rowid = 2 * id для блюда и 2 * id + 1 для ресторана,
+        # поэтому триггеры находят строку индекса по первичному ключу без просмотра таблицы
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+            name, details, restaurant_name,
+            kind UNINDEXED, entity_id UNINDEXED, restaurant_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS dishes_fts_insert AFTER INSERT ON dishes BEGIN
+            INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+            VALUES (2 * new.id, new.name, new.ingredients,
+                    (SELECT name FROM restaurants WHERE id = new.restaurant_id), 'dish', new.id, new.restaurant_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS dishes_fts_update AFTER UPDATE ON dishes BEGIN
+            DELETE FROM catalog_fts WHERE rowid = 2 * old.id;
+            INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+            VALUES (2 * new.id, new.name, new.ingredients,
+                    (SELECT name FROM restaurants WHERE id = new.restaurant_id), 'dish', new.id, new.restaurant_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS dishes_fts_delete AFTER DELETE ON dishes BEGIN
+            DELETE FROM catalog_fts WHERE rowid = 2 * old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS restaurants_fts_insert AFTER INSERT ON restaurants BEGIN
+            INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+            VALUES (2 * new.id + 1, new.name, new.address, new.name, 'restaurant', new.id, new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS restaurants_fts_update AFTER UPDATE ON restaurants BEGIN
+            DELETE FROM catalog_fts WHERE rowid = 2 * old.id + 1;
+            INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+            VALUES (2 * new.id + 1, new.name, new.address, new.name, 'restaurant', new.id, new.id);
+        END
+        """,
+        # Название ресторана в строках его блюд обновляется только при переименовании (по индексу меню)
+        """
+        CREATE TRIGGER IF NOT EXISTS restaurants_fts_rename AFTER UPDATE OF name ON restaurants
+        WHEN old.name IS NOT new.name BEGIN
+            UPDATE catalog_fts SET restaurant_name = new.name
+            WHERE rowid IN (SELECT 2 * id FROM dishes WHERE restaurant_id = new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS restaurants_fts_delete AFTER DELETE ON restaurants BEGIN
+            DELETE FROM catalog_fts WHERE rowid = 2 * old.id + 1;
+        END
+        """,
+        # Индексация существующего каталога
+        """
+        INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+        SELECT 2 * id + 1, name, address, name, 'restaurant', id, id FROM restaurants
+        """,
+        """
+        INSERT INTO catalog_fts (rowid, name, details, restaurant_name, kind, entity_id, restaurant_id)
+        SELECT 2 * dishes.id, dishes.name, dishes.ingredients, restaurants.name, 'dish', dishes.id, dishes.restaurant_id
+        FROM dishes LEFT JOIN restaurants ON restaurants.id = dishes.restaurant_id
+        """,
+    ]),
+    Migration(7, "ingredient index and menu facets", [
+        # Справочник нормализованных названий ингредиентов
+        """
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(64) NOT NULL UNIQUE
+        )
+        """,
+        # Обратный индекс: ингредиент ресторана -> блюда с ним
+        """
+        CREATE TABLE IF NOT EXISTS dish_ingredients (
+            restaurant_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL REFERENCES ingredients (id),
+            dish_id INTEGER NOT NULL REFERENCES dishes (id),
+            PRIMARY KEY (restaurant_id, ingredient_id, dish_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_dish_ingredients_dish_id ON dish_ingredients (dish_id)",
+        # Количество блюд ресторана с каждым ингредиентом (фасеты меню)
+        """
+        CREATE TABLE IF NOT EXISTS restaurant_ingredient_facets (
+            restaurant_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL REFERENCES ingredients (id),
+            dish_count INTEGER NOT NULL,
+            PRIMARY KEY (restaurant_id, ingredient_id)
+        ) WITHOUT ROWID
+        """,
+        # Фасеты пересчитываются инкрементально при изменении обратного индекса
+        """
+        CREATE TRIGGER IF NOT EXISTS dish_ingredients_facets_insert AFTER INSERT ON dish_ingredients BEGIN
+            INSERT INTO restaurant_ingredient_facets (restaurant_id, ingredient_id, dish_count)
+            VALUES (new.restaurant_id, new.ingredient_id, 1)
+            ON CONFLICT (restaurant_id, ingredient_id) DO UPDATE SET dish_count = dish_count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS dish_ingredients_facets_delete AFTER DELETE ON dish_ingredients BEGIN
+            UPDATE restaurant_ingredient_facets SET dish_count = dish_count - 1
+            WHERE restaurant_id = old.restaurant_id AND ingredient_id = old.ingredient_id;
+            DELETE FROM restaurant_ingredient_facets
+            WHERE restaurant_id = old.restaurant_id AND ingredient_id = old.ingredient_id AND dish_count <= 0;
+        END
+        """,
+        # Фильтр меню по цене
+        "CREATE INDEX IF NOT EXISTS ix_dishes_restaurant_id_price ON dishes (restaurant_id, price)",
+        index_existing_dishes,
+    ]),
+    Migration(8, "catalog version counters", [
+        # Версии каталога: restaurant_id = 0 — список ресторанов, иначе меню ресторана.
+        # Увеличиваются owner_service в транзакции изменения каталога и используются для ETag
+        """
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            restaurant_id INTEGER NOT NULL PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+    ]),
+    Migration(9, "orders retention", [
+        # Удаление заказов старше срока хранения
+        "CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at)",
+    ]),
+]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """Возвращает текущую версию схемы (0, если миграции ещё не применялись)."""
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER NOT NULL PRIMARY KEY, description TEXT NOT NULL, applied_at FLOAT NOT NULL)"
+    )
+    return connection.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> int:
+    """
+    Применяет к базе данных недостающие миграции и возвращает итоговую версию схемы.
+
+    Все миграции выполняются в одной транзакции BEGIN IMMEDIATE: сервисы, запущенные одновременно,
+    выполняют миграции по очереди, и каждая миграция применяется ровно один раз.
+    """
+    isolation_level = connection.isolation_level
+    # Транзакцией управляем явно
+    connection.isolation_level = None
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(connection)
+            for migration in migrations:
+                if migration.version <= version:
+                    continue
+                logging.info(f"Applying schema migration {migration.version}: {migration.description}")
+                for step in migration.steps:
+                    if callable(step):
+                        step(connection)
+                    else:
+                        connection.execute(step)
+                connection.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (migration.version, migration.description, time.time())
+                )
+                version = migration.version
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.isolation_level = isolation_level
+    return version
+
+
+def run_migrations(engine: Engine) -> int:
+    """Применяет миграции через соединение синхронного движка SQLAlchemy."""
+    raw_connection = engine.raw_connection()
+    try:
+        version = migrate(raw_connection.driver_connection)
+    finally:
+        raw_connection.close()
+    logging.info(f"Database schema is at version {version}.")
+    return version
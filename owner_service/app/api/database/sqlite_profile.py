@@ -0,0 +1,168 @@
+import os
+import sqlite3
+from collections import deque
+from typing import Any, Deque, Dict
+
+import aiosqlite
+from databases import Database
+from databases.backends.sqlite import SQLiteBackend, SQLiteConnection, SQLitePool, SQLiteTransaction
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Общий профиль подключения к SQLite для всех сервисов, работающих с одним файлом базы данных.
+# Время ожидания снятия блокировки (в миллисекундах) вместо немедленной ошибки "database is locked"
+SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", default=5000))
+# Режим синхронизации: в режиме WAL значение NORMAL безопасно и избавляет от fsync на каждой транзакции
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", default="NORMAL")
+# Размер отображения файла базы данных в память (в байтах)
+SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024))
+# Размер кэша страниц соединения (в КиБ)
+SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", default=16 * 1024))
+# Количество простаивающих соединений, которые пул держит открытыми
+SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", default=8))
+
+
+def apply_pragmas(connection: sqlite3.Connection, read_only: bool = False):
+    """
+    Применяет настройки профиля к соединению с SQLite.
+    Для соединений только на чтение дополнительно запрещает изменение данных.
+    """
+    connection.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    connection.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    connection.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    connection.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    connection.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        connection.execute("PRAGMA query_only = ON")
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Соединение с SQLite, к которому при открытии применяется профиль настроек."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        apply_pragmas(self)
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """Соединение с SQLite только для чтения с профилем настроек."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        apply_pragmas(self, read_only=True)
+
+
+class PooledSQLitePool(SQLitePool):
+    """
+    Пул соединений aiosqlite: вместо открытия нового соединения (и потока) на каждый запрос
+    освобождённые соединения возвращаются в пул и переиспользуются.
+    """
+
+    def __init__(self, url, pool_size: int = SQLITE_POOL_SIZE, **options: Any):
+        super().__init__(url, **options)
+        self.pool_size = pool_size
+        self._idle: Deque[aiosqlite.Connection] = deque()
+
+    async def acquire(self) -> aiosqlite.Connection:
+        if self._idle:
+            return self._idle.pop()
+        return await super().acquire()
+
+    async def release(self, connection: aiosqlite.Connection):
+        # Соединение с незавершённой транзакцией в пул не возвращается
+        if len(self._idle) < self.pool_size and not connection.in_transaction:
+            self._idle.append(connection)
+            return
+        await super().release(connection)
+
+    async def close(self):
+        """Закрывает все простаивающие соединения."""
+        while self._idle:
+            await super().release(self._idle.pop())
+
+
+class WriteSQLiteTransaction(SQLiteTransaction):
+    """
+    Транзакция, которая по запросу (`database.transaction(immediate=True)`) сразу захватывает
+    блокировку записи (BEGIN IMMEDIATE).
+
+    Отложенная транзакция (BEGIN) захватывает блокировку только при первой записи, и в режиме WAL
+    при конкурентной записи SQLite может вернуть "database is locked" без ожидания busy_timeout.
+    BEGIN IMMEDIATE ждёт освобождения блокировки в начале транзакции, поэтому используется
+    только для транзакций, изменяющих данные. Остальные транзакции (в том числе транзакция
+    `iterate` на время потокового ответа) остаются отложенными и блокировку записи не держат.
+    """
+
+    async def start(self, is_root: bool, extra_options: Dict[Any, Any]):
+        if not (is_root and extra_options.get("immediate")):
+            await super().start(is_root, extra_options)
+            return
+        self._is_root = True
+        async with self._connection._connection.execute("BEGIN IMMEDIATE") as cursor:
+            await cursor.close()
+
+
+class WriteSQLiteConnection(SQLiteConnection):
+    """Соединение бэкенда, транзакции которого могут захватывать блокировку записи сразу."""
+
+    def transaction(self) -> WriteSQLiteTransaction:
+        return WriteSQLiteTransaction(self)
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    """
+    Бэкенд `databases` для SQLite с пулом соединений.
+    В пуле только для чтения транзакции всегда отложенные: параметр `immediate` не действует.
+    """
+
+    def __init__(self, database_url, **options: Any):
+        pool_size = options.pop("pool_size", SQLITE_POOL_SIZE)
+        super().__init__(database_url, **options)
+        self._pool = PooledSQLitePool(self._database_url, pool_size=pool_size, **self._options)
+        self._read_only = self._options.get("factory") is ReadOnlyConnection
+
+    def connection(self) -> SQLiteConnection:
+        if self._read_only:
+            return super().connection()
+        return WriteSQLiteConnection(self._pool, self._dialect)
+
+    async def disconnect(self):
+        await self._pool.close()
+        await super().disconnect()
+
+
+class ProfiledDatabase(Database):
+    """Подключение `databases` к SQLite через пул соединений с профилем настроек."""
+
+    SUPPORTED_BACKENDS = {
+        **Database.SUPPORTED_BACKENDS,
+        "sqlite": "app.api.database.sqlite_profile:PooledSQLiteBackend",
+    }
+
+
+def create_database(url: str, read_only: bool = False) -> Database:
+    """
+    Создаёт асинхронное подключение к базе данных.
+    Для SQLite соединения берутся из пула и настраиваются профилем (busy_timeout, synchronous, mmap, кэш).
+    """
+    if not url.startswith("sqlite"):
+        return Database(url)
+    factory = ReadOnlyConnection if read_only else ProfiledConnection
+    return ProfiledDatabase(url, factory=factory)
+
+
+def configure_engine(engine: Engine):
+    """
+    Применяет профиль к синхронному движку SQLAlchemy и включает режим WAL,
+    в котором чтение не блокируется записью из другого сервиса.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection)
+
+    # Режим WAL сохраняется в файле базы данных, поэтому достаточно включить его один раз
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA journal_mode = WAL")
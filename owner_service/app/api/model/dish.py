@@ -9,9 +9,12 @@ class DishIn(BaseModel):
     ingredients: str
 
 
-# Модель для вывода информации о блюде.
-class DishOut(DishIn):
+# Модель для вывода информации о блюде (столбцы блюда в базе данных допускают NULL).
+class DishOut(BaseModel):
     id: int
+    name: Optional[str]
+    price: Optional[float]
+    ingredients: Optional[str]
 
 
 # Модель для обновления данных о блюде.
@@ -19,3 +22,9 @@ class DishUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[float] = None
     ingredients: Optional[str] = None
+
+
+# Модель результата загрузки меню.
+class MenuImportResult(BaseModel):
+    imported: int  # Количество добавленных блюд
+    deleted: int  # Количество удалённых блюд (при замене меню)
@@ -2,11 +2,11 @@ from pydantic import BaseModel
 from typing import Optional
 
 
-# Модель для создания вывода ресторана
+# Модель для создания вывода ресторана (столбцы ресторана в базе данных допускают NULL)
 class Restaurant(BaseModel):
     id: int
-    name: str
-    address: str
+    name: Optional[str]
+    address: Optional[str]
 
 
 # Модель для создания нового ресторана
@@ -16,8 +16,8 @@ class RestaurantIn(BaseModel):
 
 
 # Модель для вывода информации о ресторане с ID
-class RestaurantOut(RestaurantIn):
-    id: int
+class RestaurantOut(Restaurant):
+    pass
 
 
 # Модель для обновления информации о ресторане
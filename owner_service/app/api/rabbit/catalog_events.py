@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractConnection, AbstractExchange
+
+# Exchange (fanout), в который публикуются события изменения каталога ресторанов и блюд
+CATALOG_EXCHANGE: str = os.getenv("CATALOG_EXCHANGE", default="catalog_events")
+
+
+class CatalogEventPublisher:
+    """
+    Публикует события изменения каталога (ресторанов и блюд), по которым user_service
+    сбрасывает свой кэш каталога.
+
+    Использует уже открытое соединение потребителя заказов. Публикация выполняется в фоне
+    и не влияет на результат запроса: если брокер недоступен, событие теряется,
+    а устаревшие данные в кэше user_service истекут по TTL.
+    """
+
+    def __init__(self, exchange_name: str = CATALOG_EXCHANGE):
+        """
+        Инициализирует издателя с именем exchange.
+        """
+        self.exchange_name = exchange_name
+        self._get_connection: Callable[[], Optional[AbstractConnection]] = lambda: None
+        self._channel: Optional[AbstractChannel] = None
+        self._exchange: Optional[AbstractExchange] = None
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    def bind(self, get_connection: Callable[[], Optional[AbstractConnection]]):
+        """Задаёт функцию, возвращающую текущее соединение с RabbitMQ."""
+        self._get_connection = get_connection
+
+    async def _get_exchange(self) -> Optional[AbstractExchange]:
+        """Открывает канал и объявляет exchange при первом использовании."""
+        connection = self._get_connection()
+        if connection is None or connection.is_closed:
+            return None
+        async with self._lock:
+            if self._channel is None or self._channel.is_closed:
+                self._channel = await connection.channel()
+                self._exchange = await self._channel.declare_exchange(
+                    self.exchange_name, aio_pika.ExchangeType.FANOUT, durable=True)
+        return self._exchange
+
+    async def _publish(self, event: dict):
+        """Публикует событие в exchange."""
+        try:
+            exchange = await self._get_exchange()
+            if exchange is None:
+                logging.warning(f"RabbitMQ is not connected, catalog event dropped: {event}")
+                return
+            await exchange.publish(
+                aio_pika.Message(body=json.dumps(event).encode(), content_type="application/json"),
+                routing_key=""
+            )
+        except Exception as e:
+            logging.error(f"Failed to publish catalog event {event}: {e}")
+
+    def publish(self, entity: str, restaurant_id: int):
+        """
+        Публикует в фоне событие изменения каталога.
+
+        :param entity: Тип изменённой сущности ("restaurant" или "dish")
+        :param restaurant_id: ID ресторана, каталог которого изменился
+        """
+        task = asyncio.create_task(self._publish({"entity": entity, "restaurant_id": restaurant_id}))
+        # Храним ссылку на задачу до её завершения
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Глобальный издатель событий каталога
+catalog_publisher = CatalogEventPublisher()
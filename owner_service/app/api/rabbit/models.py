@@ -1,11 +1,27 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
 
+# Модель позиции заказа. Название, цена и стоимость рассчитываются user_service по меню ресторана;
+# в заказах, сохранённых до появления расчёта, их нет
+class OrderItem(BaseModel):
+    id: int
+    quantity: int
+    name: Optional[str] = None
+    price: Optional[float] = None
+    amount: Optional[float] = None
+
+
 # Класс модели для проверки формата OrderRequest
 class OrderRequest(BaseModel):
-    dishes: List[dict]
+    dishes: List[OrderItem]
     address: str
     phone_number: str
     restaurant_id: int
+    total: Optional[float] = None  # Итоговая стоимость заказа
+
+
+# Модель для вывода сохранённого заказа с его ID
+class OrderOut(OrderRequest):
+    id: int
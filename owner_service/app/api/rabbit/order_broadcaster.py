@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Set, Tuple
+
+# Размер буфера новых заказов для одного подключения владельца
+ORDER_STREAM_BUFFER_SIZE: int = int(os.getenv("ORDER_STREAM_BUFFER_SIZE", default=100))
+
+
+class OrderSubscription:
+    """
+    Подписка одного подключения на новые заказы ресторана.
+
+    Заказы складываются в ограниченный буфер. Если клиент не успевает их забирать и буфер
+    переполняется, подписка закрывается: клиент переподключается и догружает пропущенные
+    заказы из базы данных по ID последнего полученного заказа.
+    """
+
+    def __init__(self, restaurant_id: int, buffer_size: int):
+        """
+        Инициализирует подписку на заказы ресторана с буфером заданного размера.
+        """
+        self.restaurant_id = restaurant_id
+        # Элементы буфера: (ID заказа, заказ в формате JSON) или None, если подписка закрыта
+        self.queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(maxsize=buffer_size + 1)
+        self.buffer_size = buffer_size
+        self.closed = False
+
+    def push(self, order_id: int, payload: str) -> bool:
+        """
+        Добавляет заказ в буфер. Возвращает False, если буфер переполнен и подписка закрыта.
+        """
+        if self.closed:
+            return False
+        if self.queue.qsize() >= self.buffer_size:
+            self.close()
+            return False
+        self.queue.put_nowait((order_id, payload))
+        return True
+
+    def close(self):
+        """Закрывает подписку; ожидающий чтения клиент получит None."""
+        if self.closed:
+            return
+        self.closed = True
+        # Место под сигнал закрытия зарезервировано размером очереди (buffer_size + 1)
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[Tuple[int, str]]:
+        """
+        Ожидает следующий заказ не дольше `timeout` секунд.
+        Выбрасывает asyncio.TimeoutError, если новых заказов нет.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+
+
+class OrderBroadcaster:
+    """
+    Рассылает новые заказы всем подключённым сессиям владельцев ресторана.
+    Заполняется потребителем RabbitMQ после сохранения заказов в базу данных.
+    """
+
+    def __init__(self, buffer_size: int = ORDER_STREAM_BUFFER_SIZE):
+        """
+        Инициализирует рассыльщик с размером буфера для каждого подключения.
+        """
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[int, Set[OrderSubscription]] = {}
+
+    def subscribe(self, restaurant_id: int) -> OrderSubscription:
+        """Создаёт подписку на новые заказы ресторана."""
+        subscription = OrderSubscription(restaurant_id, self.buffer_size)
+        self._subscribers.setdefault(restaurant_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: OrderSubscription):
+        """Удаляет подписку."""
+        subscribers = self._subscribers.get(subscription.restaurant_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.restaurant_id]
+
+    def publish(self, restaurant_id: int, order_id: int, payload: str):
+        """
+        Передаёт новый заказ всем подпискам ресторана.
+        Подписки с переполненным буфером закрываются и удаляются.
+        """
+        for subscription in list(self._subscribers.get(restaurant_id, ())):
+            if not subscription.push(order_id, payload):
+                logging.warning(f"Order stream buffer overflow for restaurant {restaurant_id}, closing subscription.")
+                self.unsubscribe(subscription)
+
+
+# Глобальный рассыльщик новых заказов
+order_broadcaster = OrderBroadcaster()
@@ -1,88 +1,353 @@
+import asyncio
 import json
 import logging
 import os
-import threading
 import time
+from typing import List, Optional
 
-import pika
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage, AbstractQueue, AbstractRobustConnection
+from prometheus_client import Counter, Gauge, Histogram
 from pydantic import ValidationError
 
+from app.api.database.db_manager import add_orders, count_orders, purge_orders
 from app.api.rabbit.models import OrderRequest
+from app.api.rabbit.order_broadcaster import order_broadcaster
+from app.api.utils.metrics import LATENCY_BUCKETS, metrics_registry
 
 # Получение параметров подключения к RabbitMQ из переменных окружения с дефолтными значениями
 RABBIT_HOST: str = os.getenv("RABBIT_HOST", default="rabbitmq")
-RABBIT_PORT: int = os.getenv("RABBIT_PORT", default=5672)
+RABBIT_PORT: int = int(os.getenv("RABBIT_PORT", default=5672))
 RABBIT_USER: str = os.getenv("RABBIT_USER", default="user")
 RABBIT_PASSWORD: str = os.getenv("RABBIT_PASSWORD", default="pass")
 ORDER_QUEUE: str = os.getenv("ORDER_QUEUE", default="order_queue")
+# Очередь для заказов, которые не удалось сохранить и после повторной доставки
+ORDER_DEAD_LETTER_QUEUE: str = os.getenv("ORDER_DEAD_LETTER_QUEUE", default=f"{ORDER_QUEUE}.dead")
 
-# Список для хранения сообщений
-orders = []
+# Количество неподтверждённых сообщений, которые брокер может выдать потребителю
+ORDER_CONSUMER_PREFETCH: int = int(os.getenv("ORDER_CONSUMER_PREFETCH", default=200))
+# Количество параллельных обработчиков сообщений
+ORDER_CONSUMER_CONCURRENCY: int = int(os.getenv("ORDER_CONSUMER_CONCURRENCY", default=4))
+# Максимальный размер пакета заказов, записываемого одной транзакцией
+ORDER_BATCH_SIZE: int = int(os.getenv("ORDER_BATCH_SIZE", default=100))
+# Максимальное время ожидания обработки полученных сообщений при остановке (в секундах)
+ORDER_CONSUMER_DRAIN_TIMEOUT: float = float(os.getenv("ORDER_CONSUMER_DRAIN_TIMEOUT", default=10))
+# Максимальная задержка между попытками подключения к RabbitMQ (в секундах)
+RABBIT_RECONNECT_MAX_DELAY: float = float(os.getenv("RABBIT_RECONNECT_MAX_DELAY", default=10))
+# Интервал запроса количества сообщений в очереди брокера для метрики отставания (в секундах)
+ORDER_CONSUMER_LAG_INTERVAL: float = float(os.getenv("ORDER_CONSUMER_LAG_INTERVAL", default=15))
+# Срок хранения заказов в таблице orders (в секундах, 0 — без ограничения)
+ORDER_RETENTION_MAX_AGE: float = float(os.getenv("ORDER_RETENTION_MAX_AGE", default=30 * 24 * 60 * 60))
+# Максимальное количество хранимых заказов одного ресторана (0 — без ограничения)
+ORDER_RETENTION_MAX_PER_RESTAURANT: int = int(os.getenv("ORDER_RETENTION_MAX_PER_RESTAURANT", default=10000))
+# Интервал удаления заказов сверх срока хранения и количества (в секундах)
+ORDER_RETENTION_INTERVAL: float = float(os.getenv("ORDER_RETENTION_INTERVAL", default=300))
 
+# Сообщения по результату обработки: saved (заказ сохранён), invalid (неверный формат), requeued (ошибка записи),
+# dead_lettered (ошибка записи повторно доставленного сообщения, заказ перенесён в ORDER_DEAD_LETTER_QUEUE)
+ORDER_CONSUMER_MESSAGES = Counter(
+    "order_consumer_messages_total", "Order messages processed by result", ["result"], registry=metrics_registry)
+ORDER_CONSUMER_BATCH_DURATION = Histogram(
+    "order_consumer_batch_duration_seconds", "Time to save and acknowledge a batch of order messages",
+    buckets=LATENCY_BUCKETS, registry=metrics_registry)
+ORDER_CONSUMER_LAG = Gauge(
+    "order_consumer_lag_messages", "Messages waiting in the broker queue (sampled every ORDER_CONSUMER_LAG_INTERVAL)",
+    registry=metrics_registry)
+ORDER_CONSUMER_BUFFERED = Gauge(
+    "order_consumer_buffered_messages", "Messages received from the broker and not processed yet",
+    registry=metrics_registry)
+ORDERS_STORED = Gauge(
+    "orders_stored", "Number of rows in the orders table", registry=metrics_registry)
 
-# Функция для запуска RabbitMQ-потребителя
-def start_rabbitmq_order_consumer():
+
+def parse_order(body: bytes) -> Optional[OrderRequest]:
+    """
+    Декодирует и валидирует сообщение с заказом.
+    Возвращает None, если сообщение имеет неверный формат.
+    """
+    try:
+        # Декодируем сообщение из JSON и проверяем, соответствует ли оно модели OrderRequest
+        return OrderRequest(**json.loads(body))
+    except (json.JSONDecodeError, ValidationError, TypeError) as e:
+        # В случае ошибки декодирования или валидации выводим ошибку
+        logging.error(f"Message format is invalid: {e}")
+        return None
+
+
+class RabbitMQOrderConsumer:
     """
-    Запускает RabbitMQ-потребителя, который слушает очередь `ORDER_QUEUE` и обрабатывает полученные сообщения.
+    Асинхронный потребитель очереди заказов `ORDER_QUEUE`.
 
-    Потребитель подключается к RabbitMQ серверу и начинает слушать очередь на предмет новых сообщений.
-    Каждое сообщение, соответствующее модели `OrderRequest`, добавляется в список `orders`.
-    В случае ошибок декодирования сообщения или валидации данных, выводится сообщение об ошибке в логах.
+    Запускается и останавливается в lifespan приложения. Сообщения, полученные от брокера
+    (не более `prefetch` неподтверждённых), разбираются несколькими параллельными обработчиками:
+    каждый берёт все уже полученные сообщения (не более `batch_size`), сохраняет валидные заказы
+    в таблицу `orders` одним многострочным INSERT и только после этого подтверждает сообщения.
+    Отдельная задача периодически удаляет заказы сверх срока хранения и количества на ресторан.
+    При остановке новые сообщения перестают приниматься, а уже полученные дообрабатываются.
     """
 
-    def main():
+    def __init__(self,
+                 host: str = RABBIT_HOST,
+                 port: int = RABBIT_PORT,
+                 username: str = RABBIT_USER,
+                 password: str = RABBIT_PASSWORD,
+                 queue_name: str = ORDER_QUEUE,
+                 dead_letter_queue_name: str = ORDER_DEAD_LETTER_QUEUE,
+                 concurrency: int = ORDER_CONSUMER_CONCURRENCY,
+                 prefetch: int = ORDER_CONSUMER_PREFETCH,
+                 batch_size: int = ORDER_BATCH_SIZE):
+        """
+        Инициализирует потребителя с параметрами подключения и обработки.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.queue_name = queue_name
+        self.dead_letter_queue_name = dead_letter_queue_name
+        self.concurrency = concurrency
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channel: Optional[AbstractChannel] = None
+        self._queue: Optional[AbstractQueue] = None
+        self._consumer_tag: Optional[str] = None
+        self._buffer: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._task: Optional[asyncio.Task] = None
+        self._lag_task: Optional[asyncio.Task] = None
+        self._retention_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Запускает потребителя в фоне, не задерживая запуск приложения:
+        подключение к RabbitMQ выполняется отдельной задачей с повторными попытками.
+        """
+        self._buffer = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._task = asyncio.create_task(self._connect_and_consume())
+        # Дальше размер таблицы заказов отслеживается по сохранённым пакетам и удалённым заказам
+        ORDERS_STORED.set(await count_orders())
+        self._retention_task = asyncio.create_task(self._purge_orders())
+
+    @property
+    def buffered(self) -> int:
+        """Количество полученных от брокера и ещё не обработанных сообщений."""
+        return self._buffer.qsize() if self._buffer is not None else 0
+
+    async def _connect_and_consume(self):
+        """
+        Подключается к RabbitMQ и подписывается на очередь. Любая ошибка подключения или настройки
+        канала и очереди повторяется с ограниченной экспоненциальной задержкой, чтобы задача
+        не завершилась молча и потребитель не перестал получать заказы.
+        """
+        delay = 0.5
+        while True:
+            try:
+                await self._consume()
+                break
+            except Exception as e:
+                logging.warning(f"Failed to start consuming {self.queue_name}: {e}. Retrying in {delay} seconds...")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RABBIT_RECONNECT_MAX_DELAY)
+        logging.info(f"Consuming queue {self.queue_name} with {self.concurrency} workers.")
+        self._lag_task = asyncio.create_task(self._sample_lag())
+
+    async def _consume(self):
+        """Открывает соединение (если его ещё нет) и канал, объявляет очереди и подписывается на очередь заказов."""
+        if self.connection is None:
+            # Robust-соединение само восстанавливает канал и подписку после разрыва
+            self.connection = await aio_pika.connect_robust(
+                host=self.host, port=self.port, login=self.username, password=self.password)
+            logging.info("RabbitMQ connection established.")
+        if self.channel is not None and not self.channel.is_closed:
+            # Канал неудавшейся попытки
+            await self.channel.close()
+        self.channel = await self.connection.channel()
+        # Ограничиваем количество сообщений, выданных потребителю без подтверждения
+        await self.channel.set_qos(prefetch_count=self.prefetch)
+        await self.channel.declare_queue(self.dead_letter_queue_name, durable=True)
+        self._queue = await self.channel.declare_queue(self.queue_name, durable=True)
+        self._consumer_tag = await self._queue.consume(self._on_message)
+
+    async def _sample_lag(self):
+        """
+        Периодически запрашивает у брокера количество сообщений в очереди (пассивное объявление
+        очереди) и записывает его в метрику отставания. Запрос выполняется по таймеру, а не
+        при каждом сборе метрик.
+
+        Запрос выполняется в отдельном короткоживущем канале: ошибка уровня канала (например,
+        404 после удаления очереди) закрывает его, а не канал, через который получаются заказы.
+        """
+        while True:
+            try:
+                channel = await self.connection.channel()
+                try:
+                    # robust=False: проверочное объявление не нужно повторять после переподключения
+                    queue = await channel.declare_queue(self.queue_name, passive=True, robust=False)
+                    ORDER_CONSUMER_LAG.set(queue.declaration_result.message_count)
+                finally:
+                    if not channel.is_closed:
+                        await channel.close()
+            except Exception as e:
+                logging.warning(f"Failed to get {self.queue_name} queue depth: {e}")
+            await asyncio.sleep(ORDER_CONSUMER_LAG_INTERVAL)
+
+    async def _purge_orders(self):
         """
-       Основная функция потребителя RabbitMQ, которая пытается установить соединение с сервером RabbitMQ,
-       затем слушает очередь и обрабатывает сообщения.
+        Периодически удаляет заказы старше ORDER_RETENTION_MAX_AGE и самые старые заказы
+        каждого ресторана сверх ORDER_RETENTION_MAX_PER_RESTAURANT.
+        """
+        while True:
+            try:
+                stored = await purge_orders(ORDER_RETENTION_MAX_AGE, ORDER_RETENTION_MAX_PER_RESTAURANT)
+                ORDERS_STORED.set(stored)
+            except Exception as e:
+                logging.error(f"Failed to purge old orders: {e}")
+            await asyncio.sleep(ORDER_RETENTION_INTERVAL)
+
+    async def _on_message(self, message: AbstractIncomingMessage):
+        """Передаёт полученное сообщение обработчикам."""
+        logging.info(f"RabbitMQ - {self.queue_name} - Get Message: {message.body}")
+        await self._buffer.put(message)
 
-       Если подключение не удается, функция будет повторно пытаться подключиться каждые 1 секунду.
-       Когда соединение установлено, создается канал и объявляется очередь для получения сообщений.
-       """
-        connection = None
-        time.sleep(5)
-        # Пытаемся подключиться к RabbitMQ до тех пор, пока соединение не будет установлено
-        while connection is None:
+    async def _worker(self):
+        """
+        Обработчик сообщений: забирает первое сообщение и все уже полученные следом за ним
+        (не более batch_size) и обрабатывает их одним пакетом.
+        """
+        while True:
+            message = await self._buffer.get()
+            if message is None:
+                self._buffer.task_done()
+                return
+            batch = [message]
+            while len(batch) < self.batch_size and not self._buffer.empty():
+                next_message = self._buffer.get_nowait()
+                if next_message is None:
+                    # Сигнал остановки возвращаем в очередь для следующей итерации
+                    self._buffer.task_done()
+                    self._buffer.put_nowait(None)
+                    break
+                batch.append(next_message)
             try:
-                # Устанавливаем соединение с RabbitMQ
-                connection = pika.BlockingConnection(pika.ConnectionParameters(
-                    host=RABBIT_HOST,
-                    port=RABBIT_PORT,
-                    credentials=pika.PlainCredentials(RABBIT_USER, RABBIT_PASSWORD)
-                ))
-                logging.info("RabbitMQ connection established.")
-            except pika.exceptions.AMQPConnectionError:
-                # Если соединение не удается, выводим предупреждение и пробуем снова через 1 секунду
-                logging.warning("RabbitMQ not available. Retrying in 1 seconds...")
-                time.sleep(1)
-
-        # Создаем канал для общения с RabbitMQ
-        channel = connection.channel()
-
-        # Объявляем очередь, если она не существует
-        channel.queue_declare(queue=ORDER_QUEUE, durable=True)
-
-        def callback(ch, method, properties, body):
-            """
-            Функция-обработчик для сообщений из очереди. Когда новое сообщение поступает в очередь,
-            эта функция будет вызвана.
-            """
-            logging.info(f"RabbitMQ - {ORDER_QUEUE} - Get Message: {body}")
+                await self.process_batch(batch)
+            except Exception as e:
+                logging.error(f"Failed to process orders batch: {e}")
+            finally:
+                for _ in batch:
+                    self._buffer.task_done()
+
+    async def process_batch(self, messages: List[AbstractIncomingMessage]):
+        """
+        Сохраняет валидные заказы пакета одной транзакцией, подтверждает сообщения после фиксации
+        и рассылает заказы подписчикам. Если запись пакета не удалась, заказы сохраняются
+        по одному (см. _process_one), чтобы один ошибочный заказ не задерживал остальные.
+        """
+        started = time.perf_counter()
+        parsed_orders = [parse_order(message.body) for message in messages]
+        valid = [(message, order) for message, order in zip(messages, parsed_orders) if order is not None]
+        # Невалидные сообщения подтверждаются, чтобы не зацикливать их в очереди
+        for message, order in zip(messages, parsed_orders):
+            if order is None:
+                await message.ack()
+        ORDER_CONSUMER_MESSAGES.labels("invalid").inc(len(messages) - len(valid))
+        if not valid:
+            return
+        try:
+            saved_orders = await add_orders([order for _, order in valid])
+        except Exception as e:
+            logging.error(f"Failed to save orders batch, saving {len(valid)} orders one by one: {e}")
+            for message, order in valid:
+                await self._process_one(message, order)
+            return
+        for message, _ in valid:
+            await message.ack()
+        ORDER_CONSUMER_BATCH_DURATION.observe(time.perf_counter() - started)
+        self._saved(saved_orders)
+
+    async def _process_one(self, message: AbstractIncomingMessage, order: OrderRequest):
+        """
+        Сохраняет один заказ после ошибки записи пакета. Если запись не удалась, сообщение
+        возвращается в очередь, а если оно уже доставлялось повторно — переносится в очередь
+        ORDER_DEAD_LETTER_QUEUE, чтобы ошибочный заказ не доставлялся бесконечно.
+        """
+        try:
+            saved_orders = await add_orders([order])
+        except Exception as e:
+            if not message.redelivered or not await self._dead_letter(message, e):
+                logging.error(f"Failed to save order, returning it to the queue: {e}")
+                await message.nack(requeue=True)
+                ORDER_CONSUMER_MESSAGES.labels("requeued").inc()
+            return
+        await message.ack()
+        self._saved(saved_orders)
+
+    async def _dead_letter(self, message: AbstractIncomingMessage, error: Exception) -> bool:
+        """
+        Публикует сообщение в очередь ORDER_DEAD_LETTER_QUEUE с описанием ошибки и подтверждает его.
+        Возвращает False, если публикация не удалась.
+        """
+        try:
+            await self.channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=message.body,
+                    content_type=message.content_type,
+                    headers={"x-error": str(error)[:1000]},
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                ),
+                routing_key=self.dead_letter_queue_name
+            )
+        except Exception as e:
+            logging.error(f"Failed to dead-letter order message: {e}")
+            return False
+        await message.ack()
+        logging.error(f"Order could not be saved after redelivery, moved to {self.dead_letter_queue_name}: {error}")
+        ORDER_CONSUMER_MESSAGES.labels("dead_lettered").inc()
+        return True
+
+    @staticmethod
+    def _saved(saved_orders):
+        """Учитывает сохранённые заказы в метриках и сразу рассылает их подключённым владельцам ресторанов."""
+        ORDER_CONSUMER_MESSAGES.labels("saved").inc(len(saved_orders))
+        ORDERS_STORED.inc(len(saved_orders))
+        for row in saved_orders:
+            order_broadcaster.publish(row['restaurant_id'], row['id'], row['payload'])
+
+    async def stop(self):
+        """
+        Останавливает потребителя: отменяет подписку, дожидается обработки уже полученных
+        сообщений (не дольше ORDER_CONSUMER_DRAIN_TIMEOUT) и закрывает соединение.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for task in (self._lag_task, self._retention_task):
+            if task is not None:
+                task.cancel()
+        self._lag_task = self._retention_task = None
+        if self._queue is not None and self._consumer_tag is not None:
+            await self._queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+        if self._buffer is not None:
             try:
-                # Декодируем сообщение из JSON
-                message = json.loads(body)
-                # Проверяем, соответствует ли сообщение модели OrderRequest
-                order = OrderRequest(**message)
-                # Если успешно, добавляем в массив orders
-                orders.append(order.dict())
-                logging.info("Message added to orders list.")
-            except (json.JSONDecodeError, ValidationError) as e:
-                # В случае ошибки декодирования или валидации выводим ошибку
-                logging.error(f"Message format is invalid: {e}")
-
-        # Настроим потребителя на получение сообщений из очереди
-        channel.basic_consume(queue=ORDER_QUEUE, on_message_callback=callback, auto_ack=True)
-        # Начинаем получать сообщения
-        channel.start_consuming()
-
-    # Запускаем функцию main в отдельном потоке, чтобы не блокировать основной поток приложения
-    threading.Thread(target=main, daemon=True).start()
+                await asyncio.wait_for(self._buffer.join(), timeout=ORDER_CONSUMER_DRAIN_TIMEOUT)
+                for _ in self._workers:
+                    self._buffer.put_nowait(None)
+            except asyncio.TimeoutError:
+                # Неподтверждённые сообщения брокер выдаст повторно после закрытия соединения
+                logging.warning("Order consumer did not drain in-flight messages in time.")
+                for worker in self._workers:
+                    worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+
+        if self.connection is not None and not self.connection.is_closed:
+            await self.connection.close()
+            logging.info("Connection to RabbitMQ closed.")
+        self.connection = None
+
+
+# Глобальный потребитель очереди заказов
+order_consumer = RabbitMQOrderConsumer()
+ORDER_CONSUMER_BUFFERED.set_function(lambda: order_consumer.buffered)
@@ -1,9 +1,13 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from app.api.database import db_manager
 from app.api.database.db_manager import get_dishes_by_restaurant, user_is_own_restaurant
-from app.api.model.dish import DishOut, DishIn, DishUpdate
+from app.api.model.dish import DishOut, DishIn, DishUpdate, MenuImportResult
 from app.api.utils.get_current_user import get_current_user
+from app.api.utils.json_response import json_response
+from app.api.utils.menu_io import MENU_MEDIA_TYPES, format_menu, menu_format, parse_menu, read_body
+from app.api.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, decode_cursor, paginate, set_next_cursor
 
 # Инициализация маршрутизатора для управления блюдами
 dish_router = APIRouter()
@@ -13,13 +17,22 @@ dish_router = APIRouter()
     path='/restaurant/{restaurant_id}/dish',
     response_model=List[DishOut],
     status_code=status.HTTP_200_OK)
-async def get_restaurant_dishes(restaurant_id: int, token: str):
+async def get_restaurant_dishes(restaurant_id: int,
+                                token: str,
+                                request: Request,
+                                response: Response,
+                                limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                                cursor: Optional[str] = None):
     """
-    Получает список блюд для ресторана текущего пользователя.
+    Получает список блюд для ресторана текущего пользователя постранично.
+    Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
     """
     current_user = await get_current_user(token)
     if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id):
-        return await get_dishes_by_restaurant(restaurant_id)
+        rows = await get_dishes_by_restaurant(restaurant_id, decode_cursor(cursor), limit + 1)
+        dishes, next_cursor = paginate(rows, limit)
+        set_next_cursor(response, next_cursor)
+        return json_response(request, response, dishes)
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -30,12 +43,45 @@ async def get_restaurant_dishes(restaurant_id: int, token: str):
 async def add_dish(restaurant_id: int, payload: DishIn, token: str):
     """
     Добавляет новое блюдо в ресторан текущего пользователя.
+    Владение рестораном проверяется в том же запросе, что и добавление.
+    """
+    current_user = await get_current_user(token)
+    if current_user.get("is_owner"):
+        return await db_manager.add_dish(restaurant_id, current_user["id"], payload)
+    raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+
+@dish_router.post(
+    path='/restaurant/{restaurant_id}/dish/import',
+    response_model=MenuImportResult,
+    status_code=status.HTTP_201_CREATED)
+async def import_menu(restaurant_id: int, token: str, request: Request, replace: bool = False):
+    """
+    Загружает меню ресторана текущего пользователя одним запросом.
+    Формат тела определяется по Content-Type: массив JSON, NDJSON или CSV с заголовком
+    `name,price,ingredients`. Все блюда добавляются в одной транзакции; если хотя бы одно блюдо
+    не проходит проверку, меню не изменяется. С `replace=true` текущее меню заменяется загруженным.
+    """
+    current_user = await get_current_user(token)
+    if current_user.get("is_owner"):
+        format = menu_format(request.headers.get("content-type", ""))
+        items = parse_menu(await read_body(request), format)
+        return await db_manager.import_dishes(restaurant_id, current_user["id"], items, replace)
+    raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+
+@dish_router.get(
+    path='/restaurant/{restaurant_id}/dish/export',
+    status_code=status.HTTP_200_OK)
+async def export_menu(restaurant_id: int, token: str,
+                      format: str = Query(default="ndjson", pattern="^(json|ndjson|csv)$")):
+    """
+    Выгружает всё меню ресторана текущего пользователя потоком в формате JSON, NDJSON или CSV.
     """
     current_user = await get_current_user(token)
     if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id):
-        dish_id = await db_manager.add_dish(restaurant_id, payload)
-        dish = await db_manager.get_dish(dish_id)
-        return dish
+        rows = db_manager.iterate_dishes_by_restaurant(restaurant_id)
+        return StreamingResponse(format_menu(rows, format), media_type=MENU_MEDIA_TYPES[format])
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -45,11 +91,11 @@ async def add_dish(restaurant_id: int, payload: DishIn, token: str):
 async def update_dish(restaurant_id: int, dish_id: int, token: str, payload: DishUpdate):
     """
     Обновляет информацию о блюде в ресторане текущего пользователя.
+    Принадлежность блюда ресторану и владение рестораном проверяются в том же запросе, что и обновление.
     """
     current_user = await get_current_user(token)
-    if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id):
-        updated_dish = await db_manager.update_dish(dish_id, payload)
-        return updated_dish
+    if current_user.get("is_owner"):
+        return await db_manager.update_dish(dish_id, payload, restaurant_id, current_user["id"])
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -59,9 +105,10 @@ async def update_dish(restaurant_id: int, dish_id: int, token: str, payload: Dis
 async def delete_dish(restaurant_id: int, dish_id: int, token: str):
     """
     Удаляет блюдо из ресторана текущего пользователя.
+    Принадлежность блюда ресторану и владение рестораном проверяются в том же запросе, что и удаление.
     """
     current_user = await get_current_user(token)
-    if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id):
-        await db_manager.delete_dish(dish_id)
+    if current_user.get("is_owner"):
+        await db_manager.delete_dish(dish_id, restaurant_id, current_user["id"])
         return
     raise HTTPException(status_code=403, detail="Доступ запрещен")
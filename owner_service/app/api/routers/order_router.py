@@ -1,24 +1,113 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
-from app.api.rabbit.rabbitmq_order_consumer import orders, OrderRequest
+import asyncio
+import os
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from app.api.rabbit.models import OrderOut
+from app.api.rabbit.order_broadcaster import order_broadcaster
 from app.api.utils.get_current_user import get_current_user
-from app.api.database.db_manager import user_is_own_restaurant
+from app.api.utils.json_response import json_response
+from app.api.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, decode_cursor, paginate, set_next_cursor
+from app.api.database.db_manager import user_is_own_restaurant, get_orders_by_restaurant, get_orders_after
+
+# Интервал отправки служебных сообщений, поддерживающих соединение (в секундах)
+ORDER_STREAM_HEARTBEAT: float = float(os.getenv("ORDER_STREAM_HEARTBEAT", default=15))
+# Количество пропущенных заказов, догружаемых при переподключении одним запросом
+ORDER_STREAM_BACKFILL_LIMIT: int = int(os.getenv("ORDER_STREAM_BACKFILL_LIMIT", default=1000))
 
 # Инициализация маршрутизатора для получения заказов
 order_router = APIRouter()
 
 
 @order_router.get(path='/orders/{restaurant_id}',
-                  response_model=List[OrderRequest],
+                  response_model=List[OrderOut],
                   status_code=status.HTTP_200_OK)
-async def get_orders(token: str, restaurant_id: int):
+async def get_orders(token: str,
+                     restaurant_id: int,
+                     request: Request,
+                     response: Response,
+                     limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                     cursor: Optional[str] = None):
     """
-    Получает список заказов для ресторана текущего пользователя.
+    Получает список заказов для ресторана текущего пользователя постранично, в порядке поступления.
+    Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
     """
     current_user = await get_current_user(token)
     if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id):
-        filtered_orders = [
-            OrderRequest(**order) for order in orders if order['restaurant_id'] == restaurant_id
-        ]
-        return filtered_orders
+        rows = await get_orders_by_restaurant(restaurant_id, decode_cursor(cursor), limit + 1)
+        orders, next_cursor = paginate(rows, limit)
+        set_next_cursor(response, next_cursor)
+        return json_response(request, response, orders)
     raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+
+def format_order_event(order_id: int, payload: str) -> str:
+    """Форматирует заказ как событие Server-Sent Events."""
+    return f"id: {order_id}\nevent: order\ndata: {payload}\n\n"
+
+
+@order_router.get(path='/orders/{restaurant_id}/stream',
+                  status_code=status.HTTP_200_OK)
+async def stream_orders(request: Request,
+                        token: str,
+                        restaurant_id: int,
+                        last_id: Optional[int] = None,
+                        last_event_id: Optional[int] = Header(default=None)):
+    """
+    Поток новых заказов ресторана текущего пользователя (Server-Sent Events).
+
+    Заменяет периодический опрос `/orders/{restaurant_id}`: новые заказы приходят сразу после
+    сохранения потребителем. При переподключении клиент передаёт ID последнего полученного заказа
+    (заголовок `Last-Event-ID` или параметр `last_id`), и пропущенные заказы догружаются из базы данных.
+
+    Параллельные обработчики потребителя рассылают заказы не обязательно в порядке ID, поэтому
+    заказы из рассылки не сравниваются с последним отправленным ID: пропускаются только заказы,
+    уже отправленные при догрузке. ID в базе данных выдаются в порядке фиксации записи, поэтому
+    все заказы с ID не больше последнего догруженного уже были в догрузке.
+    """
+    current_user = await get_current_user(token)
+    if not (current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], restaurant_id)):
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+    resume_from = last_event_id if last_event_id is not None else last_id
+
+    async def event_stream():
+        # Подписываемся до выборки пропущенных заказов, чтобы не потерять заказы между ними
+        subscription = order_broadcaster.subscribe(restaurant_id)
+        backfilled_id = resume_from or 0
+        try:
+            if resume_from is not None:
+                # Догружаем пропущенные заказы постранично, пока не получим неполную страницу
+                while True:
+                    rows = await get_orders_after(restaurant_id, backfilled_id, ORDER_STREAM_BACKFILL_LIMIT)
+                    for row in rows:
+                        backfilled_id = row['id']
+                        yield format_order_event(row['id'], row['payload'])
+                    if len(rows) < ORDER_STREAM_BACKFILL_LIMIT:
+                        break
+
+            while True:
+                try:
+                    event = await subscription.get(timeout=ORDER_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    # Буфер подключения переполнен — клиент переподключится с Last-Event-ID
+                    return
+                order_id, payload = event
+                if order_id <= backfilled_id:
+                    # Заказ уже отправлен при догрузке из базы данных
+                    continue
+                yield format_order_event(order_id, payload)
+        finally:
+            order_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Отключаем буферизацию ответа в nginx, чтобы события доходили сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,12 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 
 from app.api.database import db_manager
-from app.api.database.db_manager import get_restaurants_by_user, get_restaurant, user_is_own_restaurant
+from app.api.database.db_manager import get_restaurants_by_user
 from app.api.model.restaurant import RestaurantIn, RestaurantUpdate, Restaurant
 from app.api.utils.get_current_user import get_current_user
+from app.api.utils.json_response import json_response
+from app.api.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, decode_cursor, paginate, set_next_cursor
 
 # Инициализация маршрутизатора для управления ресторанами
 restaurant_router = APIRouter()
@@ -14,13 +16,21 @@ restaurant_router = APIRouter()
     path='/restaurants',
     response_model=List[Restaurant],
     status_code=status.HTTP_200_OK)
-async def get_user_restaurants(token: str):
+async def get_user_restaurants(token: str,
+                               request: Request,
+                               response: Response,
+                               limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                               cursor: Optional[str] = None):
     """
-    Получает список ресторанов, принадлежащих текущему пользователю.
+    Получает список ресторанов, принадлежащих текущему пользователю, постранично.
+    Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
     """
     current_user = await get_current_user(token)
     if current_user.get("is_owner"):
-        return await get_restaurants_by_user(current_user["id"])
+        rows = await get_restaurants_by_user(current_user["id"], decode_cursor(cursor), limit + 1)
+        restaurants, next_cursor = paginate(rows, limit)
+        set_next_cursor(response, next_cursor)
+        return json_response(request, response, restaurants)
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -34,9 +44,7 @@ async def add_restaurant(payload: RestaurantIn, token: str):
     """
     current_user = await get_current_user(token)
     if current_user.get("is_owner"):
-        restaurant_id = await db_manager.add_restaurant(current_user["id"], payload)
-        restaurant = await get_restaurant(restaurant_id)
-        return restaurant
+        return await db_manager.add_restaurant(current_user["id"], payload)
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -46,11 +54,11 @@ async def add_restaurant(payload: RestaurantIn, token: str):
 async def update_restaurant(id: int, payload: RestaurantUpdate, token: str):
     """
     Обновляет информацию о ресторане текущего пользователя.
+    Владение рестораном проверяется в том же запросе, что и обновление.
     """
     current_user = await get_current_user(token)
-    if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], id):
-        updated_restaurant = await db_manager.update_restaurant(id, payload)
-        return updated_restaurant
+    if current_user.get("is_owner"):
+        return await db_manager.update_restaurant(id, current_user["id"], payload)
     raise HTTPException(status_code=403, detail="Доступ запрещен")
 
 
@@ -60,9 +68,10 @@ async def update_restaurant(id: int, payload: RestaurantUpdate, token: str):
 async def delete_restaurant(id: int, token: str):
     """
     Удаляет ресторан текущего пользователя.
+    Владение рестораном проверяется в том же запросе, что и удаление.
     """
     current_user = await get_current_user(token)
-    if current_user.get("is_owner") and await user_is_own_restaurant(current_user["id"], id):
-        await db_manager.delete_restaurant(id)
+    if current_user.get("is_owner"):
+        await db_manager.delete_restaurant(id, current_user["id"])
         return
     raise HTTPException(status_code=403, detail="Доступ запрещен")
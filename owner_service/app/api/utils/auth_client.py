@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+import httpx
+
+# Адрес эндпоинта пакетной проверки токенов в auth_service
+AUTH_INTROSPECT_URL: str = os.getenv(
+    "AUTH_INTROSPECT_URL", default="http://auth_service:8000/api/v1/auth/users/introspect")
+
+# Время ожидания (в секундах), в течение которого запросы собираются в один пакет,
+# и максимальный размер пакета
+AUTH_BATCH_WINDOW: float = float(os.getenv("AUTH_BATCH_WINDOW", default=0.002))
+AUTH_BATCH_MAX_SIZE: int = int(os.getenv("AUTH_BATCH_MAX_SIZE", default=100))
+
+# Таймаут обращения к auth_service (в секундах)
+AUTH_REQUEST_TIMEOUT: float = float(os.getenv("AUTH_REQUEST_TIMEOUT", default=5))
+
+
+class AuthIntrospectionClient:
+    """
+    Клиент для проверки токенов через auth_service.
+
+    Одновременные запросы с одинаковым токеном объединяются в один запрос,
+    разные токены, пришедшие почти одновременно, отправляются одним пакетом,
+    а HTTP соединения с auth_service переиспользуются (keep-alive).
+    """
+
+    def __init__(self,
+                 url: str = AUTH_INTROSPECT_URL,
+                 batch_window: float = AUTH_BATCH_WINDOW,
+                 batch_max_size: int = AUTH_BATCH_MAX_SIZE,
+                 timeout: float = AUTH_REQUEST_TIMEOUT):
+        """
+        Инициализирует клиент с адресом эндпоинта и параметрами пакетирования.
+        """
+        self.url = url
+        self.batch_window = batch_window
+        self.batch_max_size = batch_max_size
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        # Токены, запрос по которым уже выполняется или ожидает отправки
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Токены текущего ещё не отправленного пакета
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Выполняющиеся пакетные запросы (ссылки не дают сборщику мусора удалить задачи)
+        self._batches: Set[asyncio.Task] = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Общий HTTP клиент с пулом keep-alive соединений, создаётся при первом обращении."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100))
+        return self._client
+
+    async def lookup(self, token: str) -> Optional[dict]:
+        """
+        Возвращает данные пользователя по токену или None, если токен недействителен.
+        """
+        future = self._inflight.get(token)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[token] = future
+            self._pending.append(token)
+            if len(self._pending) >= self.batch_max_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        # shield не даёт отмене одного обработчика отменить общий запрос
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        """Отправляет накопленный пакет токенов в auth_service."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        tokens, self._pending = self._pending, []
+        if tokens:
+            task = asyncio.create_task(self._send_batch(tokens))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, tokens: List[str]):
+        """Выполняет пакетный запрос и передаёт результаты ожидающим обработчикам."""
+        try:
+            response = await self.client.post(self.url, json={"tokens": tokens})
+            response.raise_for_status()
+            users = response.json()
+            for token, user in zip(tokens, users):
+                self._resolve(token, result=user)
+            # Токены без ответа считаются недействительными
+            for token in tokens[len(users):]:
+                self._resolve(token)
+        except Exception as e:
+            logging.error(f"Token introspection request failed: {e}")
+            for token in tokens:
+                self._resolve(token, error=e)
+
+    def _resolve(self, token: str, result: Optional[dict] = None, error: Optional[Exception] = None):
+        """Завершает ожидание по токену результатом или ошибкой."""
+        future = self._inflight.pop(token, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self):
+        """Дожидается выполняющихся пакетных запросов и закрывает HTTP клиент и его соединения."""
+        if self._flush_handle is not None:
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Глобальный клиент, разделяемый всеми обработчиками
+auth_client = AuthIntrospectionClient()
@@ -1,10 +1,80 @@
-import httpx
+import logging
+import os
+import time
+from typing import Optional
 
-# Конфигурация для обращения к микросервису
-AUTH_SERVICE_URL = "http://auth_service:8000/api/v1/auth/user?token="
+import jwt
+from fastapi import HTTPException, status
+from prometheus_client import Histogram
+
+from app.api.utils.auth_client import auth_client
+from app.api.utils.jwks_client import jwks_client
+from app.api.utils.metrics import LATENCY_BUCKETS, metrics_registry
+from app.api.utils.token_cache import TokenCache
+
+# Удалённая проверка токена в auth_service используется только если она явно включена
+AUTH_REMOTE_FALLBACK: bool = os.getenv("AUTH_REMOTE_FALLBACK", default="false").lower() == "true"
+
+# Кэш проверенных токенов: размер и максимальное время жизни записи (в секундах)
+TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", default=10000))
+TOKEN_CACHE_TTL: float = float(os.getenv("TOKEN_CACHE_TTL", default=300))
+
+token_cache = TokenCache(max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Время проверки токена по способу, которым она завершилась: cache, jwks, remote (auth_service) или rejected
+AUTH_DURATION = Histogram(
+    "auth_duration_seconds", "Token verification time in get_current_user by source",
+    ["source"], buckets=LATENCY_BUCKETS, registry=metrics_registry)
+
+
+def unverified_exp(token: str) -> Optional[float]:
+    """
+    Срок действия токена (`exp`) из его claims без проверки подписи: используется только для
+    времени жизни записи кэша токена, который уже проверил auth_service.
+    """
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
 
 
 async def get_current_user(token: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(AUTH_SERVICE_URL + token)
-        return response.json()
\ No newline at end of file
+    """
+    Возвращает данные текущего пользователя (`id`, `is_owner`) по JWT токену.
+
+    Токен проверяется локально (подпись по открытому ключу из JWKS auth_service и `exp`),
+    а проверенные токены кэшируются не дольше срока их действия.
+    Обращение к auth_service за проверкой токена выполняется только при включённом
+    AUTH_REMOTE_FALLBACK и только если локальная проверка не удалась.
+    """
+    started = time.perf_counter()
+    user = token_cache.get(token)
+    if user is not None:
+        AUTH_DURATION.labels("cache").observe(time.perf_counter() - started)
+        return user
+
+    payload = await jwks_client.decode(token)
+    if payload is not None:
+        user = {"id": payload["id"], "is_owner": payload.get("is_owner", False)}
+        token_cache.set(token, user, exp=payload.get("exp"))
+        AUTH_DURATION.labels("jwks").observe(time.perf_counter() - started)
+        return user
+
+    if AUTH_REMOTE_FALLBACK:
+        logging.info("Local token verification failed, falling back to auth_service.")
+        try:
+            user = await auth_client.lookup(token)
+        except Exception:
+            AUTH_DURATION.labels("remote").observe(time.perf_counter() - started)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Auth service unavailable")
+        if user is not None:
+            # Запись кэша не должна пережить токен: токен без `exp` не кэшируется
+            exp = unverified_exp(token)
+            if exp is not None:
+                token_cache.set(token, user, exp=exp)
+            AUTH_DURATION.labels("remote").observe(time.perf_counter() - started)
+            return user
+
+    AUTH_DURATION.labels("rejected").observe(time.perf_counter() - started)
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
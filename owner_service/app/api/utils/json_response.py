@@ -0,0 +1,75 @@
+import gzip
+import os
+from typing import Any, Optional
+
+import brotli
+import orjson
+from fastapi import Request, Response, status
+from starlette.datastructures import MutableHeaders
+
+# Минимальный размер ответа (в байтах), начиная с которого он сжимается
+JSON_COMPRESS_MIN_SIZE: int = int(os.getenv("JSON_COMPRESS_MIN_SIZE", default=1024))
+# Уровни сжатия gzip (1-9) и brotli (0-11): умеренные, чтобы сжатие не занимало больше времени, чем передача
+JSON_GZIP_LEVEL: int = int(os.getenv("JSON_GZIP_LEVEL", default=5))
+JSON_BROTLI_QUALITY: int = int(os.getenv("JSON_BROTLI_QUALITY", default=4))
+
+# Ключи строк SQLAlchemy — подкласс str (quoted_name), который orjson по умолчанию не принимает
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+# Поддерживаемые способы сжатия в порядке предпочтения
+COMPRESSORS = {
+    "br": lambda body: brotli.compress(body, quality=JSON_BROTLI_QUALITY),
+    "gzip": lambda body: gzip.compress(body, compresslevel=JSON_GZIP_LEVEL),
+}
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Выбирает способ сжатия из заголовка Accept-Encoding или возвращает None,
+    если клиент не принимает ни один из поддерживаемых. Способы с q=0 не выбираются.
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    for encoding in COMPRESSORS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Строгий ETag сжатого представления: отличается от ETag несжатого ответа суффиксом способа сжатия."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def json_response(request: Request, response: Response, content: Any) -> Response:
+    """
+    Ответ JSON, сериализованный orjson напрямую из строк базы данных: без построения моделей Pydantic
+    и повторной валидации по response_model маршрута (схема OpenAPI по-прежнему строится по нему).
+    Заголовки, установленные обработчиком в `response`, переносятся в ответ.
+    Ответ не меньше JSON_COMPRESS_MIN_SIZE байт сжимается brotli или gzip, если клиент их принимает.
+    """
+    body = orjson.dumps(content, option=JSON_OPTIONS)
+    headers = MutableHeaders(raw=list(response.headers.raw))
+    headers["Vary"] = "Accept-Encoding"
+    encoding = accepted_encoding(request.headers.get("accept-encoding")) \
+        if len(body) >= JSON_COMPRESS_MIN_SIZE else None
+    if encoding is not None:
+        body = COMPRESSORS[encoding](body)
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+    return Response(body, status_code=response.status_code or status.HTTP_200_OK,
+                    media_type="application/json", headers=headers)
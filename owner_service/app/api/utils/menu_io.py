@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, List
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+
+from app.api.model.dish import DishIn
+
+# Максимальный размер загружаемого меню (в байтах) и максимальное количество блюд в нём
+MENU_IMPORT_MAX_BYTES: int = int(os.getenv("MENU_IMPORT_MAX_BYTES", default=5 * 1024 * 1024))
+MENU_IMPORT_MAX_ITEMS: int = int(os.getenv("MENU_IMPORT_MAX_ITEMS", default=10000))
+
+# Поддерживаемые форматы меню и их типы содержимого
+MENU_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+# Порядок полей блюда при выгрузке
+MENU_EXPORT_FIELDS = ("id", "name", "price", "ingredients")
+
+
+def menu_format(content_type: str) -> str:
+    """
+    Определяет формат меню по заголовку Content-Type.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    for name, known_type in MENU_MEDIA_TYPES.items():
+        if media_type == known_type:
+            return name
+    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail=f"Supported content types: {', '.join(MENU_MEDIA_TYPES.values())}")
+
+
+async def read_body(request: Request) -> bytes:
+    """
+    Читает тело запроса, прерывая чтение, если оно превышает MENU_IMPORT_MAX_BYTES.
+    """
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MENU_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Menu is larger than {MENU_IMPORT_MAX_BYTES} bytes")
+    return bytes(body)
+
+
+def parse_menu(body: bytes, format: str) -> List[DishIn]:
+    """
+    Разбирает и валидирует меню в формате JSON (массив блюд), NDJSON или CSV (с заголовком).
+    При ошибке выбрасывает HTTPException с номером блюда (строки), в котором она найдена.
+    """
+    try:
+        text = body.decode("utf-8-sig")
+        if format == "json":
+            records = json.loads(text)
+            if not isinstance(records, list):
+                raise ValueError("JSON menu must be an array of dishes")
+        elif format == "ndjson":
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            records = list(csv.DictReader(io.StringIO(text)))
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid menu: {e}")
+
+    if len(records) > MENU_IMPORT_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Menu has more than {MENU_IMPORT_MAX_ITEMS} dishes")
+
+    items = []
+    for number, record in enumerate(records, start=1):
+        try:
+            items.append(DishIn.model_validate(record))
+        except ValidationError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Invalid dish #{number}: {e.errors(include_url=False)}")
+    return items
+
+
+def dish_json(row) -> str:
+    """Сериализует блюдо в JSON."""
+    return json.dumps({field: row[field] for field in MENU_EXPORT_FIELDS}, ensure_ascii=False)
+
+
+async def format_menu(rows: AsyncIterator, format: str) -> AsyncIterator[str]:
+    """
+    Сериализует блюда в выбранный формат по мере чтения из базы данных.
+    """
+    if format == "ndjson":
+        async for row in rows:
+            yield dish_json(row) + "\n"
+    elif format == "json":
+        yield "["
+        first = True
+        async for row in rows:
+            yield dish_json(row) if first else "," + dish_json(row)
+            first = False
+        yield "]"
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MENU_EXPORT_FIELDS)
+        async for row in rows:
+            writer.writerow([row[field] for field in MENU_EXPORT_FIELDS])
+            # Отдаём накопленные строки и очищаем буфер
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
@@ -0,0 +1,126 @@
+import sys
+import time
+from typing import Any, AsyncIterator, Callable, List
+
+from databases import Database
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, GCCollector, Histogram, PlatformCollector, \
+    ProcessCollector, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Реестр метрик сервиса (отдельный, а не глобальный реестр prometheus_client,
+# чтобы несколько сервисов можно было загрузить в один процесс)
+metrics_registry = CollectorRegistry()
+ProcessCollector(registry=metrics_registry)
+PlatformCollector(registry=metrics_registry)
+GCCollector(registry=metrics_registry)
+
+# Границы гистограмм времени (в секундах): HTTP-запросы и обращения к внешним сервисам
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Запросы к SQLite обычно занимают доли миллисекунды
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=metrics_registry)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL query latency by calling function",
+    ["function"], buckets=QUERY_BUCKETS, registry=metrics_registry)
+
+# Методы `databases.Database`, выполняющие запрос
+QUERY_METHODS = ("execute", "execute_many", "fetch_all", "fetch_one", "fetch_val")
+
+# Дополнительные получатели сведений о каждом запросе: (имя вызвавшей функции, запрос, время в секундах)
+query_listeners: List[Callable[[str, Any, float], None]] = []
+
+
+def _record_query(function: str, query: Any, duration: float):
+    """Записывает время запроса в метрики и передаёт его получателям из query_listeners."""
+    DB_QUERY_DURATION.labels(function).observe(duration)
+    for listener in query_listeners:
+        listener(function, query, duration)
+
+
+def _timed_query(method: Callable) -> Callable:
+    """Оборачивает метод запроса: время запроса записывается с именем вызвавшей его функции."""
+    async def wrapper(query: Any, *args: Any, **kwargs: Any) -> Any:
+        # Вызывающая функция определяется по кадру стека (без обхода всего стека)
+        function = sys._getframe(1).f_code.co_name
+        started = time.perf_counter()
+        try:
+            return await method(query, *args, **kwargs)
+        finally:
+            _record_query(function, query, time.perf_counter() - started)
+    return wrapper
+
+
+def _timed_iterate(method: Callable) -> Callable:
+    """Оборачивает `iterate`: записывается время от первой до последней строки."""
+    def wrapper(query: Any, *args: Any, **kwargs: Any) -> AsyncIterator:
+        function = sys._getframe(1).f_code.co_name
+
+        async def rows() -> AsyncIterator:
+            started = time.perf_counter()
+            try:
+                async for row in method(query, *args, **kwargs):
+                    yield row
+            finally:
+                _record_query(function, query, time.perf_counter() - started)
+        return rows()
+    return wrapper
+
+
+def instrument_database(database: Database) -> Database:
+    """
+    Подключает к экземпляру `databases.Database` запись метрик запросов:
+    количество и время запросов по функциям db_manager, которые их выполняют.
+    """
+    for name in QUERY_METHODS:
+        setattr(database, name, _timed_query(getattr(database, name)))
+    database.iterate = _timed_iterate(database.iterate)
+    return database
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, записывающее время обработки HTTP-запросов по шаблону маршрута
+    (например, `/api/v1/owner/restaurant/{restaurant_id}`), методу и коду ответа.
+    Запросы к несуществующим маршрутам записываются под одним шаблоном `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Маршрут FastAPI добавляется в scope при сопоставлении пути
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)) \
+                .observe(time.perf_counter() - started)
+
+
+def setup_metrics(app: FastAPI):
+    """
+    Включает сбор метрик HTTP-запросов и добавляет эндпоинт `/metrics` в формате Prometheus.
+    Эндпоинт не входит в префикс API, поэтому nginx его наружу не проксирует.
+    """
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
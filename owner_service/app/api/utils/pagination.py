@@ -0,0 +1,80 @@
+import base64
+import binascii
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+
+# Размер страницы по умолчанию и максимальный размер страницы
+DEFAULT_PAGE_LIMIT: int = int(os.getenv("DEFAULT_PAGE_LIMIT", default=100))
+MAX_PAGE_LIMIT: int = int(os.getenv("MAX_PAGE_LIMIT", default=500))
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode(data: dict) -> str:
+    """Кодирует данные курсора в непрозрачную строку."""
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str, key: str) -> int:
+    """Декодирует курсор и возвращает неотрицательное целое значение по ключу."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = int(data[key])
+    except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if value < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return value
+
+
+def encode_cursor(last_id: int) -> str:
+    """Кодирует ID последней записи страницы в непрозрачный курсор."""
+    return _encode({"id": last_id})
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """
+    Декодирует курсор в ID последней записи предыдущей страницы.
+    Для первой страницы (курсор не передан) возвращает 0.
+    """
+    if not cursor:
+        return 0
+    return _decode(cursor, "id")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """
+    Кодирует смещение следующей страницы в непрозрачный курсор.
+    Используется для выдачи, упорядоченной не по ID (например, по релевантности).
+    """
+    return _encode({"offset": offset})
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """
+    Декодирует курсор в смещение страницы. Для первой страницы возвращает 0.
+    """
+    if not cursor:
+        return 0
+    return _decode(cursor, "offset")
+
+
+def paginate(rows: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Делит результат запроса, выбранный с LIMIT limit + 1, на страницу и курсор следующей страницы.
+    Курсор равен None, если страница последняя.
+    """
+    page = list(rows[:limit])
+    if len(rows) > limit:
+        return page, encode_cursor(page[-1]['id'])
+    return page, None
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Добавляет курсор следующей страницы в заголовки ответа."""
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
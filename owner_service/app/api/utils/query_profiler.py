@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.utils.metrics import query_listeners
+
+# Профилирование запросов к базе данных (режим отладки): журнал запросов и заголовок Server-Timing
+# для каждого HTTP-запроса
+QUERY_PROFILER_ENABLED: bool = os.getenv("QUERY_PROFILER_ENABLED", default="false").lower() == "true"
+# Сколько раз запрос одной формы может выполниться за HTTP-запрос до предупреждения о возможном N+1
+QUERY_PROFILER_REPEAT_THRESHOLD: int = int(os.getenv("QUERY_PROFILER_REPEAT_THRESHOLD", default=5))
+# Превышение бюджета запросов маршрута вызывает ошибку, а не только предупреждение (для тестов)
+QUERY_BUDGETS_ENFORCED: bool = os.getenv("QUERY_BUDGETS_ENFORCED", default="false").lower() == "true"
+
+
+class QueryBudgetExceededError(Exception):
+    """HTTP-запрос выполнил больше запросов к базе данных, чем допускает бюджет маршрута."""
+
+
+class QueryRecord(NamedTuple):
+    """
+    Запрос к базе данных, выполненный при обработке HTTP-запроса.
+
+    :param function: Функция (обычно из db_manager), выполнившая запрос
+    :param statement: Текст запроса без значений параметров (форма запроса)
+    :param duration: Время выполнения (в секундах)
+    """
+    function: str
+    statement: str
+    duration: float
+
+
+class RequestProfile:
+    """Запросы к базе данных, выполненные при обработке одного HTTP-запроса."""
+
+    def __init__(self):
+        self.queries: List[QueryRecord] = []
+
+    def record(self, function: str, statement: str, duration: float):
+        self.queries.append(QueryRecord(function, statement, duration))
+
+    @property
+    def duration(self) -> float:
+        """Суммарное время запросов (в секундах)."""
+        return sum(query.duration for query in self.queries)
+
+    def by_function(self) -> Dict[str, List[QueryRecord]]:
+        """Запросы, сгруппированные по выполнившим их функциям в порядке первого вызова."""
+        functions: Dict[str, List[QueryRecord]] = {}
+        for query in self.queries:
+            functions.setdefault(query.function, []).append(query)
+        return functions
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Формы запросов, выполненные больше `threshold` раз, с количеством выполнений."""
+        counts = Counter(query.statement for query in self.queries)
+        return {statement: count for statement, count in counts.items() if count > threshold}
+
+    def server_timing(self) -> str:
+        """
+        Значение заголовка Server-Timing: общее время запросов к базе данных
+        и время запросов каждой функции.
+        """
+        entries = [f'db;dur={self.duration * 1000:.3f};desc="{len(self.queries)} queries"']
+        for function, queries in self.by_function().items():
+            duration = sum(query.duration for query in queries)
+            entries.append(f'db-{function};dur={duration * 1000:.3f};desc="{len(queries)} queries"')
+        return ", ".join(entries)
+
+
+# Профиль HTTP-запроса, который сейчас обрабатывается
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("query_profile", default=None)
+
+
+def statement_shape(query: Any) -> str:
+    """Текст запроса с именами параметров вместо значений и без лишних пробелов."""
+    try:
+        statement = str(query)
+    except Exception:
+        # Конструкция, которую нельзя скомпилировать без диалекта базы данных
+        statement = type(query).__name__
+    return " ".join(statement.split())
+
+
+def record_query(function: str, query: Any, duration: float):
+    """Получатель сведений о запросах: добавляет запрос в профиль текущего HTTP-запроса."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(function, statement_shape(query), duration)
+
+
+class QueryProfilerMiddleware:
+    """
+    ASGI middleware профилировщика запросов.
+
+    Собирает запросы к базе данных, выполненные при обработке HTTP-запроса, добавляет в ответ
+    заголовок Server-Timing и пишет в журнал строку JSON с запросами, их временем и функциями.
+    Предупреждает о форме запроса, повторённой больше QUERY_PROFILER_REPEAT_THRESHOLD раз (N+1),
+    и о превышении бюджета запросов маршрута (`budgets`: "METHOD /шаблон/маршрута" -> количество).
+    """
+
+    def __init__(self, app: ASGIApp, budgets: Optional[Dict[str, int]] = None,
+                 repeat_threshold: int = QUERY_PROFILER_REPEAT_THRESHOLD, enforce: bool = QUERY_BUDGETS_ENFORCED):
+        self.app = app
+        self.budgets = budgets or {}
+        self.repeat_threshold = repeat_threshold
+        self.enforce = enforce
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Запросы, выполненные после начала ответа (потоковые ответы), попадают только в журнал
+                MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            elapsed = time.perf_counter() - started
+        self.report(scope, profile, status_code, elapsed)
+
+    def report(self, scope: Scope, profile: RequestProfile, status_code: int, elapsed: float):
+        """Пишет профиль в журнал и проверяет его на N+1 и на бюджет запросов маршрута."""
+        endpoint = f'{scope["method"]} {getattr(scope.get("route"), "path", scope["path"])}'
+        logging.info("Query profile " + json.dumps({
+            "endpoint": endpoint,
+            "path": scope["path"],
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "db_duration_ms": round(profile.duration * 1000, 3),
+            "query_count": len(profile.queries),
+            "queries": [
+                {"function": query.function, "duration_ms": round(query.duration * 1000, 3),
+                 "statement": query.statement}
+                for query in profile.queries
+            ],
+        }, ensure_ascii=False))
+
+        for statement, count in profile.repeated(self.repeat_threshold).items():
+            logging.warning(f"Possible N+1 in {endpoint}: statement executed {count} times: {statement}")
+
+        budget = self.budgets.get(endpoint)
+        if budget is not None and len(profile.queries) > budget:
+            message = f"{endpoint} executed {len(profile.queries)} queries, budget is {budget}"
+            if self.enforce:
+                raise QueryBudgetExceededError(message)
+            logging.warning(f"Query budget exceeded: {message}")
+
+
+def setup_query_profiler(app: FastAPI, budgets: Optional[Dict[str, int]] = None):
+    """
+    Включает профилировщик запросов, если задан QUERY_PROFILER_ENABLED: запросы экземпляров
+    `databases.Database`, подключённых через instrument_database, записываются в профиль HTTP-запроса.
+
+    :param budgets: Максимальное количество запросов к базе данных по маршрутам ("METHOD /шаблон/маршрута")
+    """
+    if not QUERY_PROFILER_ENABLED:
+        return
+    if record_query not in query_listeners:
+        query_listeners.append(record_query)
+    app.add_middleware(QueryProfilerMiddleware, budgets=budgets)
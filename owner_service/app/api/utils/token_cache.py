@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenCache:
+    """
+    Ограниченный по размеру кэш проверенных токенов с ограничением времени жизни записей.
+
+    Запись хранится не дольше `ttl` секунд и в любом случае не дольше срока действия
+    самого токена (`exp`). При переполнении вытесняются наименее недавно использованные записи.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        """
+        Инициализирует кэш с максимальным количеством записей и временем жизни записи (в секундах).
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Возвращает данные пользователя для токена или None, если записи нет или она устарела.
+        """
+        now = time.time()
+        item = self._items.get(token)
+        if item is None:
+            return None
+        expires_at, user = item
+        if expires_at <= now:
+            del self._items[token]
+            return None
+        self._items.move_to_end(token)
+        return user
+
+    def set(self, token: str, user: dict, exp: Optional[float] = None):
+        """
+        Сохраняет данные пользователя для токена.
+        Время жизни записи ограничивается сроком действия токена `exp` (unix timestamp).
+        """
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        self._items[token] = (expires_at, user)
+        self._items.move_to_end(token)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        """Очищает кэш."""
+        self._items.clear()
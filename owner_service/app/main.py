@@ -4,26 +4,55 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.api.database.database import database
-from app.api.rabbit.rabbitmq_order_consumer import start_rabbitmq_order_consumer
+from app.api.rabbit.catalog_events import catalog_publisher
+from app.api.rabbit.rabbitmq_order_consumer import order_consumer
 from app.api.routers.dish_router import dish_router
 from app.api.routers.order_router import order_router
 from app.api.routers.restaurant_router import restaurant_router
+from app.api.utils.auth_client import auth_client
+from app.api.utils.jwks_client import jwks_client
+from app.api.utils.metrics import setup_metrics
+from app.api.utils.query_profiler import setup_query_profiler
 
 # Устанавливаем уровень логирования
 logging.basicConfig(level=logging.INFO)
 
+# Бюджеты запросов к базе данных по маршрутам: проверяются профилировщиком запросов
+# (предупреждение в режиме отладки, ошибка при QUERY_BUDGETS_ENFORCED в тестах).
+# Загрузка меню выполняет запрос на каждые MENU_IMPORT_CHUNK_SIZE блюд, бюджет рассчитан на один пакет
+QUERY_BUDGETS = {
+    "GET /api/v1/owner/restaurants": 1,
+    "POST /api/v1/owner/restaurant": 2,
+    "PUT /api/v1/owner/restaurant/{id}": 2,
+    "DELETE /api/v1/owner/restaurant/{id}": 4,
+    "GET /api/v1/owner/restaurant/{restaurant_id}/dish": 2,
+    "POST /api/v1/owner/restaurant/{restaurant_id}/dish": 6,
+    "POST /api/v1/owner/restaurant/{restaurant_id}/dish/import": 7,
+    "GET /api/v1/owner/restaurant/{restaurant_id}/dish/export": 2,
+    "PUT /api/v1/owner/restaurant/{restaurant_id}/dish/{dish_id}": 6,
+    "DELETE /api/v1/owner/restaurant/{restaurant_id}/dish/{dish_id}": 3,
+    "GET /api/v1/owner/orders/{restaurant_id}": 2,
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Управление жизненным циклом приложения.
-    Выполняет подключение к базе данных при запуске приложения
-    и разрывает соединение при его остановке.
+    Выполняет подключение к базе данных и запуск потребителя RabbitMQ при запуске приложения,
+    а при остановке дообрабатывает полученные заказы и разрывает соединения.
     """
     await database.connect()
+    # Запуск RabbitMQ потребителя для обработки входящих сообщений из очереди
+    await order_consumer.start()
+    # События изменения каталога публикуются через соединение потребителя
+    catalog_publisher.bind(lambda: order_consumer.connection)
     try:
         yield
     finally:
+        await order_consumer.stop()
+        await auth_client.close()
+        await jwks_client.close()
         await database.disconnect()
 
 
@@ -40,5 +69,7 @@ app.include_router(restaurant_router, prefix=prefix, tags=['restaurant'])
 app.include_router(dish_router, prefix=prefix, tags=['dish'])
 app.include_router(order_router, prefix=prefix, tags=['order'])
 
-# Запуск RabbitMQ потребителя для обработки входящих сообщений из очереди
-start_rabbitmq_order_consumer()
+# Метрики в формате Prometheus на /metrics
+setup_metrics(app)
+# Профилирование запросов к базе данных в режиме отладки (QUERY_PROFILER_ENABLED)
+setup_query_profiler(app, budgets=QUERY_BUDGETS)
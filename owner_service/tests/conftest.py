@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Тесты импортируют пакет `app` из каталога сервиса и общие помощники тестов из корня репозитория
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.append(str(SERVICE_DIR.parent))
+
+# Временная база данных задаётся до импорта приложения: схема создаётся миграциями при импорте
+TEST_DIR = tempfile.mkdtemp(prefix="owner-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.sqlite"
+# Профилировщик запросов включается при импорте приложения, превышение бюджета запросов — ошибка
+os.environ["QUERY_PROFILER_ENABLED"] = "true"
+os.environ["QUERY_BUDGETS_ENFORCED"] = "true"
+
+# Владельцы ресторанов, токены которых принимает замена проверки по JWKS
+OWNERS = {1: ("+79990000001", True), 2: ("+79990000002", True)}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def connected(monkeypatch):
+    """Подключение к базе данных тестов без RabbitMQ и auth_service (вместо lifespan приложения)."""
+    from benchmarks.services import StubAuth
+
+    from app.api.database.database import database
+    from app.api.rabbit.catalog_events import catalog_publisher
+    from app.api.utils import get_current_user
+
+    monkeypatch.setattr(get_current_user, "jwks_client", StubAuth(OWNERS))
+    monkeypatch.setattr(catalog_publisher, "publish", lambda entity, restaurant_id: None)
+    await database.connect()
+    try:
+        yield
+    finally:
+        await database.disconnect()
+
+
+@pytest.fixture
+async def client(connected):
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app.api.database.database import database, dishes, orders, restaurants
+from app.api.database.db_manager import (add_orders, iterate_dishes_by_restaurant, purge_orders, update_dish,
+                                         update_restaurant)
+from app.api.model.dish import DishUpdate
+from app.api.model.restaurant import RestaurantUpdate
+from app.api.rabbit.models import OrderItem, OrderRequest
+
+
+@pytest.mark.anyio
+async def test_menu_export_does_not_block_writers(connected):
+    restaurant_id = await database.execute(restaurants.insert().values(name="Ресторан", address="Адрес", user_id=1))
+    await database.execute_many(dishes.insert(), [
+        {"name": f"Блюдо {i}", "price": 10 * i, "ingredients": "соль", "restaurant_id": restaurant_id}
+        for i in range(1, 4)
+    ])
+
+    # Клиент медленно читает выгрузку меню: транзакция чтения остаётся открытой
+    rows = iterate_dishes_by_restaurant(restaurant_id)
+    try:
+        first = await rows.__anext__()
+        assert first["name"] == "Блюдо 1"
+        # Запись (например, сохранение заказов потребителем) не ждёт окончания выгрузки
+        saved = await asyncio.wait_for(add_orders([
+            OrderRequest(dishes=[OrderItem(id=first["id"], quantity=1)], address="Адрес",
+                         phone_number="+79990000000", restaurant_id=restaurant_id)
+        ]), timeout=1)
+        assert len(saved) == 1
+        assert [row["name"] async for row in rows] == ["Блюдо 2", "Блюдо 3"]
+    finally:
+        await rows.aclose()
+
+
+@pytest.mark.anyio
+async def test_purge_orders_by_age_and_per_restaurant_count(connected):
+    now = time.time()
+    # Ресторан 1001: старый заказ и четыре новых, ресторан 1002: два новых
+    rows = [(1001, now - 3600)] + [(1001, now)] * 4 + [(1002, now)] * 2
+    ids = [
+        await database.execute(orders.insert().values(restaurant_id=restaurant_id, payload="{}", created_at=created_at))
+        for restaurant_id, created_at in rows
+    ]
+
+    await purge_orders(max_age=60, max_per_restaurant=3)
+
+    kept = await database.fetch_all(
+        select(orders.c.id).where(orders.c.restaurant_id.in_([1001, 1002])).order_by(orders.c.id))
+    # Удалены заказ старше срока хранения и самый старый из оставшихся заказов ресторана 1001
+    assert [row["id"] for row in kept] == ids[2:]
+
+
+@pytest.mark.anyio
+async def test_update_returns_rows_with_null_columns(connected):
+    # Столбцы ресторана и блюда допускают NULL: такие строки могли быть добавлены до проверки данных
+    restaurant_id = await database.execute(restaurants.insert().values(name="Ресторан", user_id=1))
+    dish_id = await database.execute(dishes.insert().values(name="Блюдо", restaurant_id=restaurant_id))
+
+    restaurant = await update_restaurant(restaurant_id, 1, RestaurantUpdate(name="Новый ресторан"))
+    dish = await update_dish(dish_id, DishUpdate(price=100), restaurant_id, 1)
+
+    assert (restaurant.name, restaurant.address) == ("Новый ресторан", None)
+    assert (dish.price, dish.ingredients) == (100, None)
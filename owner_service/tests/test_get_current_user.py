@@ -0,0 +1,49 @@
+import time
+
+import jwt
+import pytest
+
+from app.api.utils import get_current_user as current_user_module
+from app.api.utils.get_current_user import get_current_user, token_cache
+
+USER = {"id": 7, "is_owner": True}
+
+
+class RejectingJWKS:
+    """Локальная проверка токена не удаётся (например, ключ ещё не опубликован в JWKS)."""
+
+    async def decode(self, token: str):
+        return None
+
+
+class RemoteAuth:
+    async def lookup(self, token: str):
+        return USER
+
+
+@pytest.fixture(autouse=True)
+def remote_fallback(monkeypatch):
+    monkeypatch.setattr(current_user_module, "AUTH_REMOTE_FALLBACK", True)
+    monkeypatch.setattr(current_user_module, "jwks_client", RejectingJWKS())
+    monkeypatch.setattr(current_user_module, "auth_client", RemoteAuth())
+    token_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_remote_user_is_cached_no_longer_than_token_exp():
+    exp = time.time() + 30
+    token = jwt.encode({"id": USER["id"], "exp": exp}, "secret", algorithm="HS256")
+
+    assert await get_current_user(token) == USER
+
+    expires_at, _ = token_cache._items[token]
+    assert expires_at <= exp
+
+
+@pytest.mark.anyio
+async def test_remote_user_without_exp_is_not_cached():
+    token = jwt.encode({"id": USER["id"]}, "secret", algorithm="HS256")
+
+    assert await get_current_user(token) == USER
+
+    assert token_cache.get(token) is None
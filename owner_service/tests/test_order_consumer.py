@@ -0,0 +1,157 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+
+from app.api.rabbit import rabbitmq_order_consumer
+from app.api.rabbit.rabbitmq_order_consumer import RabbitMQOrderConsumer
+from app.api.utils.metrics import metrics_registry
+
+# Адрес заказа, запись которого в базу данных завершается ошибкой
+POISON_ADDRESS = "poison"
+
+
+class FakeMessage:
+    """Входящее сообщение aio-pika, запоминающее результат обработки."""
+
+    def __init__(self, order_id: int, address: str = "Адрес", redelivered: bool = False):
+        self.body = json.dumps({"dishes": [{"id": order_id, "quantity": 1}], "address": address,
+                                "phone_number": "+79990000000", "restaurant_id": 1}).encode()
+        self.content_type = "application/json"
+        self.redelivered = redelivered
+        self.result: Optional[str] = None
+
+    async def ack(self):
+        self.result = "ack"
+
+    async def nack(self, requeue: bool = True):
+        self.result = "requeue" if requeue else "drop"
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published: List[tuple] = []
+
+    async def publish(self, message, routing_key: str):
+        self.published.append((routing_key, message.body))
+
+
+class FakeChannel:
+    def __init__(self, queue_depth: Optional[int] = None):
+        self.default_exchange = FakeExchange()
+        self.queue_depth = queue_depth
+        self.is_closed = False
+
+    async def declare_queue(self, name: str, passive: bool = False, robust: bool = True):
+        if self.queue_depth is None:
+            # Брокер закрывает канал при ошибке объявления (404 NOT_FOUND)
+            self.is_closed = True
+            raise RuntimeError("NOT_FOUND")
+        return SimpleNamespace(declaration_result=SimpleNamespace(message_count=self.queue_depth))
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    """Соединение, каждый канал которого сообщает следующее значение глубины очереди (None — ошибка)."""
+
+    def __init__(self, queue_depths: List[Optional[int]]):
+        self.queue_depths = queue_depths
+        self.channels: List[FakeChannel] = []
+
+    async def channel(self):
+        channel = FakeChannel(self.queue_depths[min(len(self.channels), len(self.queue_depths) - 1)])
+        self.channels.append(channel)
+        return channel
+
+
+@pytest.fixture
+def saved(monkeypatch) -> List[int]:
+    """ID блюд сохранённых заказов. Пакет с заказом POISON_ADDRESS не сохраняется целиком."""
+    rows: List[int] = []
+
+    async def add_orders(batch):
+        if any(order.address == POISON_ADDRESS for order in batch):
+            raise ValueError("constraint failed")
+        rows.extend(order.dishes[0].id for order in batch)
+        return [{"id": len(rows), "restaurant_id": order.restaurant_id, "payload": "{}"} for order in batch]
+
+    monkeypatch.setattr(rabbitmq_order_consumer, "add_orders", add_orders)
+    return rows
+
+
+@pytest.fixture
+def consumer() -> RabbitMQOrderConsumer:
+    consumer = RabbitMQOrderConsumer(dead_letter_queue_name="orders.dead")
+    consumer.channel = FakeChannel()
+    return consumer
+
+
+@pytest.mark.anyio
+async def test_poison_order_does_not_block_batch(consumer, saved):
+    messages = [FakeMessage(1), FakeMessage(2, address=POISON_ADDRESS), FakeMessage(3)]
+
+    await consumer.process_batch(messages)
+
+    assert saved == [1, 3]
+    assert [message.result for message in messages] == ["ack", "requeue", "ack"]
+    assert consumer.channel.default_exchange.published == []
+
+
+@pytest.mark.anyio
+async def test_redelivered_poison_order_is_dead_lettered(consumer, saved):
+    poison = FakeMessage(2, address=POISON_ADDRESS, redelivered=True)
+
+    await consumer.process_batch([FakeMessage(1), poison])
+
+    assert saved == [1]
+    assert poison.result == "ack"
+    assert consumer.channel.default_exchange.published == [("orders.dead", poison.body)]
+
+
+@pytest.mark.anyio
+async def test_setup_failure_after_connect_is_retried(consumer, monkeypatch):
+    # Первая повторная попытка — через 0.5 секунды, следующие без задержки
+    monkeypatch.setattr(rabbitmq_order_consumer, "RABBIT_RECONNECT_MAX_DELAY", 0)
+    attempts = []
+
+    async def consume():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("channel closed")
+
+    async def sample_lag():
+        pass
+
+    monkeypatch.setattr(consumer, "_consume", consume)
+    monkeypatch.setattr(consumer, "_sample_lag", sample_lag)
+
+    await consumer._connect_and_consume()
+
+    assert len(attempts) == 3
+    await consumer._lag_task
+
+
+@pytest.mark.anyio
+async def test_queue_depth_is_sampled_on_separate_channel(consumer, monkeypatch):
+    monkeypatch.setattr(rabbitmq_order_consumer, "ORDER_CONSUMER_LAG_INTERVAL", 0)
+    consumer.connection = FakeConnection([None, 42])
+
+    async def two_samples():
+        while len(consumer.connection.channels) < 2:
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(consumer._sample_lag())
+    try:
+        await asyncio.wait_for(two_samples(), timeout=1)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    # Ошибка объявления закрыла только канал запроса, канал потребителя открыт
+    assert not consumer.channel.is_closed
+    assert all(channel.is_closed for channel in consumer.connection.channels)
+    assert metrics_registry.get_sample_value("order_consumer_lag_messages") == 42
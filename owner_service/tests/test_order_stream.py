@@ -0,0 +1,96 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.api.rabbit.order_broadcaster import order_broadcaster
+from app.api.routers import order_router
+
+RESTAURANT_ID = 1
+
+
+class ConnectedRequest:
+    """Запрос клиента, который не отключается."""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def owner(monkeypatch):
+    """Владелец ресторана RESTAURANT_ID без обращения к JWKS и базе данных."""
+    async def get_current_user(token: str):
+        return {"id": 1, "is_owner": True}
+
+    async def user_is_own_restaurant(user_id: int, restaurant_id: int):
+        return True
+
+    monkeypatch.setattr(order_router, "get_current_user", get_current_user)
+    monkeypatch.setattr(order_router, "user_is_own_restaurant", user_is_own_restaurant)
+
+
+@pytest.fixture
+def stored_orders(monkeypatch) -> List[dict]:
+    """Заказы в базе данных, которые возвращает get_orders_after."""
+    rows: List[dict] = []
+
+    async def get_orders_after(restaurant_id: int, after_id: int, limit: int):
+        return [row for row in rows if row["id"] > after_id][:limit]
+
+    monkeypatch.setattr(order_router, "get_orders_after", get_orders_after)
+    return rows
+
+
+async def open_stream(last_event_id=None):
+    """Открывает поток заказов и ждёт, пока он подпишется на рассылку."""
+    response = await order_router.stream_orders(ConnectedRequest(), "token", RESTAURANT_ID,
+                                                 last_id=None, last_event_id=last_event_id)
+    events = response.body_iterator
+    first = asyncio.ensure_future(events.__anext__())
+    while RESTAURANT_ID not in order_broadcaster._subscribers:
+        await asyncio.sleep(0)
+    return events, first
+
+
+async def read_ids(events, first, count: int) -> List[int]:
+    """Читает `count` событий заказов и возвращает их ID в порядке получения."""
+    ids = []
+    chunk = await asyncio.wait_for(first, timeout=1)
+    while True:
+        if chunk.startswith("id: "):
+            ids.append(int(chunk.split("\n", 1)[0][len("id: "):]))
+        if len(ids) == count:
+            return ids
+        chunk = await asyncio.wait_for(events.__anext__(), timeout=1)
+
+
+@pytest.mark.anyio
+async def test_orders_published_out_of_order_are_all_delivered(owner):
+    events, first = await open_stream()
+    try:
+        # Обработчик второго пакета разослал заказы раньше обработчика первого
+        for order_id in (13, 14, 15, 10, 11, 12):
+            order_broadcaster.publish(RESTAURANT_ID, order_id, "{}")
+        assert await read_ids(events, first, 6) == [13, 14, 15, 10, 11, 12]
+    finally:
+        await events.aclose()
+
+
+@pytest.mark.anyio
+async def test_backfill_pages_through_missed_orders(owner, stored_orders, monkeypatch):
+    monkeypatch.setattr(order_router, "ORDER_STREAM_BACKFILL_LIMIT", 2)
+    stored_orders.extend({"id": order_id, "payload": "{}"} for order_id in range(3, 8))
+    events, first = await open_stream(last_event_id=2)
+    try:
+        assert await read_ids(events, first, 5) == [3, 4, 5, 6, 7]
+        # Заказ 7 уже отправлен при догрузке, заказ 6 из рассылки не повторяется, 8 — новый
+        for order_id in (6, 7, 8):
+            order_broadcaster.publish(RESTAURANT_ID, order_id, "{}")
+        assert await read_ids(events, asyncio.ensure_future(events.__anext__()), 1) == [8]
+    finally:
+        await events.aclose()
@@ -0,0 +1,100 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.services import StubAuth
+from app.api.database.db_manager import add_orders, user_is_own_restaurant
+from app.api.rabbit.models import OrderItem, OrderRequest
+from app.api.utils.query_profiler import QueryBudgetExceededError, QueryProfilerMiddleware
+from app.main import QUERY_BUDGETS, app
+from testing.query_budgets import assert_budgets_exercised
+
+PREFIX = "/api/v1/owner"
+OWNER_TOKEN = {"token": StubAuth.token(1)}
+OTHER_OWNER_TOKEN = {"token": StubAuth.token(2)}
+
+
+@pytest.mark.anyio
+async def test_routes_respond_within_query_budgets(client, caplog):
+    """Сценарий вызывает каждый маршрут из QUERY_BUDGETS и проверяет ответы."""
+    caplog.set_level(logging.INFO)
+
+    async def request(method: str, path: str, **kwargs):
+        # Превышение бюджета поднимает QueryBudgetExceededError из транспорта
+        response = await client.request(method, PREFIX + path, params={**OWNER_TOKEN, **kwargs.pop("params", {})},
+                                        **kwargs)
+        assert response.is_success, response.text
+        return response
+
+    restaurant = (await request("POST", "/restaurant", json={"name": "Ресторан", "address": "Адрес"})).json()
+    restaurant_id = restaurant["id"]
+    updated = (await request("PUT", f"/restaurant/{restaurant_id}", json={"name": "Новый ресторан"})).json()
+    assert updated == {"id": restaurant_id, "name": "Новый ресторан", "address": "Адрес"}
+    assert updated in (await request("GET", "/restaurants")).json()
+    # Рестораны другого владельца недоступны
+    foreign = await client.put(f"{PREFIX}/restaurant/{restaurant_id}", params=OTHER_OWNER_TOKEN, json={"name": "-"})
+    assert foreign.status_code == 403
+
+    soup = (await request("POST", f"/restaurant/{restaurant_id}/dish",
+                          json={"name": "Суп", "price": 100, "ingredients": "вода, соль, лук"})).json()
+    menu = [{"name": f"Блюдо {i}", "price": 10 * i, "ingredients": "соль, перец"} for i in range(1, 21)]
+    imported = (await request("POST", f"/restaurant/{restaurant_id}/dish/import", json=menu)).json()
+    assert imported == {"imported": 20, "deleted": 0}
+    soup = (await request("PUT", f"/restaurant/{restaurant_id}/dish/{soup['id']}",
+                          json={"price": 150, "ingredients": "вода, перец"})).json()
+    assert (soup["name"], soup["price"], soup["ingredients"]) == ("Суп", 150, "вода, перец")
+
+    dishes = (await request("GET", f"/restaurant/{restaurant_id}/dish")).json()
+    assert dishes[0] == soup
+    assert [dish["name"] for dish in dishes[1:]] == [dish["name"] for dish in menu]
+    # Выгрузка меню читается потоком в формате NDJSON и совпадает со списком блюд
+    export = await request("GET", f"/restaurant/{restaurant_id}/dish/export")
+    assert export.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in export.text.splitlines()] == dishes
+    forbidden = await client.get(f"{PREFIX}/restaurant/{restaurant_id}/dish/export", params=OTHER_OWNER_TOKEN)
+    assert forbidden.status_code == 403
+
+    await add_orders([
+        OrderRequest(dishes=[OrderItem(id=soup["id"], quantity=quantity)], address="Адрес",
+                     phone_number="+79990000000", restaurant_id=restaurant_id)
+        for quantity in (1, 2, 3)
+    ])
+    orders = (await request("GET", f"/orders/{restaurant_id}")).json()
+    assert [(order["dishes"][0]["id"], order["dishes"][0]["quantity"]) for order in orders] == [
+        (soup["id"], quantity) for quantity in (1, 2, 3)]
+
+    await request("DELETE", f"/restaurant/{restaurant_id}/dish/{soup['id']}")
+    assert soup["id"] not in [dish["id"] for dish in (await request("GET", f"/restaurant/{restaurant_id}/dish")).json()]
+    await request("DELETE", f"/restaurant/{restaurant_id}")
+    assert restaurant_id not in [item["id"] for item in (await request("GET", "/restaurants")).json()]
+
+    assert_budgets_exercised(caplog.records, QUERY_BUDGETS)
+
+
+@pytest.mark.anyio
+async def test_exceeded_budget_fails_request(client, monkeypatch):
+    monkeypatch.setitem(QUERY_BUDGETS, "GET /api/v1/owner/restaurants", 0)
+
+    with pytest.raises(QueryBudgetExceededError):
+        await client.get(f"{PREFIX}/restaurants", params=OWNER_TOKEN)
+
+
+@pytest.mark.anyio
+async def test_repeated_statement_is_reported_as_n_plus_one(connected, caplog):
+    # Маршрут проверяет рестораны по одному запросу на ресторан
+    n_plus_one = FastAPI()
+    n_plus_one.add_middleware(QueryProfilerMiddleware)
+
+    @n_plus_one.get("/own")
+    async def own(ids: str):
+        return {id: await user_is_own_restaurant(1, int(id)) for id in ids.split(",")}
+
+    async with AsyncClient(transport=ASGITransport(app=n_plus_one), base_url="http://test") as client:
+        response = await client.get("/own", params={"ids": "1,2,3,4,5,6"})
+    assert response.is_success
+
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert any(message.startswith("Possible N+1 in GET /own: statement executed 6 times") for message in warnings)
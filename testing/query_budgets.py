@@ -0,0 +1,33 @@
+"""
+Проверка бюджетов запросов к базе данных, общая для тестов всех сервисов.
+
+Тесты сервиса запускаются с QUERY_PROFILER_ENABLED и QUERY_BUDGETS_ENFORCED: запрос, превысивший
+бюджет, завершается ошибкой QueryBudgetExceededError прямо в тесте. По журналу профилировщика
+проверяется, что тест вызвал каждый маршрут из QUERY_BUDGETS сервиса.
+"""
+import json
+import logging
+from typing import Dict, Iterable, List
+
+PROFILE_PREFIX = "Query profile "
+
+
+def query_counts(records: Iterable[logging.LogRecord]) -> Dict[str, List[int]]:
+    """Количество запросов к базе данных каждого HTTP-запроса по эндпоинтам из журнала профилировщика."""
+    counts: Dict[str, List[int]] = {}
+    for record in records:
+        message = record.getMessage()
+        if message.startswith(PROFILE_PREFIX):
+            profile = json.loads(message[len(PROFILE_PREFIX):])
+            counts.setdefault(profile["endpoint"], []).append(profile["query_count"])
+    return counts
+
+
+def assert_budgets_exercised(records: Iterable[logging.LogRecord], budgets: Dict[str, int]):
+    """Проверяет, что каждый маршрут из `budgets` был вызван и не превысил свой бюджет."""
+    counts = query_counts(records)
+    missing = sorted(set(budgets) - set(counts))
+    assert not missing, f"Routes not exercised: {missing}"
+    exceeded = {endpoint: max(counts[endpoint]) for endpoint, budget in budgets.items()
+                if max(counts[endpoint]) > budget}
+    assert not exceeded, f"Query budgets exceeded: {exceeded}"
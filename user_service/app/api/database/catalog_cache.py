@@ -0,0 +1,99 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Максимальное количество записей в кэше каталога и их время жизни (в секундах)
+CATALOG_CACHE_SIZE: int = int(os.getenv("CATALOG_CACHE_SIZE", default=1024))
+CATALOG_CACHE_TTL: float = float(os.getenv("CATALOG_CACHE_TTL", default=60))
+
+
+class CatalogCache:
+    """
+    Кэш каталога (списка ресторанов и меню ресторанов) в памяти процесса.
+
+    Размер ограничен: при переполнении вытесняются наименее недавно использованные записи.
+    Записи сбрасываются по событиям изменения каталога от owner_service, а TTL ограничивает
+    время жизни записи, если событие было потеряно.
+    """
+
+    def __init__(self, max_size: int = CATALOG_CACHE_SIZE, ttl: float = CATALOG_CACHE_TTL):
+        """
+        Инициализирует кэш с максимальным количеством записей и временем жизни записи.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Поколение кэша увеличивается при каждом сбросе. Значение, прочитанное из базы данных
+        # до сброса, не сохраняется в кэш, чтобы не вернуть туда устаревшие данные.
+        self.generation = 0
+
+    def get(self, key: tuple) -> Optional[Any]:
+        """Возвращает значение по ключу или None, если записи нет или её срок истёк."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: tuple, value: Any, generation: int):
+        """
+        Сохраняет значение, если с момента начала его чтения (`generation`) кэш не сбрасывался.
+        """
+        if generation != self.generation:
+            return
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, *prefixes: tuple):
+        """
+        Удаляет записи, ключи которых начинаются с одного из указанных префиксов
+        (например, все страницы меню ресторана).
+        """
+        self.generation += 1
+        stale_keys = [
+            key for key in self._items
+            if any(key[:len(prefix)] == prefix for prefix in prefixes)
+        ]
+        for key in stale_keys:
+            del self._items[key]
+
+    def clear(self):
+        """Очищает кэш."""
+        self.generation += 1
+        self._items.clear()
+
+
+# Префикс ключей кэша для страниц списка ресторанов
+RESTAURANTS_KEY = ("restaurants",)
+
+
+def dishes_key(restaurant_id: int) -> tuple:
+    """Префикс ключей кэша для страниц меню ресторана."""
+    return ("dishes", restaurant_id)
+
+
+def dish_prices_key(restaurant_id: int) -> tuple:
+    """
+    Ключ кэша цен блюд ресторана. Начинается с префикса меню ресторана,
+    поэтому сбрасывается вместе с ним.
+    """
+    return dishes_key(restaurant_id) + ("prices",)
+
+
+def dish_facets_key(restaurant_id: int) -> tuple:
+    """
+    Ключ кэша фасетов меню ресторана. Начинается с префикса меню ресторана,
+    поэтому сбрасывается вместе с ним.
+    """
+    return dishes_key(restaurant_id) + ("facets",)
+
+
+# Глобальный кэш каталога
+catalog_cache = CatalogCache()
@@ -1,13 +1,18 @@
 import os
 
-from databases import Database
-from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, ForeignKey, Float, Boolean, Text, Index, text
+
+from app.api.database.migrations import run_migrations
+from app.api.database.sqlite_profile import configure_engine, create_database
+from app.api.utils.metrics import instrument_database
 
 # Получаем URL подключения к базе данных из переменных окружения
 DATABASE_URL = os.getenv('DATABASE_URL')
 
 # Создание подключения к базе данных с использованием SQLAlchemy
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Профиль SQLite (WAL, busy_timeout, mmap) для базы данных, общей для всех сервисов
+configure_engine(engine)
 metadata = MetaData()
 
 # Таблица пользователей
@@ -27,7 +32,9 @@ restaurants = Table(
     Column('id', Integer, primary_key=True),
     Column('name', String(64)),
     Column('address', String(256)),
-    Column('user_id', Integer, ForeignKey('users.id'))  # Связываем с таблицей владельцев
+    Column('user_id', Integer, ForeignKey('users.id')),  # Связываем с таблицей владельцев
+    Index('ix_restaurants_user_id', 'user_id'),
+    Index('ix_restaurants_id_user_id', 'id', 'user_id'),
 )
 
 # Таблица для блюд
@@ -38,11 +45,67 @@ dishes = Table(
     Column('name', String(64)),
     Column('ingredients', String(256)),
     Column('price', Float),
-    Column('restaurant_id', Integer, ForeignKey('restaurants.id'))  # Связываем с рестораном
+    Column('restaurant_id', Integer, ForeignKey('restaurants.id')),  # Связываем с рестораном
+    Index('ix_dishes_restaurant_id', 'restaurant_id'),
+    Index('ix_dishes_restaurant_id_price', 'restaurant_id', 'price'),
+)
+
+# Таблица исходящих заказов (transactional outbox), которые ещё нужно опубликовать в RabbitMQ
+order_outbox = Table(
+    'order_outbox',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('payload', Text, nullable=False),  # Заказ в формате JSON
+    Column('created_at', Float, nullable=False),
+    Column('sent_at', Float, nullable=True),  # Время подтверждения публикации брокером
+    Column('attempts', Integer, nullable=False, default=0),
+    # Частичный индекс только по неотправленным записям для быстрой выборки ретранслятором
+    Index('ix_order_outbox_pending', 'id', sqlite_where=text('sent_at IS NULL')),
+)
+
+# Справочник нормализованных названий ингредиентов
+ingredients = Table(
+    'ingredients',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(64), unique=True, nullable=False),
+)
+
+# Обратный индекс ингредиентов: ингредиент ресторана -> блюда с ним
+dish_ingredients = Table(
+    'dish_ingredients',
+    metadata,
+    Column('restaurant_id', Integer, primary_key=True),
+    Column('ingredient_id', Integer, ForeignKey('ingredients.id'), primary_key=True),
+    Column('dish_id', Integer, ForeignKey('dishes.id'), primary_key=True),
+    Index('ix_dish_ingredients_dish_id', 'dish_id'),
+    sqlite_with_rowid=False,
+)
+
+# Количество блюд ресторана с каждым ингредиентом (поддерживается триггерами на dish_ingredients)
+restaurant_ingredient_facets = Table(
+    'restaurant_ingredient_facets',
+    metadata,
+    Column('restaurant_id', Integer, primary_key=True),
+    Column('ingredient_id', Integer, ForeignKey('ingredients.id'), primary_key=True),
+    Column('dish_count', Integer, nullable=False),
+    sqlite_with_rowid=False,
+)
+
+# Версии каталога для условных запросов (ETag): строка CATALOG_VERSION_GLOBAL — версия списка
+# ресторанов, остальные — версии меню ресторанов
+catalog_versions = Table(
+    'catalog_versions',
+    metadata,
+    Column('restaurant_id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
 )
+CATALOG_VERSION_GLOBAL = 0
 
-# Создаём асинхронное подключение к базе данных
-database = Database(DATABASE_URL)
+# Создаём асинхронное подключение к базе данных с записью метрик запросов
+database = instrument_database(create_database(DATABASE_URL))
+# Отдельный пул соединений только для чтения каталога, не конкурирующий с записью заказов
+read_database = instrument_database(create_database(DATABASE_URL, read_only=True))
 
-# Создание всех таблиц в базе данных
-metadata.create_all(engine)
+# Применение миграций схемы (таблицы и индексы создаются и изменяются только миграциями)
+run_migrations(engine)
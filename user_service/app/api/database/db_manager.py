@@ -1,29 +1,275 @@
 import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 
-from app.api.database.database import restaurants, database, dishes
-from app.api.model.dish import Dish
-from app.api.model.restaurant import Restaurant
+from app.api.database.catalog_cache import catalog_cache, RESTAURANTS_KEY, dishes_key, dish_prices_key, \
+    dish_facets_key
+from app.api.database.database import restaurants, read_database, dishes, ingredients, dish_ingredients, \
+    restaurant_ingredient_facets, catalog_versions, CATALOG_VERSION_GLOBAL
+from app.api.model.dish import DishFacets, DishFilter, IngredientFacet
+from app.api.model.order_request import OrderItem, OrderRequest, PricedOrder
 
+# Максимальное количество слов в поисковом запросе
+SEARCH_MAX_TERMS: int = int(os.getenv("SEARCH_MAX_TERMS", default=8))
+# Веса столбцов полнотекстового индекса для bm25: название, ингредиенты/адрес, название ресторана
+SEARCH_WEIGHTS: str = ", ".join(
+    str(float(weight)) for weight in os.getenv("SEARCH_WEIGHTS", default="10, 1, 4").split(","))
 
-async def get_all_restaurants():
+
+async def get_catalog_version(restaurant_id: int = CATALOG_VERSION_GLOBAL) -> int:
+    """
+    Получение версии списка ресторанов (по умолчанию) или меню ресторана одним запросом по первичному ключу.
+    Версии увеличивает owner_service при каждом изменении каталога; 0 — каталог ещё не изменялся.
+    """
+    query = select(catalog_versions.c.version).where(catalog_versions.c.restaurant_id == restaurant_id)
+    return await read_database.fetch_val(query) or 0
+
+
+async def get_all_restaurants(after_id: int, limit: int, version: int = 0):
+    """
+    Получение страницы списка ресторанов.
+    Эта функция выполняет запрос к базе данных для получения ресторанов с ID больше `after_id`
+    (keyset-пагинация) и возвращает не более `limit` строк с полями модели `Restaurant`.
+    Результат кэшируется по версии каталога `version` до события изменения каталога или истечения TTL.
+    """
+    cache_key = RESTAURANTS_KEY + (version, after_id, limit)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    generation = catalog_cache.generation
+    query = select(restaurants.c.id, restaurants.c.name, restaurants.c.address) \
+        .where(restaurants.c.id > after_id).order_by(restaurants.c.id).limit(limit)
+    result = await read_database.fetch_all(query)
+    logging.info("Successfully fetched restaurants page from the database.")
+    restaurants_list = [dict(row._mapping) for row in result]
+    catalog_cache.set(cache_key, restaurants_list, generation)
+    return restaurants_list
+
+
+async def dish_filter_condition(restaurant_id: int, dish_filter: DishFilter):
+    """
+    Условие WHERE для блюд ресторана, удовлетворяющих фильтру.
+    Ингредиенты проверяются по индексу dish_ingredients, а не поиском по строке ингредиентов:
+    названия из фильтра переводятся в ID ингредиентов одним запросом.
+    Возвращает None, если под фильтр заведомо не подходит ни одно блюдо
+    (обязательный ингредиент не встречается ни в одном меню).
+    """
+    condition = dishes.c.restaurant_id == restaurant_id
+    if dish_filter.min_price is not None:
+        condition &= dishes.c.price >= dish_filter.min_price
+    if dish_filter.max_price is not None:
+        condition &= dishes.c.price <= dish_filter.max_price
+    names = dish_filter.include + dish_filter.exclude
+    if not names:
+        return condition
+
+    query = select(ingredients.c.id, ingredients.c.name).where(ingredients.c.name.in_(names))
+    ingredient_ids = {row['name']: row['id'] for row in await read_database.fetch_all(query)}
+    if dish_filter.include:
+        if any(name not in ingredient_ids for name in dish_filter.include):
+            return None
+        # Блюда, у которых есть все обязательные ингредиенты
+        condition &= dishes.c.id.in_(
+            select(dish_ingredients.c.dish_id)
+            .where((dish_ingredients.c.restaurant_id == restaurant_id)
+                   & dish_ingredients.c.ingredient_id.in_([ingredient_ids[name] for name in dish_filter.include]))
+            .group_by(dish_ingredients.c.dish_id)
+            .having(func.count() == len(dish_filter.include))
+        )
+    exclude_ids = [ingredient_ids[name] for name in dish_filter.exclude if name in ingredient_ids]
+    if exclude_ids:
+        condition &= dishes.c.id.not_in(
+            select(dish_ingredients.c.dish_id)
+            .where((dish_ingredients.c.restaurant_id == restaurant_id)
+                   & dish_ingredients.c.ingredient_id.in_(exclude_ids))
+        )
+    return condition
+
+
+async def get_dishes_by_restaurant(restaurant_id: int, after_id: int, limit: int,
+                                   dish_filter: DishFilter = DishFilter(), version: int = 0):
+    """
+    Получение страницы списка блюд конкретного ресторана по его ID.
+    Эта функция выполняет запрос к базе данных для получения блюд ресторана с ID больше `after_id`
+    (keyset-пагинация), удовлетворяющих фильтру `dish_filter`, и возвращает не более `limit` строк
+    с полями модели `Dish`.
+    Результат кэшируется по версии меню `version` до события изменения каталога или истечения TTL.
+    """
+    cache_key = dishes_key(restaurant_id) + (version, after_id, limit, dish_filter)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    generation = catalog_cache.generation
+    condition = await dish_filter_condition(restaurant_id, dish_filter)
+    if condition is None:
+        dishes_list = []
+    else:
+        query = select(dishes.c.id, dishes.c.name, dishes.c.price, dishes.c.ingredients) \
+            .where(condition & (dishes.c.id > after_id)).order_by(dishes.c.id).limit(limit)
+        result = await read_database.fetch_all(query)
+        logging.info(f"Successfully fetched dishes page of restaurant {restaurant_id} from the database.")
+        dishes_list = [dict(row._mapping) for row in result]
+    catalog_cache.set(cache_key, dishes_list, generation)
+    return dishes_list
+
+
+async def get_dish_facets(restaurant_id: int, version: int = 0) -> DishFacets:
+    """
+    Получение фасетов меню ресторана: количества блюд, диапазона цен и количества блюд с каждым ингредиентом.
+    Количество блюд по ингредиентам хранится в restaurant_ingredient_facets и обновляется
+    при изменении меню, поэтому строки ингредиентов здесь не разбираются.
+    Результат кэшируется по версии меню `version` до события изменения каталога или истечения TTL.
+    """
+    cache_key = dish_facets_key(restaurant_id) + (version,)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    generation = catalog_cache.generation
+    summary_query = select(func.count(), func.min(dishes.c.price), func.max(dishes.c.price)) \
+        .where(dishes.c.restaurant_id == restaurant_id)
+    total, min_price, max_price = (await read_database.fetch_one(summary_query))._mapping.values()
+    ingredients_query = (
+        select(ingredients.c.name, restaurant_ingredient_facets.c.dish_count)
+        .join(ingredients, ingredients.c.id == restaurant_ingredient_facets.c.ingredient_id)
+        .where(restaurant_ingredient_facets.c.restaurant_id == restaurant_id)
+        .order_by(restaurant_ingredient_facets.c.dish_count.desc(), ingredients.c.name)
+    )
+    result = await read_database.fetch_all(ingredients_query)
+    logging.info(f"Successfully fetched dish facets of restaurant {restaurant_id} from the database.")
+    facets = DishFacets(
+        total=total,
+        min_price=min_price,
+        max_price=max_price,
+        ingredients=[IngredientFacet(name=row['name'], count=row['dish_count']) for row in result]
+    )
+    catalog_cache.set(cache_key, facets, generation)
+    return facets
+
+
+def iterate_restaurants(after_id: int):
+    """
+    Потоковое чтение ресторанов с ID больше `after_id` без построения списка в памяти.
+    """
+    query = select(restaurants.c.id, restaurants.c.name, restaurants.c.address) \
+        .where(restaurants.c.id > after_id).order_by(restaurants.c.id)
+    return read_database.iterate(query)
+
+
+async def iterate_dishes_by_restaurant(restaurant_id: int, after_id: int, dish_filter: DishFilter = DishFilter()):
+    """
+    Потоковое чтение блюд ресторана с ID больше `after_id`, удовлетворяющих фильтру,
+    без построения списка в памяти.
+    """
+    condition = await dish_filter_condition(restaurant_id, dish_filter)
+    if condition is None:
+        return
+    query = select(dishes.c.id, dishes.c.name, dishes.c.price, dishes.c.ingredients) \
+        .where(condition & (dishes.c.id > after_id)).order_by(dishes.c.id)
+    async for row in read_database.iterate(query):
+        yield row
+
+
+async def get_dish_prices(restaurant_id: int, dish_ids: Iterable[int]) -> Dict[int, Tuple[str, float]]:
+    """
+    Получение названий и цен блюд ресторана по их ID.
+    Возвращает словарь {ID блюда: (название, цена)}; блюда, которых нет в меню ресторана, в словарь не попадают.
+    Цены кэшируются по ресторану: из базы данных одним запросом с IN загружаются только
+    блюда, которых ещё нет в кэше. Кэш сбрасывается вместе с меню ресторана.
+    """
+    cache_key = dish_prices_key(restaurant_id)
+    prices = catalog_cache.get(cache_key) or {}
+    missing_ids = set(dish_ids) - prices.keys()
+    if not missing_ids:
+        return prices
+
+    generation = catalog_cache.generation
+    query = select(dishes.c.id, dishes.c.name, dishes.c.price) \
+        .where((restaurant_id == dishes.c.restaurant_id) & dishes.c.id.in_(missing_ids))
+    result = await read_database.fetch_all(query)
+    logging.info(f"Fetched prices of {len(result)} dishes of restaurant {restaurant_id} from the database.")
+    prices = {**prices, **{row['id']: (row['name'], row['price']) for row in result}}
+    catalog_cache.set(cache_key, prices, generation)
+    return prices
+
+
+class UnknownDishesError(ValueError):
+    """В заказе есть блюда, которых нет в меню ресторана."""
+
+    def __init__(self, restaurant_id: int, dish_ids: List[int]):
+        super().__init__(f"Dishes {dish_ids} not found in restaurant {restaurant_id}")
+        self.restaurant_id = restaurant_id
+        self.dish_ids = dish_ids
+
+
+async def price_order(order: OrderRequest) -> PricedOrder:
+    """
+    Проверяет, что все блюда заказа есть в меню ресторана, и рассчитывает стоимость заказа.
+    Выбрасывает UnknownDishesError, если какого-то блюда нет в меню.
     """
-    Получение списка всех ресторанов.
-    Эта функция выполняет запрос к базе данных для получения всех ресторанов и возвращает их в виде списка объектов `Restaurant`.
+    prices = await get_dish_prices(order.restaurant_id, (item.id for item in order.dishes))
+    unknown_ids = sorted({item.id for item in order.dishes} - prices.keys())
+    if unknown_ids:
+        raise UnknownDishesError(order.restaurant_id, unknown_ids)
+
+    items = []
+    for item in order.dishes:
+        name, price = prices[item.id]
+        items.append(OrderItem(id=item.id, name=name, price=price, quantity=item.quantity,
+                               amount=round(price * item.quantity, 2)))
+    return PricedOrder(
+        dishes=items,
+        address=order.address,
+        phone_number=order.phone_number,
+        restaurant_id=order.restaurant_id,
+        total=round(sum(item.amount for item in items), 2)
+    )
+
+
+def build_search_query(text: str) -> Optional[str]:
     """
-    query = select(restaurants)
-    result = await database.fetch_all(query)
-    logging.info("Successfully fetched all restaurants from the database.")
-    return [Restaurant(**row) for row in result]
+    Преобразует поисковую строку пользователя в запрос FTS5: каждое слово ищется по префиксу,
+    все слова должны присутствовать. Операторы FTS5 из пользовательского ввода не используются.
+    Возвращает None, если в строке нет слов.
+    """
+    terms = re.findall(r"\w+", text)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
 
+async def search_catalog(text: str, kind: Optional[str], offset: int, limit: int) -> List[dict]:
+    """
+    Полнотекстовый поиск блюд и ресторанов.
+    Результаты упорядочены по релевантности (bm25): совпадение в названии весит больше,
+    чем в названии ресторана, а оно — больше, чем в ингредиентах или адресе.
+    Возвращает строки с полями модели `SearchResult`.
 
-async def get_dishes_by_restaurant(restaurant_id: int):
+    :param text: Поисковая строка
+    :param kind: Искать только блюда ("dish") или только рестораны ("restaurant")
+    :param offset: Количество пропускаемых результатов
+    :param limit: Максимальное количество результатов
     """
-    Получение списка блюд конкретного ресторана по его ID.
-    Эта функция выполняет запрос к базе данных для получения всех блюд, которые принадлежат ресторану с заданным ID.
+    match = build_search_query(text)
+    if match is None:
+        return []
+    query = f"""
+        SELECT catalog_fts.kind, catalog_fts.entity_id AS id, catalog_fts.restaurant_id,
+               catalog_fts.name, catalog_fts.details, catalog_fts.restaurant_name, dishes.price
+        FROM catalog_fts
+        LEFT JOIN dishes ON catalog_fts.kind = 'dish' AND dishes.id = catalog_fts.entity_id
+        WHERE catalog_fts MATCH :match {"AND catalog_fts.kind = :kind" if kind else ""}
+        ORDER BY bm25(catalog_fts, {SEARCH_WEIGHTS})
+        LIMIT :limit OFFSET :offset
     """
-    query = select(dishes).where(restaurant_id == dishes.c.restaurant_id)
-    result = await database.fetch_all(query)
-    logging.info("Successfully fetched all restaurants from the database.")
-    return [Dish(**row) for row in result]
+    values = {"match": match, "limit": limit, "offset": offset}
+    if kind:
+        values["kind"] = kind
+    result = await read_database.fetch_all(query, values)
+    logging.info(f"Search {match!r} returned {len(result)} results.")
+    return [dict(row._mapping) for row in result]
@@ -1,9 +1,34 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Tuple
 
 
-# Модель для информации о блюде
+# Модель для информации о блюде (столбцы блюда в базе данных допускают NULL)
 class Dish(BaseModel):
     id: int
+    name: Optional[str]
+    price: Optional[float]
+    ingredients: Optional[str]
+
+
+# Модель фильтра меню ресторана по цене и ингредиентам (неизменяемая, используется в ключе кэша)
+class DishFilter(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    include: Tuple[str, ...] = ()  # Нормализованные названия ингредиентов, которые должны быть в блюде
+    exclude: Tuple[str, ...] = ()  # Нормализованные названия ингредиентов, которых не должно быть в блюде
+
+
+# Модель количества блюд меню с данным ингредиентом
+class IngredientFacet(BaseModel):
     name: str
-    price: float
-    ingredients: str
+    count: int
+
+
+# Модель фасетов меню ресторана: количество блюд, диапазон цен и ингредиенты
+class DishFacets(BaseModel):
+    total: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    ingredients: List[IngredientFacet] = Field(default_factory=list)
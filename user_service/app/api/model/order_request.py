@@ -1,10 +1,34 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 
+# Модель позиции заказа в запросе клиента
+class OrderItemRequest(BaseModel):
+    id: int  # ID блюда
+    quantity: int = Field(gt=0, le=100)
+
+
 # Модель для запроса на создание заказа
 class OrderRequest(BaseModel):
-    dishes: List[dict]  # [{"id": int, "quantity": int}]
+    dishes: List[OrderItemRequest] = Field(min_length=1, max_length=100)
+    address: str
+    phone_number: str
+    restaurant_id: int
+
+
+# Модель позиции заказа с названием и ценой блюда из меню ресторана
+class OrderItem(BaseModel):
+    id: int
+    name: str
+    price: float
+    quantity: int
+    amount: float  # Стоимость позиции (price * quantity)
+
+
+# Модель проверенного и рассчитанного заказа, который отправляется в ресторан
+class PricedOrder(BaseModel):
+    dishes: List[OrderItem]
     address: str
     phone_number: str
     restaurant_id: int
+    total: float
@@ -1,8 +1,9 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
-# Модель для информации о ресторане
+# Модель для информации о ресторане (столбцы ресторана в базе данных допускают NULL)
 class Restaurant(BaseModel):
     id: int
-    name: str
-    address: str
+    name: Optional[str]
+    address: Optional[str]
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+# Модель результата поиска по каталогу (блюдо или ресторан)
+class SearchResult(BaseModel):
+    kind: str  # "dish" или "restaurant"
+    id: int
+    restaurant_id: int
+    name: Optional[str]
+    details: Optional[str] = None  # Ингредиенты блюда или адрес ресторана
+    restaurant_name: Optional[str] = None
+    price: Optional[float] = None  # Только для блюд
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+import aio_pika
+from aio_pika.abc import AbstractIncomingMessage
+
+from app.api.database.catalog_cache import CatalogCache, RESTAURANTS_KEY, catalog_cache, dishes_key
+from app.api.rabbit.rabbit import RabbitMQProducer, rabbit_producer
+
+# Exchange (fanout), в который owner_service публикует события изменения каталога
+CATALOG_EXCHANGE: str = os.getenv("CATALOG_EXCHANGE", default="catalog_events")
+# Задержка между попытками подписаться на события при недоступности брокера (в секундах)
+CATALOG_EVENTS_RETRY_DELAY: float = float(os.getenv("CATALOG_EVENTS_RETRY_DELAY", default=5))
+
+
+class CatalogEventSubscriber:
+    """
+    Подписчик на события изменения каталога от owner_service.
+
+    Использует соединение издателя заказов. Каждый экземпляр user_service получает все события
+    через собственную временную очередь, привязанную к fanout exchange, и сбрасывает
+    соответствующие записи кэша каталога. После переподключения к брокеру кэш очищается
+    целиком, так как события за время разрыва могли быть потеряны.
+    """
+
+    def __init__(self, producer: RabbitMQProducer, cache: CatalogCache, exchange_name: str = CATALOG_EXCHANGE):
+        """
+        Инициализирует подписчика с издателем, чьё соединение используется, и кэшем каталога.
+        """
+        self.producer = producer
+        self.cache = cache
+        self.exchange_name = exchange_name
+        self._task: Optional[asyncio.Task] = None
+
+    async def _subscribe(self):
+        """
+        Подписывается на события каталога. Любая ошибка подключения или настройки канала, exchange
+        и очереди повторяется через CATALOG_EVENTS_RETRY_DELAY, чтобы задача не завершилась молча
+        и сброс кэша не перешёл только на истечение TTL.
+        """
+        while True:
+            try:
+                await self._bind_queue()
+                break
+            except Exception as e:
+                logging.warning(f"Catalog events subscription failed: {e}. Retrying in {CATALOG_EVENTS_RETRY_DELAY} seconds...")
+                await asyncio.sleep(CATALOG_EVENTS_RETRY_DELAY)
+        # События до подписки могли быть пропущены
+        self.cache.clear()
+        logging.info(f"Subscribed to catalog events from exchange {self.exchange_name}.")
+
+    async def _bind_queue(self):
+        """Открывает канал, привязывает временную очередь к exchange событий каталога и подписывается на неё."""
+        await self.producer.connect()
+        connection = self.producer.connection
+        channel = await connection.channel()
+        try:
+            exchange = await channel.declare_exchange(self.exchange_name, aio_pika.ExchangeType.FANOUT, durable=True)
+            queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+            await queue.bind(exchange)
+            await queue.consume(self._on_message, no_ack=True)
+        except BaseException:
+            # Канал неудавшейся попытки закрывается, чтобы не копить каналы при повторах
+            if not channel.is_closed:
+                await channel.close()
+            raise
+        connection.reconnect_callbacks.add(self._on_reconnect)
+
+    async def _on_message(self, message: AbstractIncomingMessage):
+        """Сбрасывает записи кэша, затронутые изменением каталога."""
+        try:
+            event = json.loads(message.body)
+            restaurant_id = int(event["restaurant_id"])
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logging.error(f"Catalog event format is invalid: {e}")
+            return
+        if event.get("entity") == "restaurant":
+            self.cache.invalidate(RESTAURANTS_KEY, dishes_key(restaurant_id))
+        else:
+            self.cache.invalidate(dishes_key(restaurant_id))
+        logging.info(f"Catalog cache invalidated by event: {event}")
+
+    def _on_reconnect(self, *args):
+        """Очищает кэш после переподключения к брокеру."""
+        logging.info("RabbitMQ reconnected, clearing catalog cache.")
+        self.cache.clear()
+
+    def start(self):
+        """Запускает подписку в фоне, не задерживая запуск приложения."""
+        self._task = asyncio.create_task(self._subscribe())
+
+    async def stop(self):
+        """Прекращает попытки подписки, если она ещё не установлена."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+
+# Глобальный подписчик на события каталога
+catalog_subscriber = CatalogEventSubscriber(rabbit_producer, catalog_cache)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.api.database.database import database, order_outbox
+from app.api.rabbit.rabbit import RabbitMQProducer, RabbitMQPublishError, rabbit_producer
+
+# Режим публикации заказов: "outbox" (через таблицу исходящих заказов) или "direct" (сразу в RabbitMQ)
+ORDER_PUBLISH_MODE: str = os.getenv("ORDER_PUBLISH_MODE", default="outbox")
+
+# Максимальное количество заказов, публикуемых за один проход ретранслятора
+OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", default=100))
+# Интервал опроса таблицы при отсутствии новых заказов (в секундах)
+OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", default=1))
+# Максимальная задержка повторной попытки при недоступности брокера (в секундах)
+OUTBOX_MAX_RETRY_DELAY: float = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", default=30))
+# Время хранения уже отправленных заказов (в секундах)
+OUTBOX_RETENTION: float = float(os.getenv("OUTBOX_RETENTION", default=24 * 60 * 60))
+
+
+class OrderOutboxRelay:
+    """
+    Transactional outbox для заказов.
+
+    Обработчик запроса только сохраняет заказ в локальную таблицу `order_outbox`,
+    а фоновая задача пакетами публикует неотправленные заказы в RabbitMQ,
+    дожидается подтверждений брокера и помечает записи как отправленные.
+    Заказ не теряется при недоступности или перезапуске брокера.
+    """
+
+    def __init__(self,
+                 producer: RabbitMQProducer,
+                 batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 retention: float = OUTBOX_RETENTION):
+        """
+        Инициализирует ретранслятор с издателем RabbitMQ и параметрами пакетной отправки.
+        """
+        self.producer = producer
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def enqueue(self, message: dict) -> int:
+        """
+        Сохраняет заказ в таблицу исходящих заказов и будит ретранслятор.
+        Возвращает ID записи.
+        """
+        query = order_outbox.insert().values(
+            payload=json.dumps(message),
+            created_at=time.time(),
+            attempts=0
+        )
+        outbox_id = await database.execute(query)
+        self._wakeup.set()
+        return outbox_id
+
+    async def relay_batch(self) -> int:
+        """
+        Публикует один пакет неотправленных заказов.
+        Возвращает количество заказов, подтверждённых брокером.
+        """
+        query = (
+            select(order_outbox.c.id, order_outbox.c.payload)
+            .where(order_outbox.c.sent_at.is_(None))
+            .order_by(order_outbox.c.id)
+            .limit(self.batch_size)
+        )
+        rows = await database.fetch_all(query)
+        if not rows:
+            return 0
+
+        results = await self.producer.send_batch([json.loads(row['payload']) for row in rows])
+        sent_ids = [row['id'] for row, ok in zip(rows, results) if ok]
+        failed_ids = [row['id'] for row, ok in zip(rows, results) if not ok]
+
+        async with database.transaction(immediate=True):
+            if sent_ids:
+                await database.execute(
+                    order_outbox.update()
+                    .where(order_outbox.c.id.in_(sent_ids))
+                    .values(sent_at=time.time(), attempts=order_outbox.c.attempts + 1)
+                )
+            if failed_ids:
+                await database.execute(
+                    order_outbox.update()
+                    .where(order_outbox.c.id.in_(failed_ids))
+                    .values(attempts=order_outbox.c.attempts + 1)
+                )
+        if failed_ids:
+            raise RabbitMQPublishError(f"{len(failed_ids)} orders were not confirmed by broker")
+        return len(sent_ids)
+
+    async def purge_sent(self):
+        """Удаляет отправленные заказы старше срока хранения."""
+        query = order_outbox.delete().where(
+            order_outbox.c.sent_at.is_not(None) & (order_outbox.c.sent_at < time.time() - self.retention)
+        )
+        await database.execute(query)
+
+    async def _run(self):
+        """Основной цикл ретранслятора."""
+        retry_delay = self.poll_interval
+        last_purge = 0.0
+        while not self._stopping:
+            # Сбрасываем сигнал до выборки пакета: заказ, добавленный во время публикации,
+            # снова установит его, и следующий пакет будет взят без ожидания
+            self._wakeup.clear()
+            try:
+                sent = await self.relay_batch()
+                retry_delay = self.poll_interval
+                if time.monotonic() - last_purge > 60:
+                    await self.purge_sent()
+                    last_purge = time.monotonic()
+                if sent == self.batch_size:
+                    # Очередь ещё не разобрана — сразу берём следующий пакет
+                    continue
+                timeout = self.poll_interval
+            except Exception as e:
+                logging.error(f"Order outbox relay failed: {e}. Retrying in {retry_delay} seconds...")
+                timeout = retry_delay
+                retry_delay = min(retry_delay * 2, OUTBOX_MAX_RETRY_DELAY)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Запускает фоновую задачу ретранслятора."""
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logging.info("Order outbox relay started.")
+
+    async def stop(self):
+        """Останавливает ретранслятор, дожидаясь завершения текущего пакета."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logging.info("Order outbox relay stopped.")
+
+
+# Глобальный ретранслятор исходящих заказов
+order_outbox_relay = OrderOutboxRelay(rabbit_producer)
@@ -1,93 +1,251 @@
+import asyncio
 import json
 import logging
 import os
 import time
+from typing import List, Optional
 
-import pika
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aio_pika.pool import Pool
+from prometheus_client import Counter, Histogram
+
+from app.api.utils.metrics import LATENCY_BUCKETS, metrics_registry
 
 RABBIT_HOST: str = os.getenv("RABBIT_HOST", default="rabbitmq")
+RABBIT_PORT: int = int(os.getenv("RABBIT_PORT", default=5672))
 RABBIT_USER: str = os.getenv("RABBIT_USER", default="user")
 RABBIT_PASSWORD: str = os.getenv("RABBIT_PASSWORD", default="pass")
 ORDER_QUEUE: str = os.getenv("ORDER_QUEUE", default="order_queue")
 
+# Количество каналов в пуле издателя
+RABBIT_CHANNEL_POOL_SIZE: int = int(os.getenv("RABBIT_CHANNEL_POOL_SIZE", default=4))
+# Максимальное время ожидания подтверждения публикации от брокера (в секундах)
+RABBIT_PUBLISH_TIMEOUT: float = float(os.getenv("RABBIT_PUBLISH_TIMEOUT", default=5))
+# Количество попыток подключения и максимальная задержка между ними (в секундах)
+RABBIT_CONNECT_ATTEMPTS: int = int(os.getenv("RABBIT_CONNECT_ATTEMPTS", default=5))
+RABBIT_RECONNECT_MAX_DELAY: float = float(os.getenv("RABBIT_RECONNECT_MAX_DELAY", default=10))
+
+# Время публикации до подтверждения брокером: одного сообщения (send_message) или пакета (send_batch)
+RABBIT_PUBLISH_DURATION = Histogram(
+    "rabbitmq_publish_duration_seconds", "Time to publish and get broker confirmation",
+    ["operation"], buckets=LATENCY_BUCKETS, registry=metrics_registry)
+RABBIT_PUBLISHED_MESSAGES = Counter(
+    "rabbitmq_published_messages_total", "Messages confirmed by the broker", registry=metrics_registry)
+RABBIT_PUBLISH_FAILURES = Counter(
+    "rabbitmq_publish_failures_total", "Messages not confirmed by the broker", registry=metrics_registry)
+
+
+class RabbitMQPublishError(Exception):
+    """Сообщение не было подтверждено брокером."""
+
 
 class RabbitMQProducer:
     """
     Класс для отправки сообщений в очередь RabbitMQ.
 
-    Класс обеспечивает соединение с сервером RabbitMQ и отправку сообщений в указанную очередь.
-    Соединение и канал создаются один раз при первом вызове, а при завершении можно закрыть соединение.
+    Работает поверх asyncio (aio-pika) и не блокирует цикл событий: сообщения публикуются
+    через небольшой пул каналов с подтверждениями публикации (publisher confirms).
+    Без соединения публикация сразу завершается ошибкой, а подключение восстанавливается
+    в фоне с ограниченной экспоненциальной задержкой, не задерживая обработку запросов.
     """
 
     def __init__(self,
                  host: str = "rabbitmq",
                  order_queue: str = "order_queue",
                  username: str = "user",
-                 password: str = "pass"):
+                 password: str = "pass",
+                 port: int = 5672,
+                 pool_size: int = RABBIT_CHANNEL_POOL_SIZE):
         """
         Инициализирует объект RabbitMQProducer с параметрами подключения к RabbitMQ.
         """
         self.host = host
+        self.port = port
         self.order_queue = order_queue
         self.username = username
         self.password = password
-        self.connection = None
-        self.channel = None
+        self.pool_size = pool_size
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channel_pool: Optional[Pool] = None
+        self._connect_lock = asyncio.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_connected(self) -> bool:
+        """Проверяет, установлено ли соединение с RabbitMQ."""
+        return self.connection is not None and not self.connection.is_closed
+
+    async def connect(self):
+        """
+        Устанавливает соединение с RabbitMQ с поддержкой повторных попыток.
+        Задержка между попытками растёт экспоненциально, но не превышает RABBIT_RECONNECT_MAX_DELAY,
+        а после RABBIT_CONNECT_ATTEMPTS неудачных попыток выбрасывается исключение.
+        """
+        async with self._connect_lock:
+            if self.is_connected:
+                return
+
+            # Пул каналов и соединение предыдущего подключения закрываются, а не заменяются
+            await self._close()
+
+            delay = 0.5
+            for attempt in range(1, RABBIT_CONNECT_ATTEMPTS + 1):
+                try:
+                    # Robust-соединение само восстанавливает каналы после разрыва
+                    self.connection = await aio_pika.connect_robust(
+                        host=self.host, port=self.port, login=self.username, password=self.password)
+                    break
+                except (aio_pika.exceptions.AMQPConnectionError, OSError) as e:
+                    if attempt == RABBIT_CONNECT_ATTEMPTS:
+                        raise
+                    logging.warning(f"Failed to connect to RabbitMQ: {e}. Retrying in {delay} seconds...")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RABBIT_RECONNECT_MAX_DELAY)
+
+            self.channel_pool = Pool(self._create_channel, max_size=self.pool_size)
+            try:
+                # Объявляем очередь один раз при подключении, а не при каждой публикации
+                async with self.channel_pool.acquire() as channel:
+                    await channel.declare_queue(self.order_queue, durable=True)
+            except BaseException:
+                await self._close()
+                raise
+            logging.info("RabbitMQ connection established.")
 
-    def connect(self):
-        """Устанавливает соединение с RabbitMQ с поддержкой повторных попыток."""
-        while self.connection is None:
+    async def _close(self):
+        """Закрывает пул каналов и соединение, если они есть."""
+        channel_pool, self.channel_pool = self.channel_pool, None
+        connection, self.connection = self.connection, None
+        if channel_pool is not None and not channel_pool.is_closed:
+            await channel_pool.close()
+        if connection is not None and not connection.is_closed:
+            await connection.close()
+
+    async def _reconnect(self):
+        """Подключается к RabbitMQ в фоне, пока подключение не будет установлено."""
+        while not self.is_connected:
             try:
-                credentials = pika.PlainCredentials(self.username, self.password)
-                self.connection = pika.BlockingConnection(
-                    pika.ConnectionParameters(host=self.host, credentials=credentials))
-                self.channel = self.connection.channel()
-                self.channel.queue_declare(queue=self.order_queue, durable=True)
-            except pika.exceptions.AMQPConnectionError as e:
-                logging.warning(f"Failed to connect to RabbitMQ: {e}. Retrying in 1 seconds...")
-                time.sleep(1)
-
-    def send_message(self, message: dict):
+                await self.connect()
+            except Exception as e:
+                logging.warning(f"RabbitMQ reconnection failed: {e}. Retrying in {RABBIT_RECONNECT_MAX_DELAY} seconds...")
+                await asyncio.sleep(RABBIT_RECONNECT_MAX_DELAY)
+
+    def reconnect_in_background(self):
+        """Запускает фоновое подключение к RabbitMQ, если оно ещё не выполняется."""
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    def _ensure_connected(self):
         """
-        Отправляет сообщение в очередь RabbitMQ.
-        Если соединение отсутствует, оно будет установлено заново.
+        Проверяет соединение перед публикацией. Без соединения запускает фоновое подключение
+        и сразу выбрасывает RabbitMQPublishError, не задерживая запрос попытками подключения.
         """
-        if not self.connection or self.connection.is_closed:
-            self.connect()
+        if not self.is_connected:
+            self.reconnect_in_background()
+            raise RabbitMQPublishError("RabbitMQ is not connected")
+
+    async def _create_channel(self) -> AbstractChannel:
+        """Создаёт канал с включёнными подтверждениями публикации."""
+        return await self.connection.channel(publisher_confirms=True)
 
+    @staticmethod
+    def _build_message(message: dict) -> aio_pika.Message:
+        """Сериализует сообщение в JSON для публикации."""
+        return aio_pika.Message(
+            body=json.dumps(message).encode(),
+            content_type="application/json",
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT  # Делает сообщение persistent
+        )
+
+    async def send_message(self, message: dict):
+        """
+        Отправляет сообщение в очередь RabbitMQ и ожидает подтверждения от брокера.
+        Если соединение отсутствует, оно восстанавливается в фоне.
+        При неудаче выбрасывается RabbitMQPublishError.
+        """
+        started = time.perf_counter()
         try:
-            # Отправка сообщения
-            self.channel.basic_publish(
-                exchange='',
-                routing_key=self.order_queue,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(delivery_mode=2)  # Делает сообщение persistent
-            )
+            self._ensure_connected()
+            async with self.channel_pool.acquire() as channel:
+                await channel.default_exchange.publish(
+                    self._build_message(message),
+                    routing_key=self.order_queue,
+                    timeout=RABBIT_PUBLISH_TIMEOUT
+                )
             logging.info(f"Message sent to queue {self.order_queue}: {message}")
-        except pika.exceptions.AMQPError as e:
+            RABBIT_PUBLISHED_MESSAGES.inc()
+        except (aio_pika.exceptions.AMQPError, asyncio.TimeoutError, OSError, RabbitMQPublishError) as e:
             logging.error(f"Failed to send message to RabbitMQ: {e}")
+            RABBIT_PUBLISH_FAILURES.inc()
+            raise RabbitMQPublishError(str(e)) from e
+        finally:
+            RABBIT_PUBLISH_DURATION.labels("message").observe(time.perf_counter() - started)
+
+    async def send_batch(self, messages: List[dict]) -> List[bool]:
+        """
+        Публикует пакет сообщений через один канал и ожидает подтверждения всех публикаций сразу.
+        Возвращает список признаков успешной публикации в порядке переданных сообщений.
+        Без соединения с брокером сразу выбрасывается RabbitMQPublishError (подключение
+        восстанавливается в фоне).
+        """
+        started = time.perf_counter()
+        try:
+            self._ensure_connected()
+        except RabbitMQPublishError:
+            RABBIT_PUBLISH_FAILURES.inc(len(messages))
+            raise
+
+        async with self.channel_pool.acquire() as channel:
+            results = await asyncio.gather(*[
+                channel.default_exchange.publish(
+                    self._build_message(message),
+                    routing_key=self.order_queue,
+                    timeout=RABBIT_PUBLISH_TIMEOUT
+                )
+                for message in messages
+            ], return_exceptions=True)
+
+        RABBIT_PUBLISH_DURATION.labels("batch").observe(time.perf_counter() - started)
+        failed = [result for result in results if isinstance(result, BaseException)]
+        RABBIT_PUBLISHED_MESSAGES.inc(len(messages) - len(failed))
+        RABBIT_PUBLISH_FAILURES.inc(len(failed))
+        if failed:
+            logging.error(f"Failed to send {len(failed)} of {len(messages)} messages to RabbitMQ: {failed[0]}")
+        logging.info(f"Batch of {len(messages) - len(failed)} messages sent to queue {self.order_queue}.")
+        return [not isinstance(result, BaseException) for result in results]
 
-    def close_connection(self):
-        """Закрывает соединение с RabbitMQ, если оно активно."""
-        if self.connection and not self.connection.is_closed:
-            self.connection.close()
+    async def close_connection(self):
+        """Останавливает фоновое подключение и закрывает пул каналов и соединение с RabbitMQ."""
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
+        was_connected = self.is_connected
+        await self._close()
+        if was_connected:
             logging.info("Connection to RabbitMQ closed.")
 
 
-# Глобальная переменная для хранения экземпляра RabbitMQProducer
-rabbit_producer = RabbitMQProducer()
+# Глобальный экземпляр RabbitMQProducer, настроенный из переменных окружения
+rabbit_producer = RabbitMQProducer(
+    host=RABBIT_HOST,
+    order_queue=ORDER_QUEUE,
+    username=RABBIT_USER,
+    password=RABBIT_PASSWORD,
+    port=RABBIT_PORT
+)
 
 
-def init_rabbit_producer():
+async def init_rabbit_producer():
     """
-    Инициализирует глобальный объект RabbitMQProducer с заданными параметрами и подключается к серверу RabbitMQ.
+    Подключает глобальный объект RabbitMQProducer к серверу RabbitMQ.
+    Если брокер недоступен, запуск приложения не прерывается: подключение
+    продолжается в фоне.
     """
-    global rabbit_producer
-    rabbit_producer = RabbitMQProducer(
-        host=RABBIT_HOST,
-        order_queue=ORDER_QUEUE,
-        username=RABBIT_USER,
-        password=RABBIT_PASSWORD
-    )
-    rabbit_producer.connect()
-    logging.info("RabbitMQProducer initialized and connected.")
+    try:
+        await rabbit_producer.connect()
+        logging.info("RabbitMQProducer initialized and connected.")
+    except (aio_pika.exceptions.AMQPConnectionError, OSError) as e:
+        logging.warning(f"RabbitMQ is not available at startup: {e}")
+        rabbit_producer.reconnect_in_background()
@@ -1,7 +1,10 @@
 from fastapi import HTTPException, APIRouter, status
 
+from app.api.database.db_manager import UnknownDishesError, price_order
 from app.api.model.order_request import OrderRequest
-from app.api.rabbit.rabbit import rabbit_producer
+from app.api.rabbit.outbox import ORDER_PUBLISH_MODE, order_outbox_relay
+from app.api.rabbit.rabbit import rabbit_producer, RabbitMQPublishError
+from app.api.utils.jwks_client import jwks_client
 
 # Создаем роутер для маршрутов
 order_router = APIRouter()
@@ -15,10 +18,26 @@ async def create_order(token: str, order: OrderRequest):
     """
      Создание заказа и отправка его в ресторан.
     """
+    # Токен проверяется локально по открытым ключам auth_service
+    if await jwks_client.decode(token) is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Блюда проверяются по меню ресторана, в ресторан отправляется заказ с ценами и итоговой суммой
+    try:
+        priced_order = await price_order(order)
+    except UnknownDishesError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    message = priced_order.model_dump()
+
+    if ORDER_PUBLISH_MODE == "outbox":
+        # Заказ сохраняется локально, а в RabbitMQ его публикует фоновый ретранслятор
+        order_id = await order_outbox_relay.enqueue(message)
+        return {"message": "Order accepted and will be sent to restaurant", "order_id": order_id,
+                "total": priced_order.total}
+
     try:
-        # Логика отправки заказа в очередь RabbitMQ
-        message = order.dict()
-        rabbit_producer.send_message(message)
-        return {"message": "Order successfully sent to restaurant"}
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order data.")
+        # Логика отправки заказа в очередь RabbitMQ (ожидание подтверждения не блокирует цикл событий)
+        await rabbit_producer.send_message(message)
+        return {"message": "Order successfully sent to restaurant", "total": priced_order.total}
+    except RabbitMQPublishError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Order could not be sent, try again later.")
@@ -1,34 +1,150 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, status
+import orjson
+from fastapi import APIRouter, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from app.api.database.db_manager import get_all_restaurants, get_dishes_by_restaurant
-from app.api.model.dish import Dish
+from app.api.database.db_manager import get_all_restaurants, get_dishes_by_restaurant, iterate_restaurants, \
+    iterate_dishes_by_restaurant, search_catalog, get_dish_facets, get_catalog_version
+from app.api.database.database import CATALOG_VERSION_GLOBAL
+from app.api.database.ingredients import normalize_ingredients
+from app.api.model.dish import Dish, DishFacets, DishFilter
 from app.api.model.restaurant import Restaurant
+from app.api.model.search import SearchResult
+from app.api.utils.conditional import catalog_etag, catalog_headers, etag_matches, not_modified_response
+from app.api.utils.json_response import JSON_OPTIONS, json_response
+from app.api.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, decode_cursor, paginate, set_next_cursor, \
+    decode_offset_cursor, encode_offset_cursor
+
+# Максимальное количество ингредиентов в одном параметре фильтра меню
+MAX_FILTER_INGREDIENTS: int = 20
 
 # Создаем роутер для маршрутов
 view_router = APIRouter()
 
 
+def ndjson_response(rows, headers: Optional[dict] = None) -> StreamingResponse:
+    """
+    Потоковый ответ в формате NDJSON: каждая запись сериализуется сразу после чтения из базы данных.
+    """
+
+    async def stream():
+        async for row in rows:
+            yield orjson.dumps(dict(row._mapping), option=JSON_OPTIONS) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
+
+
 @view_router.get(
     path='/restaurants',
     response_model=List[Restaurant],
     status_code=status.HTTP_200_OK)
-async def get_restaurants():
+async def get_restaurants(request: Request,
+                          response: Response,
+                          limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                          cursor: Optional[str] = None,
+                          format: str = Query(default="json", pattern="^(json|ndjson)$"),
+                          if_none_match: Optional[str] = Header(default=None)):
     """
-    Получение списка всех ресторанов.
+    Получение списка ресторанов постранично.
+    Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
+    В формате `ndjson` возвращаются все рестораны после курсора потоком, без ограничения `limit`.
+    Ответ содержит ETag версии каталога; если он совпадает с `If-None-Match`, возвращается 304.
     """
-    restaurants = await get_all_restaurants()
-    return restaurants
+    after_id = decode_cursor(cursor)
+    version = await get_catalog_version()
+    etag = catalog_etag(CATALOG_VERSION_GLOBAL, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    if format == "ndjson":
+        return ndjson_response(iterate_restaurants(after_id), catalog_headers(etag))
+
+    restaurants, next_cursor = paginate(await get_all_restaurants(after_id, limit + 1, version), limit)
+    set_next_cursor(response, next_cursor)
+    response.headers.update(catalog_headers(etag))
+    return json_response(request, response, restaurants)
 
 
 @view_router.get(
     path='/restaurants/{restaurant_id}/dishes',
     response_model=List[Dish],
     status_code=status.HTTP_200_OK)
-async def get_dishes_by_restaurant_id(restaurant_id: int):
+async def get_dishes_by_restaurant_id(restaurant_id: int,
+                                      request: Request,
+                                      response: Response,
+                                      limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                                      cursor: Optional[str] = None,
+                                      format: str = Query(default="json", pattern="^(json|ndjson)$"),
+                                      min_price: Optional[float] = Query(default=None, ge=0),
+                                      max_price: Optional[float] = Query(default=None, ge=0),
+                                      include: List[str] = Query(default=[], max_length=MAX_FILTER_INGREDIENTS),
+                                      exclude: List[str] = Query(default=[], max_length=MAX_FILTER_INGREDIENTS),
+                                      if_none_match: Optional[str] = Header(default=None)):
+    """
+    Получение списка блюд для заданного ресторана по его ID постранично.
+    Блюда можно отфильтровать по диапазону цен (`min_price`, `max_price`), обязательным (`include`)
+    и исключённым (`exclude`) ингредиентам; параметры ингредиентов можно повторять.
+    Курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
+    В формате `ndjson` возвращаются все блюда после курсора потоком, без ограничения `limit`.
+    Ответ содержит ETag версии меню; если он совпадает с `If-None-Match`, возвращается 304.
+    """
+    after_id = decode_cursor(cursor)
+    version = await get_catalog_version(restaurant_id)
+    etag = catalog_etag(restaurant_id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    dish_filter = DishFilter(
+        min_price=min_price,
+        max_price=max_price,
+        include=tuple(normalize_ingredients(include)),
+        exclude=tuple(normalize_ingredients(exclude))
+    )
+    if format == "ndjson":
+        return ndjson_response(iterate_dishes_by_restaurant(restaurant_id, after_id, dish_filter),
+                               catalog_headers(etag))
+
+    dishes, next_cursor = paginate(
+        await get_dishes_by_restaurant(restaurant_id, after_id, limit + 1, dish_filter, version), limit)
+    set_next_cursor(response, next_cursor)
+    response.headers.update(catalog_headers(etag))
+    return json_response(request, response, dishes)
+
+
+@view_router.get(
+    path='/restaurants/{restaurant_id}/dishes/facets',
+    response_model=DishFacets,
+    status_code=status.HTTP_200_OK)
+async def get_dish_facets_by_restaurant_id(restaurant_id: int,
+                                           response: Response,
+                                           if_none_match: Optional[str] = Header(default=None)):
+    """
+    Получение фасетов меню ресторана для построения фильтров: количество блюд, диапазон цен
+    и количество блюд с каждым ингредиентом (по убыванию).
+    Ответ содержит ETag версии меню; если он совпадает с `If-None-Match`, возвращается 304.
+    """
+    version = await get_catalog_version(restaurant_id)
+    etag = catalog_etag(restaurant_id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    response.headers.update(catalog_headers(etag))
+    return await get_dish_facets(restaurant_id, version)
+
+
+@view_router.get(
+    path='/search',
+    response_model=List[SearchResult],
+    status_code=status.HTTP_200_OK)
+async def search(request: Request,
+                 response: Response,
+                 q: str = Query(min_length=1, max_length=200),
+                 kind: Optional[str] = Query(default=None, pattern="^(dish|restaurant)$"),
+                 limit: int = Query(default=DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                 cursor: Optional[str] = None):
     """
-    Получение списка блюд для заданного ресторана по его ID.
+    Полнотекстовый поиск блюд и ресторанов по названию, ингредиентам и адресу.
+    Результаты упорядочены по релевантности; курсор следующей страницы возвращается в заголовке `X-Next-Cursor`.
     """
-    dishes = await get_dishes_by_restaurant(restaurant_id)
-    return dishes
+    offset = decode_offset_cursor(cursor)
+    results = await search_catalog(q, kind, offset, limit + 1)
+    set_next_cursor(response, encode_offset_cursor(offset + limit) if len(results) > limit else None)
+    return json_response(request, response, results[:limit])
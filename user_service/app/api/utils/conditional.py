@@ -0,0 +1,45 @@
+import os
+from typing import Dict, Optional
+
+from fastapi import Response, status
+
+from app.api.utils.json_response import COMPRESSORS, encoded_etag
+
+# Время (в секундах), в течение которого клиенты и nginx могут использовать ответ каталога
+# без повторной проверки ETag
+CATALOG_MAX_AGE: int = int(os.getenv("CATALOG_MAX_AGE", default=5))
+
+
+def catalog_etag(restaurant_id: int, version: int) -> str:
+    """
+    Строгий ETag ответа каталога по версии списка ресторанов (restaurant_id = CATALOG_VERSION_GLOBAL)
+    или меню ресторана. Разные страницы и фильтры различаются адресом запроса, поэтому
+    в ETag входит только версия.
+    """
+    return f'"catalog-{restaurant_id}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет, есть ли ETag в заголовке If-None-Match (список через запятую или "*").
+    Для If-None-Match используется слабое сравнение: префикс W/ не учитывается,
+    ETag сжатых представлений той же версии тоже совпадают.
+    """
+    if not if_none_match:
+        return False
+    etags = {etag} | {encoded_etag(etag, encoding) for encoding in COMPRESSORS}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") in etags:
+            return True
+    return False
+
+
+def catalog_headers(etag: str) -> Dict[str, str]:
+    """Заголовки кэширования ответа каталога."""
+    return {"ETag": etag, "Cache-Control": f"public, max-age={CATALOG_MAX_AGE}"}
+
+
+def not_modified_response(etag: str) -> Response:
+    """Ответ 304 Not Modified без тела."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=catalog_headers(etag))
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+import jwt
+
+# Адрес JWKS auth_service с открытыми ключами проверки JWT токенов
+JWKS_URL: str = os.getenv("JWKS_URL", default="http://auth_service:8000/api/v1/auth/.well-known/jwks.json")
+# Время, в течение которого загруженные ключи используются без повторной загрузки (в секундах)
+JWKS_CACHE_TTL: float = float(os.getenv("JWKS_CACHE_TTL", default=300))
+# Минимальный интервал между загрузками JWKS при встрече неизвестного ключа (в секундах)
+JWKS_MIN_REFRESH_INTERVAL: float = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", default=10))
+# Таймаут запроса к auth_service (в секундах)
+JWKS_TIMEOUT: float = float(os.getenv("JWKS_TIMEOUT", default=2))
+
+
+class JWKSClient:
+    """
+    Клиент JWKS для локальной проверки JWT токенов, подписанных auth_service.
+
+    Ключи кэшируются на JWKS_CACHE_TTL секунд. Токен с неизвестным идентификатором ключа (kid)
+    вызывает внеочередную загрузку JWKS (после ротации ключей в auth_service), но не чаще
+    одного раза в JWKS_MIN_REFRESH_INTERVAL секунд. Если auth_service недоступен,
+    продолжают использоваться ранее загруженные ключи.
+    """
+
+    def __init__(self, url: str = JWKS_URL, ttl: float = JWKS_CACHE_TTL,
+                 min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL):
+        """
+        Инициализирует клиент с адресом JWKS, временем жизни кэша и интервалом между загрузками.
+        """
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        # Ключи по идентификатору: (ключ, алгоритм подписи из JWKS)
+        self._keys: Dict[str, Tuple[jwt.PyJWK, str]] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def _refresh(self):
+        """Загружает JWKS. Одновременные загрузки объединяются в одну."""
+        attempted_at = self._attempted_at
+        async with self._lock:
+            # Пока ждали блокировку, ключи уже загрузил другой запрос
+            if self._attempted_at != attempted_at:
+                return
+            self._attempted_at = time.monotonic()
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=JWKS_TIMEOUT)
+            try:
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                keys = {}
+                for jwk in response.json()["keys"]:
+                    keys[jwk["kid"]] = (jwt.PyJWK(jwk), jwk["alg"])
+            except (httpx.HTTPError, KeyError, ValueError, jwt.PyJWTError) as e:
+                logging.error(f"Failed to fetch JWKS from {self.url}: {e}")
+                return
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            logging.info(f"Loaded {len(keys)} JWT verification keys from {self.url}")
+
+    async def get_key(self, kid: str) -> Optional[Tuple[jwt.PyJWK, str]]:
+        """Возвращает ключ проверки и его алгоритм по идентификатору или None, если ключ неизвестен."""
+        now = time.monotonic()
+        expired = now - self._fetched_at >= self.ttl
+        # Повторная загрузка ограничена по частоте, в том числе когда auth_service недоступен
+        if (expired or kid not in self._keys) and now - self._attempted_at >= self.min_refresh_interval:
+            await self._refresh()
+        return self._keys.get(kid)
+
+    async def decode(self, token: str) -> Optional[dict]:
+        """
+        Проверяет подпись и срок действия JWT токена.
+        Возвращает данные токена или None, если токен недействителен.
+        """
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            entry = await self.get_key(kid) if kid else None
+            if entry is None:
+                return None
+            key, algorithm = entry
+            return jwt.decode(token, key.key, algorithms=[algorithm])
+        except jwt.PyJWTError:
+            return None
+
+    async def close(self):
+        """Закрывает HTTP-клиент."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Глобальный клиент JWKS
+jwks_client = JWKSClient()
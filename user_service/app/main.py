@@ -3,21 +3,49 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.api.database.database import database
-from app.api.rabbit.rabbit import init_rabbit_producer
+from app.api.database.database import database, read_database
+from app.api.rabbit.catalog_events import catalog_subscriber
+from app.api.rabbit.outbox import ORDER_PUBLISH_MODE, order_outbox_relay
+from app.api.rabbit.rabbit import init_rabbit_producer, rabbit_producer
 from app.api.router.order_router import order_router
 from app.api.router.view_router import view_router
+from app.api.utils.jwks_client import jwks_client
+from app.api.utils.metrics import setup_metrics
+from app.api.utils.query_profiler import setup_query_profiler
 
 # Устанавливаем уровень логирования
 logging.basicConfig(level=logging.INFO)
 
+# Бюджеты запросов к базе данных по маршрутам: проверяются профилировщиком запросов
+# (предупреждение в режиме отладки, ошибка при QUERY_BUDGETS_ENFORCED в тестах)
+QUERY_BUDGETS = {
+    "GET /api/v1/user/restaurants": 2,
+    "GET /api/v1/user/restaurants/{restaurant_id}/dishes": 3,
+    "GET /api/v1/user/restaurants/{restaurant_id}/dishes/facets": 3,
+    "GET /api/v1/user/search": 1,
+    "POST /api/v1/user/order": 2,
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.connect()
+    await read_database.connect()
+    # Инициализация RabbitMQ producer для отправки сообщений в очереди
+    await init_rabbit_producer()
+    # Фоновая публикация заказов из таблицы исходящих заказов
+    if ORDER_PUBLISH_MODE == "outbox":
+        order_outbox_relay.start()
+    # Подписка на события изменения каталога для сброса кэша
+    catalog_subscriber.start()
     try:
         yield
     finally:
+        await catalog_subscriber.stop()
+        await order_outbox_relay.stop()
+        await rabbit_producer.close_connection()
+        await jwks_client.close()
+        await read_database.disconnect()
         await database.disconnect()
 
 
@@ -33,5 +61,7 @@ prefix = '/api/v1/user'
 app.include_router(view_router, prefix=prefix, tags=['view'])
 app.include_router(order_router, prefix=prefix, tags=['order'])
 
-# Инициализация RabbitMQ producer для отправки сообщений в очереди
-init_rabbit_producer()
\ No newline at end of file
+# Метрики в формате Prometheus на /metrics
+setup_metrics(app)
+# Профилирование запросов к базе данных в режиме отладки (QUERY_PROFILER_ENABLED)
+setup_query_profiler(app, budgets=QUERY_BUDGETS)
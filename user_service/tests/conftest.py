@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Тесты импортируют пакет `app` из каталога сервиса и общие помощники тестов из корня репозитория
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.append(str(SERVICE_DIR.parent))
+
+# Временная база данных задаётся до импорта приложения: схема создаётся миграциями при импорте
+TEST_DIR = tempfile.mkdtemp(prefix="user-service-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.sqlite"
+# Профилировщик запросов включается при импорте приложения, превышение бюджета запросов — ошибка
+os.environ["QUERY_PROFILER_ENABLED"] = "true"
+os.environ["QUERY_BUDGETS_ENFORCED"] = "true"
+
+# Пользователь, токен которого принимает замена проверки по JWKS
+USERS = {1: ("+79990000001", False)}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client(monkeypatch):
+    """Клиент приложения, подключённого к базе данных тестов без RabbitMQ (вместо lifespan приложения)."""
+    from benchmarks.services import StubAuth
+    from httpx import ASGITransport, AsyncClient
+
+    from app.api.database.database import database, read_database
+    from app.api.router import order_router
+    from app.main import app
+
+    monkeypatch.setattr(order_router, "jwks_client", StubAuth(USERS))
+    await database.connect()
+    await read_database.connect()
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        await read_database.disconnect()
+        await database.disconnect()
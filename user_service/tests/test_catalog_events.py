@@ -0,0 +1,72 @@
+from typing import List
+
+import pytest
+
+from app.api.database.catalog_cache import CatalogCache
+from app.api.rabbit import catalog_events
+from app.api.rabbit.catalog_events import CatalogEventSubscriber
+
+
+class FakeQueue:
+    def __init__(self):
+        self.callback = None
+
+    async def bind(self, exchange):
+        pass
+
+    async def consume(self, callback, no_ack: bool = False):
+        self.callback = callback
+
+
+class FakeChannel:
+    """Канал, объявление exchange в котором завершается ошибкой, если задан `fail`."""
+
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.is_closed = False
+        self.queue = FakeQueue()
+
+    async def declare_exchange(self, name, kind, durable: bool = False):
+        if self.fail:
+            raise RuntimeError("ACCESS_REFUSED")
+        return object()
+
+    async def declare_queue(self, exclusive: bool = False, auto_delete: bool = False):
+        return self.queue
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.channels: List[FakeChannel] = []
+        self.reconnect_callbacks = set()
+
+    async def channel(self):
+        channel = FakeChannel(fail=len(self.channels) < self.failures)
+        self.channels.append(channel)
+        return channel
+
+
+class FakeProducer:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+
+    async def connect(self):
+        pass
+
+
+@pytest.mark.anyio
+async def test_subscription_retries_channel_setup_failures(monkeypatch):
+    monkeypatch.setattr(catalog_events, "CATALOG_EVENTS_RETRY_DELAY", 0)
+    connection = FakeConnection(failures=2)
+    subscriber = CatalogEventSubscriber(FakeProducer(connection), CatalogCache())
+
+    await subscriber._subscribe()
+
+    # Каналы неудавшихся попыток закрыты, подписка выполнена на третьем канале
+    assert [channel.is_closed for channel in connection.channels] == [True, True, False]
+    assert connection.channels[-1].queue.callback == subscriber._on_message
+    assert subscriber._on_reconnect in connection.reconnect_callbacks
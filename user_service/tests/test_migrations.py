@@ -0,0 +1,33 @@
+import sqlite3
+
+from app.api.database.ingredients import parse_ingredients
+from app.api.database.migrations import index_existing_dishes, migrate
+
+INGREDIENTS = [
+    "Соль, перец",
+    "Ёжевика; ЛУК\nсыр",
+    "  томаты   черри ,томаты  черри,,",
+    "",
+    None,
+]
+
+
+def test_backfill_indexes_ingredients_like_the_catalog_parser():
+    connection = sqlite3.connect(":memory:")
+    migrate(connection)
+    connection.execute("INSERT INTO restaurants (id, name, address, user_id) VALUES (1, 'Ресторан', 'Адрес', 1)")
+    dish_ids = [
+        connection.execute("INSERT INTO dishes (name, ingredients, price, restaurant_id) VALUES ('Блюдо', ?, 1, 1)",
+                           (ingredients,)).lastrowid
+        for ingredients in INGREDIENTS
+    ]
+
+    index_existing_dishes(connection)
+
+    indexed = {dish_id: set() for dish_id in dish_ids}
+    for dish_id, name in connection.execute(
+            "SELECT dish_ingredients.dish_id, ingredients.name FROM dish_ingredients "
+            "JOIN ingredients ON ingredients.id = dish_ingredients.ingredient_id"):
+        indexed[dish_id].add(name)
+    assert indexed == {dish_id: set(parse_ingredients(ingredients)) for dish_id, ingredients in zip(dish_ids, INGREDIENTS)}
+    connection.close()
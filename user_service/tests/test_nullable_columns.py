@@ -0,0 +1,47 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.api.database.catalog_cache import catalog_cache
+from app.main import app
+
+PREFIX = "/api/v1/user"
+RESTAURANT_ID = 3
+
+
+@pytest.fixture
+def nullable_rows():
+    """Ресторан без адреса и блюдо без цены и ингредиентов; удаляются после теста вместе с кэшем каталога."""
+    connection = sqlite3.connect(os.environ["DATABASE_URL"][len("sqlite:///"):])
+    with connection:
+        connection.execute("INSERT INTO restaurants (id, name, user_id) VALUES (?, ?, ?)",
+                           (RESTAURANT_ID, "Ресторан без адреса", 1))
+        dish_id = connection.execute("INSERT INTO dishes (name, restaurant_id) VALUES (?, ?)",
+                                     ("Блюдо без цены", RESTAURANT_ID)).lastrowid
+    try:
+        yield dish_id
+    finally:
+        with connection:
+            connection.execute("DELETE FROM dishes WHERE restaurant_id = ?", (RESTAURANT_ID,))
+            connection.execute("DELETE FROM restaurants WHERE id = ?", (RESTAURANT_ID,))
+        connection.close()
+        catalog_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_null_columns_are_returned_as_documented_nulls(client, nullable_rows):
+    restaurants = (await client.get(f"{PREFIX}/restaurants")).json()
+    assert {"id": RESTAURANT_ID, "name": "Ресторан без адреса", "address": None} in restaurants
+    dishes = (await client.get(f"{PREFIX}/restaurants/{RESTAURANT_ID}/dishes")).json()
+    assert dishes == [{"id": nullable_rows, "name": "Блюдо без цены", "price": None, "ingredients": None}]
+
+    # Схема ответа описывает null, который возвращают эти маршруты
+    schemas = app.openapi()["components"]["schemas"]
+    nullable = {
+        (model, field) for model in ("Dish", "Restaurant", "SearchResult")
+        for field, schema in schemas[model]["properties"].items()
+        if {"type": "null"} in schema.get("anyOf", [])
+    }
+    assert {("Dish", "name"), ("Dish", "price"), ("Dish", "ingredients"),
+            ("Restaurant", "name"), ("Restaurant", "address"), ("SearchResult", "name")} <= nullable
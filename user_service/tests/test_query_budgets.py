@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import sqlite3
+from typing import List
+
+import pytest
+from sqlalchemy import select
+
+from benchmarks.services import StubAuth
+from app.api.database.database import database, order_outbox
+from app.api.database.migrations import index_existing_dishes
+from app.main import QUERY_BUDGETS
+from testing.query_budgets import assert_budgets_exercised
+
+PREFIX = "/api/v1/user"
+RESTAURANT_ID = 1
+# Ингредиенты блюд каталога тестов: блюдо i содержит три ингредиента, начиная с INGREDIENTS[i % 4]
+INGREDIENTS = ["соль", "перец", "лук", "чеснок", "сыр", "томаты"]
+# Количество блюд каждого ресторана каталога тестов, цена блюда i — 50 + 10 * i
+DISHES_PER_RESTAURANT = 20
+
+
+def dish_ingredients(i: int) -> List[str]:
+    return INGREDIENTS[i % 4:i % 4 + 3]
+
+
+@pytest.fixture(scope="module")
+def catalog() -> List[int]:
+    """Рестораны 1 и 2 с блюдами в базе данных тестов. Возвращает ID блюд первого ресторана по порядку."""
+    connection = sqlite3.connect(os.environ["DATABASE_URL"][len("sqlite:///"):])
+    with connection:
+        for restaurant_id in (1, 2):
+            connection.execute("INSERT INTO restaurants (id, name, address, user_id) VALUES (?, ?, ?, ?)",
+                               (restaurant_id, f"Ресторан {restaurant_id}", "Адрес", 1))
+            connection.executemany(
+                "INSERT INTO dishes (name, ingredients, price, restaurant_id) VALUES (?, ?, ?, ?)",
+                [(f"Блюдо {i}", ", ".join(dish_ingredients(i)), 50 + 10 * i, restaurant_id)
+                 for i in range(DISHES_PER_RESTAURANT)]
+            )
+        index_existing_dishes(connection)
+    dish_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM dishes WHERE restaurant_id = ? ORDER BY id", (RESTAURANT_ID,))]
+    connection.close()
+    return dish_ids
+
+
+@pytest.mark.anyio
+async def test_routes_respond_within_query_budgets(client, catalog, caplog):
+    """Сценарий вызывает каждый маршрут из QUERY_BUDGETS и проверяет ответы."""
+    caplog.set_level(logging.INFO)
+
+    async def request(method: str, path: str, **kwargs):
+        # Превышение бюджета поднимает QueryBudgetExceededError из транспорта
+        response = await client.request(method, PREFIX + path, **kwargs)
+        assert response.is_success, response.text
+        return response
+
+    restaurants = await request("GET", "/restaurants")
+    assert [(item["id"], item["name"]) for item in restaurants.json()] == [(1, "Ресторан 1"), (2, "Ресторан 2")]
+    # Неизменившийся каталог не отправляется повторно
+    not_modified = await client.get(f"{PREFIX}/restaurants", headers={"If-None-Match": restaurants.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    dishes = (await request("GET", f"/restaurants/{RESTAURANT_ID}/dishes")).json()
+    assert [dish["id"] for dish in dishes] == catalog
+    assert (dishes[3]["name"], dishes[3]["price"], dishes[3]["ingredients"]) == (
+        "Блюдо 3", 80, ", ".join(dish_ingredients(3)))
+    filtered = await request("GET", f"/restaurants/{RESTAURANT_ID}/dishes",
+                             params={"max_price": 200, "include": ["чеснок"], "exclude": ["сыр"]})
+    assert [dish["id"] for dish in filtered.json()] == [
+        catalog[i] for i in range(DISHES_PER_RESTAURANT)
+        if 50 + 10 * i <= 200 and "чеснок" in dish_ingredients(i) and "сыр" not in dish_ingredients(i)]
+
+    # Потоковые ответы читаются из пула только для чтения и совпадают со страницами JSON
+    ndjson_restaurants = await request("GET", "/restaurants", params={"format": "ndjson"})
+    assert ndjson_restaurants.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in ndjson_restaurants.text.splitlines()] == restaurants.json()
+    ndjson_dishes = await request("GET", f"/restaurants/{RESTAURANT_ID}/dishes", params={"format": "ndjson"})
+    assert [json.loads(line) for line in ndjson_dishes.text.splitlines()] == dishes
+
+    facets = (await request("GET", f"/restaurants/{RESTAURANT_ID}/dishes/facets")).json()
+    assert (facets["total"], facets["min_price"], facets["max_price"]) == (
+        DISHES_PER_RESTAURANT, 50, 50 + 10 * (DISHES_PER_RESTAURANT - 1))
+    assert {facet["name"]: facet["count"] for facet in facets["ingredients"]} == {
+        name: sum(name in dish_ingredients(i) for i in range(DISHES_PER_RESTAURANT)) for name in INGREDIENTS}
+
+    found = (await request("GET", "/search", params={"q": "томаты", "kind": "dish"})).json()
+    assert len(found) == 2 * sum("томаты" in dish_ingredients(i) for i in range(DISHES_PER_RESTAURANT))
+    assert all(result["kind"] == "dish" and "томаты" in result["details"] for result in found)
+
+    order = {
+        "dishes": [{"id": catalog[0], "quantity": 2}, {"id": catalog[1], "quantity": 1}],
+        "address": "Адрес",
+        "phone_number": "+79990000000",
+        "restaurant_id": RESTAURANT_ID,
+    }
+    accepted = (await request("POST", "/order", params={"token": StubAuth.token(1)}, json=order)).json()
+    assert accepted["total"] == 2 * 50 + 60
+    # В ресторан отправляется заказ с ценами блюд из меню
+    payload = json.loads(await database.fetch_val(
+        select(order_outbox.c.payload).where(order_outbox.c.id == accepted["order_id"])))
+    assert [(item["name"], item["amount"]) for item in payload["dishes"]] == [("Блюдо 0", 100), ("Блюдо 1", 60)]
+    foreign_dish = await client.post(f"{PREFIX}/order", params={"token": StubAuth.token(1)},
+                                     json={**order, "restaurant_id": 2})
+    assert foreign_dish.status_code == 400
+
+    assert_budgets_exercised(caplog.records, QUERY_BUDGETS)
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.api.rabbit import rabbit
+from app.api.rabbit.rabbit import RabbitMQProducer, RabbitMQPublishError
+
+
+class FakeChannel:
+    is_closed = False
+
+    async def declare_queue(self, name: str, durable: bool = False):
+        pass
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    def __init__(self, is_closed: bool = False):
+        self.is_closed = is_closed
+
+    async def channel(self, publisher_confirms: bool = True):
+        return FakeChannel()
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakePool:
+    is_closed = False
+
+    async def close(self):
+        self.is_closed = True
+
+
+@pytest.mark.anyio
+async def test_publish_without_connection_fails_fast(monkeypatch):
+    broker_available = asyncio.Event()
+
+    async def connect_robust(**kwargs):
+        # Брокер недоступен: подключение не завершается, пока не появится брокер
+        await broker_available.wait()
+        return FakeConnection()
+
+    monkeypatch.setattr(rabbit.aio_pika, "connect_robust", connect_robust)
+    producer = RabbitMQProducer()
+    try:
+        with pytest.raises(RabbitMQPublishError):
+            await asyncio.wait_for(producer.send_message({"id": 1}), timeout=0.1)
+        with pytest.raises(RabbitMQPublishError):
+            await asyncio.wait_for(producer.send_batch([{"id": 2}]), timeout=0.1)
+
+        # Подключение продолжается в фоне и завершается, когда брокер становится доступен
+        broker_available.set()
+        await asyncio.wait_for(producer._reconnect_task, timeout=1)
+        assert producer.is_connected
+    finally:
+        await producer.close_connection()
+
+
+@pytest.mark.anyio
+async def test_reconnect_closes_previous_channel_pool(monkeypatch):
+    async def connect_robust(**kwargs):
+        return FakeConnection()
+
+    monkeypatch.setattr(rabbit.aio_pika, "connect_robust", connect_robust)
+    producer = RabbitMQProducer()
+    old_pool = producer.channel_pool = FakePool()
+    producer.connection = FakeConnection(is_closed=True)
+
+    await producer.connect()
+
+    assert old_pool.is_closed
+    assert producer.channel_pool is not old_pool
+    assert producer.is_connected
+    await producer.close_connection()